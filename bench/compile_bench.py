@@ -0,0 +1,277 @@
+"""
+Compile-time benchmark of CompilerLexam.
+
+Times every pass of the compiler on generated programs (see
+generate.py) of growing size, and fits a growth curve
+seconds = c * size^k to each pass of each shape. The results are
+written as JSON. A pass whose exponent k is above --max-exponent, or
+grew by more than --tolerance compared to a --baseline result file,
+is reported and makes the script exit with status 1.
+
+Every measurement runs in a child process that is killed after
+--budget seconds; the larger sizes of that shape are skipped then.
+
+    python bench/compile_bench.py --sizes 100,1000,10000 --out results.json
+"""
+
+import json
+import math
+import multiprocessing
+import platform
+import sys
+import threading
+from pathlib import Path
+
+import click
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import utils
+from compiler_Lexam import CompilerLexam
+from type_check_Lexam import TypeCheckLexam
+from type_check_Cexam import TypeCheckCexam
+from generate import SHAPES, generate_program
+
+# The passes in the order of utils.compile_and_test, together with the
+# type checker that runs on the input of the pass ("P", "C" or None).
+PASSES = [
+    ("shrink", None),
+    ("reveal_functions", "P"),
+    ("limit_functions", "P"),
+    ("resolve", "P"),
+    ("check_bounds", "P"),
+    ("expose_allocation", "P"),
+    ("remove_complex_operands", None),
+    ("explicate_control", None),
+    ("select_instructions", "C"),
+    ("assign_homes", None),
+    ("patch_instructions", None),
+    ("prelude_and_conclusion", None),
+]
+
+# the compiler recurses over nested statements and expressions
+STACK_SIZE = 512 * 1024 * 1024
+RECURSION_LIMIT = 100000
+
+
+# Runs all passes of CompilerLexam on `source` and returns the x86
+# program. Every pass goes through utils.run_pass, so it is recorded
+# when profiling is on; `after_pass`, if given, is called with the name
+# and the output of every pass.
+def compile_source(source: str, program_root: str = "bench", after_pass=None):
+    import ast
+
+    compiler = CompilerLexam()
+    type_checkers = {
+        "P": TypeCheckLexam().type_check,
+        "C": TypeCheckCexam().type_check,
+    }
+    program = ast.parse(source)
+    for (passname, type_checker) in PASSES:
+        if not hasattr(compiler, passname):
+            continue
+        if type_checker is not None:
+            type_checkers[type_checker](program)
+        program = utils.run_pass(
+            program_root, passname, getattr(compiler, passname), program
+        )
+        if after_pass is not None:
+            after_pass(passname, program)
+    return program
+
+
+# Compiles `source` and returns the seconds and output size of every pass.
+def measure_passes(source: str) -> dict:
+    utils.enable_profiling(memory=False)
+    del utils.profile_records[:]
+    compile_source(source)
+    return {
+        r["pass"]: {"seconds": r["seconds"], "nodes": r["nodes"]}
+        for r in utils.profile_records
+    }
+
+
+def measure_in_child(connection, shape: str, size: int, seed: int) -> None:
+    result = {}
+
+    def run():
+        try:
+            result["passes"] = measure_passes(generate_program(shape, size, seed))
+        except BaseException as e:
+            result["error"] = repr(e)
+
+    sys.setrecursionlimit(RECURSION_LIMIT)
+    threading.stack_size(STACK_SIZE)
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    connection.send(result)
+
+
+# Returns the measurements of one program, or a dict with an "error"
+# entry if the compiler failed or ran out of time.
+def measure(shape: str, size: int, seed: int, budget: float) -> dict:
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    child = multiprocessing.Process(
+        target=measure_in_child, args=(sender, shape, size, seed)
+    )
+    child.start()
+    if receiver.poll(budget):
+        result = receiver.recv()
+    else:
+        child.terminate()
+        result = {"error": "timeout after " + str(budget) + " seconds"}
+    child.join()
+    return result
+
+
+# Least-squares fit of log(seconds) = log(c) + k * log(size); returns
+# the exponent k, or None with fewer than two usable points.
+def fit_growth(points: list[tuple[int, float]]) -> float | None:
+    logs = [(math.log(n), math.log(t)) for (n, t) in points if n > 0 and t > 0]
+    if len(logs) < 2:
+        return None
+    mean_x = sum(x for (x, _) in logs) / len(logs)
+    mean_y = sum(y for (_, y) in logs) / len(logs)
+    sxx = sum((x - mean_x) ** 2 for (x, _) in logs)
+    if sxx == 0:
+        return None
+    sxy = sum((x - mean_x) * (y - mean_y) for (x, y) in logs)
+    return sxy / sxx
+
+
+def run_shape(shape: str, sizes: list[int], seed: int, budget: float) -> dict:
+    measured = {}
+    skipped = []
+    errors = {}
+    for size in sizes:
+        if errors:
+            skipped.append(size)
+            continue
+        print("benchmarking " + shape + " at size " + str(size), file=sys.stderr)
+        result = measure(shape, size, seed, budget)
+        if "error" in result:
+            errors[str(size)] = result["error"]
+        else:
+            measured[str(size)] = result["passes"]
+    growth = {}
+    for (passname, _) in PASSES:
+        points = [
+            (int(size), passes[passname]["seconds"])
+            for (size, passes) in measured.items()
+            if passname in passes
+        ]
+        if points:
+            growth[passname] = fit_growth(points)
+    return {"sizes": measured, "skipped": skipped, "errors": errors, "growth": growth}
+
+
+# Lists the passes that grow faster than `max_exponent`, or faster than
+# in `baseline` by more than `tolerance`. Passes that stay below
+# `min_seconds` at the largest size are too noisy to judge.
+def check_growth(
+    results: dict,
+    baseline: dict | None,
+    max_exponent: float,
+    tolerance: float,
+    min_seconds: float,
+) -> list[str]:
+    problems = []
+    for (shape, result) in results["shapes"].items():
+        if not result["sizes"]:
+            continue
+        largest = result["sizes"][max(result["sizes"], key=int)]
+        for (passname, k) in result["growth"].items():
+            if k is None or largest.get(passname, {}).get("seconds", 0) < min_seconds:
+                continue
+            if k > max_exponent:
+                problems.append(
+                    shape + "/" + passname + ": grows like size^" + format(k, ".2f")
+                )
+            if baseline is not None:
+                base_k = (
+                    baseline["shapes"].get(shape, {}).get("growth", {}).get(passname)
+                )
+                if base_k is not None and k > base_k + tolerance:
+                    problems.append(
+                        shape
+                        + "/"
+                        + passname
+                        + ": exponent "
+                        + format(k, ".2f")
+                        + " was "
+                        + format(base_k, ".2f")
+                    )
+    return problems
+
+
+@click.command()
+@click.option(
+    "--shapes",
+    default=",".join(SHAPES),
+    show_default=True,
+    help="Comma separated shapes of the generated programs",
+)
+@click.option(
+    "--sizes",
+    default="100,1000,10000,100000",
+    show_default=True,
+    help="Comma separated program sizes",
+)
+@click.option("--seed", default=0, show_default=True, type=int)
+@click.option(
+    "--budget",
+    default=300.0,
+    show_default=True,
+    help="Seconds one compilation may take",
+    type=float,
+)
+@click.option(
+    "--out",
+    default="compile-bench.json",
+    show_default=True,
+    help="File the results are written to",
+    type=click.Path(dir_okay=False),
+)
+@click.option(
+    "--baseline",
+    default=None,
+    help="Earlier results to compare the growth exponents to",
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option("--max-exponent", default=1.3, show_default=True, type=float)
+@click.option("--tolerance", default=0.25, show_default=True, type=float)
+@click.option("--min-seconds", default=0.05, show_default=True, type=float)
+def main(shapes, sizes, seed, budget, out, baseline, max_exponent, tolerance, min_seconds):
+    shapes = shapes.split(",")
+    for shape in shapes:
+        if shape not in SHAPES:
+            raise click.BadParameter("unknown shape " + shape)
+    sizes = sorted(int(n) for n in sizes.split(","))
+    results = {
+        "seed": seed,
+        "python": platform.python_version(),
+        "shapes": {shape: run_shape(shape, sizes, seed, budget) for shape in shapes},
+    }
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+
+    for (shape, result) in results["shapes"].items():
+        for (passname, k) in result["growth"].items():
+            if k is not None:
+                print(shape + "/" + passname + ": size^" + format(k, ".2f"))
+        for (size, error) in result["errors"].items():
+            print(shape + " at size " + size + ": " + error)
+
+    if baseline is not None:
+        with open(baseline) as f:
+            baseline = json.load(f)
+    problems = check_growth(results, baseline, max_exponent, tolerance, min_seconds)
+    for problem in problems:
+        print("super-linear: " + problem)
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Microbenchmark of the per-node cost of finding the right case in the
+interpreters and type checkers.
+
+Every node is evaluated on its own, many times, with leaves that are as
+cheap as possible, so the time is dominated by reaching the handler of
+the node. The deeper in the language tower a node is handled, the more
+it costs when dispatch walks the classes one after the other.
+
+    python bench/dispatch_bench.py
+"""
+
+import ast
+import sys
+import timeit
+from pathlib import Path
+
+import click
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import utils
+from interp_Lexam import InterpLexam
+from interp_Cexam import InterpCexam
+from type_check_Lexam import TypeCheckLexam
+from type_check_Cexam import TypeCheckCexam
+
+x = ast.Name("x")
+y = ast.Name("y")
+lst = ast.Name("l")
+
+# (name, expression) with the leaves x, y (ints) and l (a list of ints)
+EXPRESSIONS = [
+    ("Constant", ast.Constant(1)),
+    ("Name", x),
+    ("Add", ast.BinOp(x, ast.Add(), y)),
+    ("Mult", ast.BinOp(x, ast.Mult(), y)),
+    ("USub", ast.UnaryOp(ast.USub(), x)),
+    ("Compare", ast.Compare(x, [ast.Lt()], [y])),
+    ("IfExp", ast.IfExp(ast.Compare(x, [ast.Lt()], [y]), x, y)),
+    ("Subscript", ast.Subscript(lst, ast.Constant(0), ast.Load())),
+    ("len", ast.Call(ast.Name("len"), [lst])),
+]
+
+STATEMENTS = [
+    ("Assign", ast.Assign([ast.Name("z")], ast.Constant(1))),
+    ("Assign subscript", ast.Assign([ast.Subscript(lst, ast.Constant(0), ast.Store())], ast.Constant(1))),
+    ("If", ast.If(ast.Constant(True), [], [])),
+]
+
+
+def per_call(f, number: int) -> float:
+    return min(timeit.repeat(f, number=number, repeat=5)) / number
+
+
+def bench_interp(interp, number: int) -> dict:
+    env = {"x": 3, "y": 4, "l": [1, 2, 3]}
+    results = {}
+    for (name, e) in EXPRESSIONS:
+        results[name] = per_call(lambda: interp.interp_exp(e, env), number)
+    for (name, s) in STATEMENTS:
+        results[name] = per_call(lambda: interp.interp_stmts([s], env), number)
+    return results
+
+
+def bench_type_check(type_checker, number: int) -> dict:
+    env = {
+        "x": utils.IntType(),
+        "y": utils.IntType(),
+        "l": utils.ListType(utils.IntType()),
+    }
+    results = {}
+    for (name, e) in EXPRESSIONS:
+        results[name] = per_call(lambda: type_checker.type_check_exp(e, env), number)
+    return results
+
+
+@click.command()
+@click.option("--number", default=20000, show_default=True, type=int)
+def main(number):
+    sys.setrecursionlimit(10000)
+    benches = [
+        ("InterpLexam", bench_interp(InterpLexam(), number)),
+        ("InterpCexam", bench_interp(InterpCexam(), number)),
+        ("TypeCheckLexam", bench_type_check(TypeCheckLexam(), number)),
+        ("TypeCheckCexam", bench_type_check(TypeCheckCexam(), number)),
+    ]
+    names = [name for (name, _) in EXPRESSIONS + STATEMENTS]
+    print(format("node", "18") + "".join(format(bench, ">16") for (bench, _) in benches))
+    for name in names:
+        line = format(name, "18")
+        for (_, results) in benches:
+            if name in results:
+                line += format(format(results[name] * 1e9, ".0f") + " ns", ">16")
+            else:
+                line += format("", ">16")
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
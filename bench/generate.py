@@ -0,0 +1,193 @@
+"""
+Seeded generator of synthetic L_exam programs for the benchmarks.
+
+Every shape stresses a different part of the compiler:
+
+  straight   long straight-line code
+  nested     deeply nested if and while statements
+  functions  many small functions
+  params     functions with more than 6 parameters (limit_functions)
+  lists      large list literals (expose_allocation)
+  pressure   many variables that are live at the same time (register allocation)
+
+`size` is the number of statements of the program, except for `lists`
+where it is the total number of list elements. The same seed and size
+always produce the same program.
+"""
+
+import random
+import sys
+
+import click
+
+SHAPES = ["straight", "nested", "functions", "params", "lists", "pressure"]
+
+# number of variables the straight-line code computes with
+NUM_VARS = 10
+
+# deepest nesting of if and while statements
+MAX_NESTING = 16
+
+# number of variables that are live at the same time in `pressure`
+LIVE_VARS = 40
+
+
+class ProgramGenerator:
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.lines: list[str] = []
+        self.statements = 0
+
+    def emit(self, depth: int, line: str) -> None:
+        self.lines.append("    " * depth + line)
+        self.statements += 1
+
+    def source(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+    def var(self) -> str:
+        return "v" + str(self.rng.randrange(NUM_VARS))
+
+    # An integer expression over the variables v0 ... v9. Products and
+    # sums are reduced modulo a prime, so that the values stay small.
+    def int_exp(self) -> str:
+        match self.rng.randrange(6):
+            case 0:
+                return self.var() + " + " + self.var()
+            case 1:
+                return self.var() + " - " + str(self.rng.randrange(1, 100))
+            case 2:
+                return "(" + self.var() + " * " + self.var() + ") % 1009"
+            case 3:
+                return self.var() + " // " + str(self.rng.randrange(2, 10))
+            case 4:
+                return "(" + self.var() + " + " + self.var() + ") % 1013"
+            case _:
+                return "-" + self.var()
+
+    def cmp_exp(self) -> str:
+        op = self.rng.choice(["<", "<=", ">", ">=", "==", "!="])
+        return self.var() + " " + op + " " + self.var()
+
+    def init_vars(self, depth: int = 0) -> None:
+        for i in range(NUM_VARS):
+            self.emit(depth, "v" + str(i) + " = " + str(self.rng.randrange(1, 100)))
+
+    def assign(self, depth: int) -> None:
+        self.emit(depth, self.var() + " = " + self.int_exp())
+
+    def print_vars(self, depth: int = 0) -> None:
+        self.emit(depth, "print(" + " + ".join("v" + str(i) for i in range(NUM_VARS)) + ")")
+
+    def straight(self, size: int) -> None:
+        self.init_vars()
+        while self.statements < size - 1:
+            self.assign(0)
+        self.print_vars()
+
+    # Emits about `budget` statements at nesting `depth`.
+    def nested_block(self, depth: int, budget: int) -> None:
+        start = self.statements
+        while self.statements - start < budget:
+            left = budget - (self.statements - start)
+            if depth >= MAX_NESTING or left < 6 or self.rng.randrange(3) == 0:
+                self.assign(depth)
+            elif self.rng.randrange(2) == 0:
+                inner = self.rng.randrange(1, left - 3)
+                self.emit(depth, "if " + self.cmp_exp() + ":")
+                self.nested_block(depth + 1, max(1, inner // 2))
+                self.emit(depth, "else:")
+                self.statements -= 1  # not a statement of its own
+                self.nested_block(depth + 1, max(1, inner // 2))
+            else:
+                counter = "i" + str(depth)
+                inner = self.rng.randrange(1, left - 3)
+                self.emit(depth, counter + " = 0")
+                self.emit(depth, "while " + counter + " < 2:")
+                self.nested_block(depth + 1, inner)
+                self.emit(depth + 1, counter + " = " + counter + " + 1")
+
+    def nested(self, size: int) -> None:
+        self.init_vars()
+        self.nested_block(0, size - NUM_VARS - 1)
+        self.print_vars()
+
+    def functions(self, size: int) -> None:
+        count = max(1, size // 6)
+        for f in range(count):
+            self.emit(0, "def f" + str(f) + "(x: int, y: int) -> int:")
+            self.emit(1, "z = x + y")
+            self.emit(1, "if z > 100:")
+            self.emit(2, "z = z % 97")
+            self.emit(1, "else:")
+            self.statements -= 1
+            self.emit(2, "z = z * 2")
+            self.emit(1, "return z - x")
+        self.init_vars()
+        for f in range(count):
+            self.emit(0, self.var() + " = f" + str(f) + "(" + self.var() + ", " + self.var() + ")")
+        self.print_vars()
+
+    def params(self, size: int) -> None:
+        count = max(1, size // 3)
+        arities = [self.rng.randrange(7, 11) for _ in range(count)]
+        for (f, arity) in enumerate(arities):
+            ps = ["a" + str(i) for i in range(arity)]
+            self.emit(0, "def g" + str(f) + "(" + ", ".join(p + ": int" for p in ps) + ") -> int:")
+            self.emit(1, "return (" + " + ".join(ps) + ") % 1009")
+        self.init_vars()
+        for (f, arity) in enumerate(arities):
+            args = ", ".join(self.var() for _ in range(arity))
+            self.emit(0, self.var() + " = g" + str(f) + "(" + args + ")")
+        self.print_vars()
+
+    def lists(self, size: int) -> None:
+        self.init_vars()
+        self.emit(0, "s = 0")
+        elements = 0
+        lst = 0
+        while elements < size:
+            length = min(size - elements, self.rng.randrange(100, 1001))
+            name = "l" + str(lst)
+            values = ", ".join(str(self.rng.randrange(1000)) for _ in range(length))
+            self.emit(0, name + " = [" + values + "]")
+            self.emit(0, name + "[" + str(self.rng.randrange(length)) + "] = " + self.var())
+            self.emit(0, "s = s + " + name + "[" + str(self.rng.randrange(length)) + "] + len(" + name + ")")
+            elements += length
+            lst += 1
+        self.emit(0, "print(s)")
+
+    def pressure(self, size: int) -> None:
+        self.init_vars()
+        self.emit(0, "s = 0")
+        group = 0
+        while self.statements < size - 1:
+            live = min(LIVE_VARS, max(1, size - 2 - self.statements))
+            names = ["p" + str(group) + "_" + str(i) for i in range(live)]
+            for name in names:
+                self.emit(0, name + " = " + self.int_exp())
+            # all the variables of the group are live up to here
+            self.emit(0, "s = (s + " + " + ".join(names) + ") % 1009")
+            group += 1
+        self.emit(0, "print(s)")
+
+
+def generate_program(shape: str, size: int, seed: int = 0) -> str:
+    if shape not in SHAPES:
+        raise Exception("generate_program: unknown shape " + repr(shape))
+    generator = ProgramGenerator(seed)
+    getattr(generator, shape)(size)
+    return generator.source()
+
+
+@click.command()
+@click.option("--shape", required=True, type=click.Choice(SHAPES))
+@click.option("--size", default=100, show_default=True, type=int)
+@click.option("--seed", default=0, show_default=True, type=int)
+def main(shape, size, seed):
+    "Print a generated L_exam program"
+    sys.stdout.write(generate_program(shape, size, seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Hot spots of a program at the level of the C intermediate language.
+
+Compiles the program, runs the output of explicate_control with
+InterpCexam in profiling mode and writes, as JSON, the calls, block
+entries and statements of every function and the blocks that executed
+the most statements. Every block is given with its label in the
+generated assembly and, when the passes kept it, the source line it
+comes from. The labels are numbered anew by every compilation; --asm
+writes the assembly they refer to:
+
+    python bench/hot_blocks.py tests/exam/while-collatz.py --top 5 --asm collatz.s
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import click
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import utils
+from compile_bench import compile_source, RECURSION_LIMIT
+from interp_Cexam import InterpCexam
+from interp_Cfun import BlockProfile
+
+
+# Compiles the program and profiles its C version. Returns the profile
+# and the x86 program, whose labels are the ones of the profile.
+def profile_program(source: str, input_data: str, program_root: str):
+    profile = BlockProfile()
+
+    def after_pass(passname, program):
+        if passname == "explicate_control":
+            # the output of the program is not part of the report
+            utils.run_captured(InterpCexam(profile).interp, program, input_data)
+
+    x86 = compile_source(source, program_root, after_pass)
+    return (profile, x86)
+
+
+@click.command()
+@click.argument("program", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--input",
+    "input_file",
+    default=None,
+    help="Input of the program (default: the .in file next to it, if any)",
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option("--top", default=20, show_default=True, help="Number of blocks to list", type=int)
+@click.option(
+    "--asm",
+    default=None,
+    help="File the assembly of the profiled compilation is written to",
+    type=click.Path(dir_okay=False),
+)
+@click.option(
+    "--out",
+    default=None,
+    help="File the report is written to (default: standard output)",
+    type=click.Path(dir_okay=False),
+)
+def main(program, input_file, top, asm, out):
+    sys.setrecursionlimit(RECURSION_LIMIT)
+    path = Path(program)
+    if input_file is None and path.with_suffix(".in").exists():
+        input_file = path.with_suffix(".in")
+    input_data = Path(input_file).read_text() if input_file is not None else ""
+    (profile, x86) = profile_program(path.read_text(), input_data, str(path.with_suffix("")))
+    if asm is not None:
+        Path(asm).write_text(str(x86))
+    report = {"program": str(path), **profile.report(top)}
+    if out is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+#in=200000
+#count-in=20
+n = input_int()
+total = 0
+i = 1
+while i <= n:
+    x = i
+    while x > 1:
+        total = total + 1
+        if x % 2 == 0:
+            x = x // 2
+        else:
+            x = 3 * x + 1
+    i = i + 1
+print(total)
@@ -0,0 +1,22 @@
+#in=4000
+#count-in=1
+rounds = input_int()
+x = [5, 2, 6, 0, 1, 8, 1, 5, 9, 0, 8, 3, 0, 1, 6, 6, 1, 3, 1, 8, 6, 0, 9, 1, 3, 9, 0, 9, 9, 6, 0, 3, 0, 8, 2, 4, 6, 2, 8, 1, 9, 4, 8, 2, 1, 9, 9, 3, 5, 1, 8, 1, 9, 0, 9, 3, 7, 8, 6, 5, 7, 9, 7, 5]
+y = [4, 3, 2, 3, 1, 9, 4, 8, 7, 5, 7, 4, 9, 1, 1, 8, 6, 2, 5, 2, 7, 6, 0, 1, 8, 9, 5, 5, 5, 9, 7, 9, 7, 1, 1, 4, 7, 1, 0, 4, 9, 7, 4, 6, 5, 0, 7, 5, 2, 9, 1, 7, 0, 3, 4, 2, 3, 6, 6, 7, 1, 2, 7, 6]
+z = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+total = 0
+k = 0
+while k < rounds:
+    m = 0
+    while m < len(z):
+        z[m] = 0
+        i = 0
+        while i <= m:
+            j = m - i
+            if i < len(x) and j < len(y):
+                z[m] = z[m] + x[i] * y[j]
+            i = i + 1
+        total = total + z[m]
+        m = m + 1
+    k = k + 1
+print(total)
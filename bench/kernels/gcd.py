@@ -0,0 +1,24 @@
+#in=2000
+#count-in=8
+n = input_int()
+total = 0
+a = 1
+while a <= n:
+    b = 1
+    while b <= n:
+        old_r = a
+        r = b
+        old_s = 1
+        s = 0
+        while r != 0:
+            q = old_r // r
+            tmp = r
+            r = old_r - q * r
+            old_r = tmp
+            tmp = s
+            s = old_s - q * s
+            old_s = tmp
+        total = total + old_r + old_s
+        b = b + 1
+    a = a + 1
+print(total)
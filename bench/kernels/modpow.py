@@ -0,0 +1,19 @@
+#in=3233
+#in=2000000
+#count-in=3233
+#count-in=20
+def pow(m: int, x: int, mod: int) -> int:
+    r = 1
+    while x > 0:
+        r = (r * m) % mod
+        x = x - 1
+    return r
+
+n = input_int()
+e = input_int()
+m = 2
+total = 0
+while m < 12:
+    total = total + pow(m, e, n)
+    m = m + 1
+print(total)
@@ -0,0 +1,269 @@
+"""
+Runtime benchmark of the code generated by CompilerLexam.
+
+Compiles the compute-heavy kernels in bench/kernels, runs every
+executable --warmup times untimed and then --repeat times, and records
+the wall time, the user and system time and the maximum resident set
+size of each run, as reported by the small launcher in rusage.c. The
+number of instructions each kernel executes is counted with the x86
+emulator on the smaller `#count-in=` input of the kernel, since the
+emulator is far slower than the hardware.
+
+The results are written as JSON; with --baseline the medians are
+compared to an earlier result file:
+
+    python bench/run_bench.py --out run-bench.json
+    python bench/run_bench.py --baseline run-bench.json
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import click
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import utils
+from compile_bench import compile_source
+
+KERNELS_DIR = Path(__file__).resolve().parent / "kernels"
+
+
+# Returns the source of the kernel, the input of the benchmark runs and
+# the input of the instruction count. The inputs are given like in the
+# tests, one `#in=` (or `#count-in=`) line per number.
+def read_kernel(path: Path) -> tuple[str, str, str]:
+    source = path.read_text()
+    native_input = ""
+    count_input = ""
+    for line in source.splitlines():
+        if line.startswith("#in="):
+            native_input += line[len("#in=") :] + "\n"
+        elif line.startswith("#count-in="):
+            count_input += line[len("#count-in=") :] + "\n"
+    return (source, native_input, count_input)
+
+
+# Builds the launcher that reports the resource usage of a program
+# (see rusage.c) into `build_dir`.
+def build_launcher(build_dir: Path) -> Path:
+    launcher = Path(build_dir, "rusage")
+    source = Path(__file__).resolve().parent / "rusage.c"
+    if not utils.run_gcc(["-O2", str(source), "-o", str(launcher)]):
+        raise Exception("could not build " + str(source))
+    return launcher
+
+
+# Runs the executable once and returns its output together with the
+# wall time and the resource usage of the process.
+def run_once(launcher: Path, executable: Path, input_file: Path) -> dict:
+    report = executable.with_suffix(".rusage")
+    with open(input_file, "rb") as stdin:
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [str(launcher), str(report), str(executable)],
+            stdin=stdin,
+            stdout=subprocess.PIPE,
+        )
+        wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise Exception(
+            str(executable) + " exited with status " + str(completed.returncode)
+        )
+    (user, system, max_rss) = report.read_text().split()
+    return {
+        "output": completed.stdout.decode(errors="replace"),
+        "wall": wall,
+        "user": float(user),
+        "sys": float(system),
+        "max_rss_kb": int(max_rss),
+    }
+
+
+# Counts the instructions the emulator executes for the x86 program.
+# Returns a dict with either an "instructions" or an "error" entry.
+def count_instructions(program, input_data: str) -> dict:
+    from interp_x86.eval_x86 import X86Emulator
+
+    emulator = X86Emulator(logging=False)
+    try:
+        utils.run_captured(emulator.eval_program, program, input_data)
+        return {"instructions": emulator.instruction_count}
+    except Exception as e:
+        return {"error": repr(e)}
+
+
+def benchmark_kernel(path: Path, warmup: int, repeat: int, count: bool) -> dict:
+    (source, native_input, count_input) = read_kernel(path)
+    start = time.perf_counter()
+    program = compile_source(source, str(path.with_suffix("")))
+    result = {"compile_seconds": time.perf_counter() - start}
+
+    with tempfile.TemporaryDirectory(prefix=path.stem + "-") as build_dir:
+        x86_filename = Path(build_dir, path.stem + ".s")
+        x86_filename.write_text(str(program))
+        input_file = Path(build_dir, path.stem + ".in")
+        input_file.write_text(native_input)
+        executable = utils.build_executable(x86_filename, Path(build_dir), {})
+        if executable is None:
+            raise Exception("could not build " + str(path))
+        launcher = build_launcher(Path(build_dir))
+
+        for _ in range(warmup):
+            run_once(launcher, executable, input_file)
+        runs = [run_once(launcher, executable, input_file) for _ in range(repeat)]
+
+    outputs = set(run["output"] for run in runs)
+    if len(outputs) != 1:
+        raise Exception(str(path) + " printed different outputs: " + repr(outputs))
+    result["output"] = runs[0]["output"]
+    for measure in ["wall", "user", "sys"]:
+        values = [run[measure] for run in runs]
+        result[measure] = {
+            "median": statistics.median(values),
+            "min": min(values),
+            "max": max(values),
+        }
+    result["max_rss_kb"] = max(run["max_rss_kb"] for run in runs)
+    if count:
+        result["count"] = count_instructions(program, count_input)
+    return result
+
+
+def ratio(new: float, old: float) -> str:
+    if new <= 0 or old <= 0:
+        return "n/a"
+    if new <= old:
+        return format(old / new, ".2f") + "x faster"
+    return format(new / old, ".2f") + "x slower"
+
+
+# Compares the results to the baseline; returns a line per kernel, and
+# whether some kernel printed something else than in the baseline.
+def compare(results: dict, baseline: dict) -> tuple[list[str], bool]:
+    lines = []
+    changed_output = False
+    for (name, result) in results["kernels"].items():
+        old = baseline["kernels"].get(name)
+        if old is None:
+            lines.append(name + ": not in the baseline")
+            continue
+        new_wall = result["wall"]["median"]
+        old_wall = old["wall"]["median"]
+        line = (
+            name
+            + ": wall "
+            + format(new_wall, ".3f")
+            + "s, baseline "
+            + format(old_wall, ".3f")
+            + "s, "
+            + ratio(new_wall, old_wall)
+        )
+        new_count = result.get("count", {}).get("instructions")
+        old_count = old.get("count", {}).get("instructions")
+        if new_count is not None and old_count is not None:
+            line += (
+                "; instructions "
+                + str(new_count)
+                + ", baseline "
+                + str(old_count)
+                + ", "
+                + ratio(new_count, old_count)
+            )
+        if result["output"] != old["output"]:
+            line += "; OUTPUT CHANGED"
+            changed_output = True
+        lines.append(line)
+    return (lines, changed_output)
+
+
+@click.command()
+@click.option(
+    "--kernels",
+    default=None,
+    help="Comma separated kernels to run (default: all in bench/kernels)",
+)
+@click.option("--warmup", default=1, show_default=True, type=int)
+@click.option("--repeat", default=5, show_default=True, type=int)
+@click.option(
+    "--count/--no-count",
+    default=True,
+    show_default=True,
+    help="Count the executed instructions with the x86 emulator",
+)
+@click.option(
+    "--out",
+    default="run-bench.json",
+    show_default=True,
+    help="File the results are written to",
+    type=click.Path(dir_okay=False, resolve_path=True),
+)
+@click.option(
+    "--baseline",
+    default=None,
+    help="Earlier results to compare to",
+    type=click.Path(exists=True, dir_okay=False, resolve_path=True),
+)
+def main(kernels, warmup, repeat, count, out, baseline):
+    if kernels is None:
+        paths = sorted(KERNELS_DIR.glob("*.py"))
+    else:
+        paths = [KERNELS_DIR / (name + ".py") for name in kernels.split(",")]
+        for path in paths:
+            if not path.exists():
+                raise click.BadParameter("unknown kernel " + path.stem)
+
+    # runtime.o is built and linked from the repository root
+    os.chdir(ROOT)
+    utils.ensure_runtime()
+    results = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "warmup": warmup,
+        "repeat": repeat,
+        "kernels": {},
+    }
+    for path in paths:
+        print("benchmarking " + path.stem, file=sys.stderr)
+        result = benchmark_kernel(path, warmup, repeat, count)
+        results["kernels"][path.stem] = result
+        line = (
+            path.stem
+            + ": wall "
+            + format(result["wall"]["median"], ".3f")
+            + "s, user "
+            + format(result["user"]["median"], ".3f")
+            + "s, sys "
+            + format(result["sys"]["median"], ".3f")
+            + "s, max rss "
+            + str(result["max_rss_kb"])
+            + " kB"
+        )
+        if "count" in result:
+            line += ", instructions " + str(
+                result["count"].get("instructions", result["count"].get("error"))
+            )
+        print(line)
+
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if baseline is not None:
+        with open(baseline) as f:
+            (lines, changed_output) = compare(results, json.load(f))
+        for line in lines:
+            print(line)
+        if changed_output:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
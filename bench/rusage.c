@@ -0,0 +1,52 @@
+/*
+   Runs a program and writes its user time and system time in seconds
+   and its maximum resident set size in kB to a report file:
+
+       rusage REPORT PROGRAM [ARGUMENTS...]
+
+   On Linux the maximum resident set size of a process includes the
+   memory of the process it was forked from, so measuring the program
+   as a direct child of the (much larger) Python process would report
+   the size of the Python process instead.
+*/
+
+#include <stdio.h>
+#include <sys/resource.h>
+#include <sys/wait.h>
+#include <unistd.h>
+
+int main(int argc, char *argv[]) {
+  if (argc < 3) {
+    fprintf(stderr, "usage: %s REPORT PROGRAM [ARGUMENTS...]\n", argv[0]);
+    return 2;
+  }
+  pid_t pid = fork();
+  if (pid < 0) {
+    perror("fork");
+    return 2;
+  }
+  if (pid == 0) {
+    execv(argv[2], argv + 2);
+    perror(argv[2]);
+    _exit(127);
+  }
+  int status;
+  struct rusage usage;
+  if (wait4(pid, &status, 0, &usage) < 0) {
+    perror("wait4");
+    return 2;
+  }
+  FILE *report = fopen(argv[1], "w");
+  if (report == NULL) {
+    perror(argv[1]);
+    return 2;
+  }
+  fprintf(report, "%ld.%06ld %ld.%06ld %ld\n",
+          (long)usage.ru_utime.tv_sec, (long)usage.ru_utime.tv_usec,
+          (long)usage.ru_stime.tv_sec, (long)usage.ru_stime.tv_usec,
+          usage.ru_maxrss);
+  fclose(report);
+  if (WIFEXITED(status))
+    return WEXITSTATUS(status);
+  return 128 + WTERMSIG(status);
+}
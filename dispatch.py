@@ -0,0 +1,94 @@
+import ast
+
+# Dispatch of AST nodes to handler methods, for the interpreters and
+# type checkers.
+#
+# Those are towers of classes, one per language. Finding the case for a
+# node by walking a match statement and falling back to super() costs
+# more the deeper the node is handled in the tower. Instead, a method
+# registers itself with @handles for the nodes it handles, and every
+# class gets one table per group of handlers ("exp", "stmt", ...) that
+# merges the handlers of the class and all its base classes when the
+# class is created. Finding the handler of a node is then a dictionary
+# lookup.
+#
+# A subclass extends a language by registering handlers for new nodes,
+# and changes the handling of a node by overriding the handler method
+# (under the same name); the override can call super() as usual.
+#
+# Some nodes are told apart by a detail besides their class: the
+# operator of BinOp, UnaryOp, BoolOp and Compare, the name of the called
+# function of a Call (and of an Expr that is a call), the target of an
+# Assign and the index of a Subscript. A handler registered with a
+# detail, e.g. handles("exp", ast.BinOp, ast.Add) or
+# handles("exp", ast.Call, "len"), is tried before the one registered
+# for the class alone. A handler registered without a class is the
+# default of its group.
+
+
+def call_name(call):
+    func = call.func
+    return func.id if func.__class__ is ast.Name else None
+
+
+def expr_call_name(s):
+    value = s.value
+    return call_name(value) if value.__class__ is ast.Call else None
+
+
+DETAILS = {
+    ast.BinOp: lambda e: e.op.__class__,
+    ast.UnaryOp: lambda e: e.op.__class__,
+    ast.BoolOp: lambda e: e.op.__class__,
+    ast.Compare: lambda e: e.ops[0].__class__,
+    ast.Call: call_name,
+    ast.Expr: expr_call_name,
+    ast.Assign: lambda s: s.targets[0].__class__,
+    ast.Subscript: lambda e: e.slice.__class__,
+}
+
+
+def handles(group: str, node_class=None, detail=None):
+    if node_class is None:
+        key = None
+    elif detail is None:
+        key = node_class
+    else:
+        key = (node_class, detail)
+
+    def register(method):
+        method.__dict__.setdefault("dispatch_keys", []).append((group, key))
+        return method
+
+    return register
+
+
+class Dispatcher:
+    dispatch_tables: dict[str, dict] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # group -> key -> name of the handler method; walking the MRO
+        # from the root, the most derived registration wins
+        names: dict[str, dict] = {}
+        for klass in reversed(cls.__mro__):
+            for (attr, value) in vars(klass).items():
+                for (group, key) in getattr(value, "dispatch_keys", []):
+                    names.setdefault(group, {})[key] = attr
+        cls.dispatch_tables = {
+            group: {key: getattr(cls, attr) for (key, attr) in table.items()}
+            for (group, table) in names.items()
+        }
+
+    def dispatch(self, group: str, node, *args):
+        table = self.dispatch_tables[group]
+        cls = node.__class__
+        detail = DETAILS.get(cls)
+        if detail is not None:
+            handler = table.get((cls, detail(node)))
+            if handler is not None:
+                return handler(self, node, *args)
+        handler = table.get(cls)
+        if handler is None:
+            handler = table[None]
+        return handler(self, node, *args)
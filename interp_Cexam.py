@@ -1,76 +1,94 @@
 import ast
 from interp_Cfun import InterpCfun
 from utils import *
+from dispatch import handles
 
 
 class InterpCexam(InterpCfun):
-    def interp_exp(self, e, env):
-        match e:
-            case AllocateArray(length, typ):  # FIXED
-                length = self.interp_exp(length, env)
-                return [None] * length
-            case ast.List(es, ast.Load()):
-                return [self.interp_exp(e, env) for e in es]
-            case ast.BinOp(left, ast.Mult(), right):
-                l = self.interp_exp(left, env)
-                r = self.interp_exp(right, env)
-                return l * r
-            case ast.BinOp(left, ast.FloorDiv(), right):
-                l = self.interp_exp(left, env)
-                r = self.interp_exp(right, env)
-                aq = abs(l) // abs(r)
-                return aq if l * r >= 0 else -aq
-            case ast.BinOp(left, ast.Mod(), right):
-                l = self.interp_exp(left, env)
-                r = self.interp_exp(right, env)
-                ar = abs(l) % abs(r)
-                return ar if l >= 0 else -ar
-            case ast.BinOp(left, ast.LShift(), right):
-                l = self.interp_exp(left, env)
-                r = self.interp_exp(right,env)
-                return l << r
-            case ast.BinOp(left, ast.RShift(), right):
-                l = self.interp_exp(left, env)
-                r = self.interp_exp(right,env)
-                return l >> r
-            case ast.BinOp(left, ast.BitOr(), right):
-                l = self.interp_exp(left, env)
-                r = self.interp_exp(right, env)
-                return l | r
-            case ast.BinOp(left, ast.BitXor(), right):
-                l = self.interp_exp(left, env)
-                r = self.interp_exp(right,env)
-                return l ^ r
-            case ast.BinOp(left, ast.BitAnd(), right):
-                l = self.interp_exp(left, env)
-                r = self.interp_exp(right,env)
-                return l & r
-            case ast.Call(ast.Name("array_len"), [tup]):
-                t = self.interp_exp(tup, env)
-                return len(t)
-            case ast.Call(ast.Name("array_load"), [tup, index]):
-                t = self.interp_exp(tup, env)
-                i = self.interp_exp(index, env)
-                return t[i]
-            case ast.Call(ast.Name("array_store"), [tup, index, value]):
-                t = self.interp_exp(tup, env)
-                i = self.interp_exp(index, env)
-                v = self.interp_exp(value, env)
-                t[i] = v
-                return None
-            case _:
-                return super().interp_exp(e, env)
+    @handles("exp", AllocateArray)
+    def interp_allocate_array(self, e, env):  # FIXED
+        length = self.interp_exp(e.length, env)
+        return [None] * length
 
-    def interp_stmts(self, ss, env):
-        if len(ss) == 0:
-            return
-        match ss[0]:
-            case ast.Assign([ast.Subscript(lst, index)], value):
-                lst = self.interp_exp(lst, env)
-                index = self.interp_exp(index, env)
-                if index < 0:
-                    raise IndexError("less than zero")
-                lst[index] = self.interp_exp(value, env)
-                return self.interp_stmts(ss[1:], env)
-            case _:
-                return super().interp_stmts(ss, env)
+    @handles("exp", ast.List)
+    def interp_list(self, e, env):
+        return [self.interp_exp(e, env) for e in e.elts]
+
+    @handles("exp", ast.BinOp, ast.Mult)
+    def interp_mult(self, e, env):
+        l = self.interp_exp(e.left, env)
+        r = self.interp_exp(e.right, env)
+        return l * r
+
+    @handles("exp", ast.BinOp, ast.FloorDiv)
+    def interp_floor_div(self, e, env):
+        l = self.interp_exp(e.left, env)
+        r = self.interp_exp(e.right, env)
+        aq = abs(l) // abs(r)
+        return aq if l * r >= 0 else -aq
+
+    @handles("exp", ast.BinOp, ast.Mod)
+    def interp_mod(self, e, env):
+        l = self.interp_exp(e.left, env)
+        r = self.interp_exp(e.right, env)
+        ar = abs(l) % abs(r)
+        return ar if l >= 0 else -ar
+
+    @handles("exp", ast.BinOp, ast.LShift)
+    def interp_lshift(self, e, env):
+        l = self.interp_exp(e.left, env)
+        r = self.interp_exp(e.right,env)
+        return l << r
+
+    @handles("exp", ast.BinOp, ast.RShift)
+    def interp_rshift(self, e, env):
+        l = self.interp_exp(e.left, env)
+        r = self.interp_exp(e.right,env)
+        return l >> r
+
+    @handles("exp", ast.BinOp, ast.BitOr)
+    def interp_bit_or(self, e, env):
+        l = self.interp_exp(e.left, env)
+        r = self.interp_exp(e.right, env)
+        return l | r
+
+    @handles("exp", ast.BinOp, ast.BitXor)
+    def interp_bit_xor(self, e, env):
+        l = self.interp_exp(e.left, env)
+        r = self.interp_exp(e.right,env)
+        return l ^ r
+
+    @handles("exp", ast.BinOp, ast.BitAnd)
+    def interp_bit_and(self, e, env):
+        l = self.interp_exp(e.left, env)
+        r = self.interp_exp(e.right,env)
+        return l & r
+
+    @handles("exp", ast.Call, "array_len")
+    def interp_array_len(self, e, env):
+        t = self.interp_exp(e.args[0], env)
+        return len(t)
+
+    @handles("exp", ast.Call, "array_load")
+    def interp_array_load(self, e, env):
+        [tup, index] = e.args
+        t = self.interp_exp(tup, env)
+        i = self.interp_exp(index, env)
+        return t[i]
+
+    @handles("exp", ast.Call, "array_store")
+    def interp_array_store(self, e, env):
+        [tup, index, value] = e.args
+        t = self.interp_exp(tup, env)
+        i = self.interp_exp(index, env)
+        v = self.interp_exp(value, env)
+        t[i] = v
+        return None
+
+    @handles("stmt", ast.Assign, ast.Subscript)
+    def interp_assign_subscript(self, s, env):
+        lst = self.interp_exp(s.targets[0].value, env)
+        index = self.interp_exp(s.targets[0].slice, env)
+        if index < 0:
+            raise IndexError("less than zero")
+        lst[index] = self.interp_exp(s.value, env)
@@ -0,0 +1,113 @@
+import ast
+import utils
+import sink
+import watchdog
+from interp_Lexam_closure import (
+    InterpLexamClosure,
+    Scope,
+    ReturnValue,
+    assigned_names,
+)
+
+# The closure compiling interpreter for C_exam, with the same behavior
+# as InterpCexam. Every basic block is compiled into one closure; a
+# block returns the name of the block to jump to, a ReturnValue or a
+# TailCallValue.
+
+
+class TailCallValue:
+    __slots__ = ("fun", "args")
+
+    def __init__(self, fun, args):
+        self.fun = fun
+        self.args = args
+
+
+class BlocksFunction:
+    __slots__ = ("name", "arity", "size", "blocks", "start")
+
+    def __init__(self, name, arity, size):
+        self.name = name
+        self.arity = arity
+        self.size = size
+        self.blocks = {}
+        self.start = None
+
+    def __repr__(self):
+        return "Function(" + self.name + ", ...)"
+
+    def new_frame(self, args):
+        if len(args) != self.arity:
+            args = (args + [None] * self.arity)[: self.arity]
+        return args + [None] * (self.size - self.arity)
+
+    def call(self, args):
+        fun = self
+        frame = fun.new_frame(args)
+        label = fun.start
+        budget = watchdog.current
+        while True:
+            budget.steps += 1
+            if budget.steps >= budget.next_check:
+                budget.check()
+            r = fun.blocks[label](frame)
+            if r.__class__ is str:
+                label = r
+            elif r.__class__ is ReturnValue:
+                return r.value
+            elif r.__class__ is TailCallValue:
+                fun = r.fun
+                frame = fun.new_frame(r.args)
+                label = fun.start
+            else:
+                raise Exception(
+                    "apply_fun: block " + label + " of " + fun.name + " ended without return"
+                )
+
+
+class InterpCexamClosure(InterpLexamClosure):
+    def compile_exp(self, e, scope):
+        match e:
+            case ast.Tuple(es, ast.Load()):
+                es = [self.compile_exp(e, scope) for e in es]
+                return lambda frame: tuple([e(frame) for e in es])
+            case _:
+                return super().compile_exp(e, scope)
+
+    def compile_stmt(self, s, scope):
+        match s:
+            case utils.Goto(label):
+                target = str(utils.Label(label))
+                return lambda frame: target
+            case utils.TailCall(func, args):
+                f = self.compile_exp(func, scope)
+                args = [self.compile_exp(arg, scope) for arg in args]
+                return lambda frame: TailCallValue(f(frame), [arg(frame) for arg in args])
+            case _:
+                return super().compile_stmt(s, scope)
+
+    def compile_blocks_function(self, name, params, blocks, outer):
+        xs = [x for (x, t) in params]
+        scope = Scope(xs + assigned_names(blocks, []), outer)
+        fun = BlocksFunction(name, len(xs), scope.size())
+        for (label, ss) in blocks.items():
+            fun.blocks[str(label)] = self.compile_stmts(ss, scope)
+        fun.start = str(utils.Label(name + "start"))
+        return fun
+
+    def interp(self, p):
+        match p:
+            case utils.CProgramDefs(defs):
+                names = [d.name for d in defs]
+                scope = Scope(names)
+                scope.frame = [None] * scope.size()
+                for d in defs:
+                    match d:
+                        case ast.FunctionDef(name, params, blocks):
+                            scope.frame[scope.slots[name]] = self.compile_blocks_function(
+                                name, params, blocks, scope
+                            )
+                scope.frame[scope.slots["main"]].call([])
+                sink.flush()
+            case _:
+                raise self.error("interp: unexpected ", p)
@@ -1,10 +1,85 @@
 import ast
 from interp_Ctup import InterpCtup
 import utils
-from interp_Lfun import Function
+import sink
+from interp_Lfun import Frame, Function
+from dispatch import handles
+
+
+# Counts, when the interpreter profiles the program, the calls of every
+# function and the entries into every block, together with the number
+# of statements executed. The source line of a block is the first line
+# of the source program that the nodes of the block still carry, if
+# any; the passes do not keep the location of the nodes they rebuild.
+class BlockProfile:
+    def __init__(self):
+        # function name -> [calls, tail calls]
+        self.calls: dict[str, list[int]] = {}
+        # (function name, label) -> [entries, statements, source line]
+        self.blocks: dict[tuple[str, str], list] = {}
+
+    def call(self, name: str, tail: bool = False):
+        counts = self.calls.setdefault(name, [0, 0])
+        counts[1 if tail else 0] += 1
+
+    def enter(self, name: str, label: str, ss):
+        counts = self.blocks.get((name, label))
+        if counts is None:
+            counts = self.blocks[(name, label)] = [0, 0, source_line(ss)]
+        counts[0] += 1
+        counts[1] += len(ss)
+
+    # The profile as a dict that can be written as JSON, with the blocks
+    # sorted from the one that executed the most statements down, and at
+    # most `top` of them.
+    def report(self, top: int | None = None) -> dict:
+        functions = {}
+        for (name, (calls, tail_calls)) in self.calls.items():
+            functions[name] = {
+                "calls": calls,
+                "tail_calls": tail_calls,
+                "block_entries": 0,
+                "statements": 0,
+            }
+        blocks = []
+        for ((name, label), (entries, statements, line)) in self.blocks.items():
+            functions[name]["block_entries"] += entries
+            functions[name]["statements"] += statements
+            blocks.append(
+                {
+                    "function": name,
+                    "label": label,
+                    "asm_label": str(utils.Label(label)),
+                    "entries": entries,
+                    "statements": statements,
+                    "line": line,
+                }
+            )
+        blocks.sort(key=lambda b: (-b["statements"], -b["entries"], b["label"]))
+        return {"functions": functions, "blocks": blocks[:top]}
+
+
+def source_line(ss) -> int | None:
+    lines = [
+        node.lineno
+        for s in ss
+        for node in ast.walk(s)
+        if getattr(node, "lineno", None) is not None
+    ]
+    return min(lines) if lines else None
 
 
 class InterpCfun(InterpCtup):
+    def __init__(self, profile: BlockProfile | None = None):
+        self.profile = profile
+
+    # Maps the labels that Goto statements name to the statements of the
+    # blocks, so that a jump is a lookup with a plain string, without
+    # building a Label.
+    def block_table(self, blocks):
+        prefix = len(utils.LABEL_PREPEND)
+        return {str(label)[prefix:]: ss for (label, ss) in blocks.items()}
+
     def apply_fun(self, fun, args, e):
         match fun:
             case Function(name, xs, blocks, env):
@@ -12,57 +87,73 @@ class InterpCfun(InterpCtup):
                 self.blocks = blocks
                 # trace('apply_fun ' + name)
                 # trace(blocks.keys())
-                new_env = env.copy()
+                new_env = Frame(env)
                 for (x, arg) in zip(xs, args):
                     new_env[x] = arg
 
-                next_label = name + "start"
+                profile = self.profile
+                if profile is not None:
+                    profile.call(name)
+                label = name + "start"
+                ss = blocks[label]
                 ret = None
                 while True:
-                    r = self.interp_stmts(blocks[utils.Label(next_label)], new_env)
+                    if profile is not None:
+                        profile.enter(name, label, ss)
+                    r = self.interp_stmts(ss, new_env)
                     match r:
                         case utils.Goto(label):
-                            next_label = label
-                        case utils.TailCallHelper(func, args, env):
-                            new_env = env.copy()
+                            ss = blocks[label]
+                        case utils.TailCallHelper(func, args, _):
+                            if func is not fun:
+                                fun = func
+                                (name, xs, blocks, env) = (
+                                    func.name,
+                                    func.params,
+                                    func.body,
+                                    func.env,
+                                )
+                                self.blocks = blocks
+                                new_env = Frame(env)
+                            # a tail call to the same function reuses its frame
                             for (x, arg) in zip(xs, args):
                                 new_env[x] = arg
-                            next_label = getattr(func, "name") + "start"
+                            if profile is not None:
+                                profile.call(name, tail=True)
+                            label = name + "start"
+                            ss = blocks[label]
                         case ast.Return(retval):
                             ret = retval
                             break
+                        case None:
+                            raise Exception(
+                                "apply_fun: a block of "
+                                + name
+                                + " ended without return"
+                            )
 
                 self.blocks = old_blocks
                 return ret
             case _:
                 raise Exception("apply_fun: unexpected: " + repr(fun))
 
-    def interp_exp(self, e, env):
-        match e:
-            case ast.Call(ast.Name("input_int"), []):
-                return super().interp_exp(e, env)
-            case ast.Call(ast.Name("len"), [tup]):
-                return super().interp_exp(e, env)
-            case ast.Call(func, args):
-                f = self.interp_exp(func, env)
-                vs = [self.interp_exp(arg, env) for arg in args]
-                return self.apply_fun(f, vs, e)
-            case utils.FunRef(id, arity):
-                return env[id]
-            case _:
-                return super().interp_exp(e, env)
-
-    def interp_stmts(self, ss, env):
-        if len(ss) == 0:
-            raise Exception("interp_stmts function ended without return")
-        match ss[0]:
-            case utils.TailCall(func, args):
-                # return self.interp_exp(ast.Call(func, args), env)
-                f = self.interp_exp(func, env)
-                vs = [self.interp_exp(arg, env) for arg in args]
-                return utils.TailCallHelper(f, vs, env)  # type: ignore
-            case _:
-                return super().interp_stmts(ss, env)
+    # input_int and len are handled by the handlers registered for them
+    @handles("exp", ast.Call)
+    def interp_call(self, e, env):
+        f = self.interp_exp(e.func, env)
+        vs = [self.interp_exp(arg, env) for arg in e.args]
+        return self.apply_fun(f, vs, e)
+
+    @handles("exp", utils.FunRef)
+    def interp_fun_ref(self, e, env):
+        return env[e.name]
+
+    @handles("stmt", utils.TailCall)
+    def interp_tail_call(self, s, env):
+        # return self.interp_exp(ast.Call(s.func, s.args), env)
+        f = self.interp_exp(s.func, env)
+        vs = [self.interp_exp(arg, env) for arg in s.args]
+        return utils.TailCallHelper(f, vs, env)  # type: ignore
 
     def interp(self, p):
         match p:
@@ -74,9 +165,13 @@ class InterpCfun(InterpCtup):
                             name, params, blocks, dl, returns, comment
                         ):
                             env[name] = Function(
-                                name, [x for (x, t) in params], blocks, env  # type: ignore
+                                name,
+                                [x for (x, t) in params],  # type: ignore
+                                self.block_table(blocks),
+                                env,
                             )
                 self.blocks = {}
                 self.apply_fun(env["main"], [], None)
+                sink.flush()
             case _:
                 raise Exception("interp: unexpected " + repr(p))
@@ -1,20 +1,19 @@
 import ast
 from interp_Lif import InterpLif
 import utils
+import sink
+from dispatch import handles
 
 
 class InterpCif(InterpLif):
-    def interp_stmts(self, ss, env):
-        if len(ss) == 0:
-            return
-        match ss[0]:
-            case ast.Return(value):
-                return ast.Return(self.interp_exp(value, env))
-            case utils.Goto(label):
-                return utils.Goto(label)
-                # return self.interp_stmts(self.blocks[label_name(label)], env)
-            case _:
-                return super().interp_stmts(ss, env)
+    @handles("stmt", ast.Return)
+    def interp_return(self, s, env):
+        return ast.Return(self.interp_exp(s.value, env))
+
+    @handles("stmt", utils.Goto)
+    def interp_goto(self, s, env):
+        # the node itself is the signal, so a jump allocates nothing
+        return s
 
     def interp(self, p):
         match p:
@@ -24,3 +23,4 @@ class InterpCif(InterpLif):
                 r = self.interp_stmts(blocks[utils.Label("start")], env)
                 while isinstance(r, utils.Goto):
                     r = self.interp_stmts(self.blocks[utils.Label(r.label)], env)
+                sink.flush()
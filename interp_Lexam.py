@@ -2,73 +2,93 @@ from ast import *
 import math
 from interp_Lfun import InterpLfun
 from utils import *
+from dispatch import handles
 
 class InterpLexam(InterpLfun):
 
-  def interp_exp(self, e, env):
-    match e:
-      case AllocateArray(length, typ):  # FIXED
-          length = self.interp_exp(length, env)
-          return [None] * length
-      case ast.List(es, ast.Load()):
-          return [self.interp_exp(e, env) for e in es]
-      case Subscript(tup, Slice(lower, upper), Load()):
-          t = self.interp_exp(tup, env)
-          l = self.interp_exp(lower, env)
-          u = self.interp_exp(upper, env)
-          return t[l:u]
-      case BinOp(left, Mult(), right):
-          l = self.interp_exp(left, env); r = self.interp_exp(right, env)
-          return l * r
-      case BinOp(left, FloorDiv(), right):
-          l = self.interp_exp(left, env); r = self.interp_exp(right, env)
-          aq = abs(l) // abs(r)
-          return aq if l * r >=0 else -aq
-      case BinOp(left, Mod(), right):
-          l = self.interp_exp(left, env); r = self.interp_exp(right, env)
-          ar = abs(l) % abs(r)
-          return ar if l >=0 else -ar
-      case BinOp(left, LShift(), right):
-          l = self.interp_exp(left, env); r = self.interp_exp(right,env)
-          return l << r
-      case BinOp(left, RShift(), right):
-          l = self.interp_exp(left, env); r = self.interp_exp(right,env)
-          return l >> r
-      case BinOp(left, BitOr(), right):
-          l = self.interp_exp(left, env); r = self.interp_exp(right, env)
-          return l | r
-      case BinOp(left, BitXor(), right):
-          l = self.interp_exp(left, env); r = self.interp_exp(right,env)
-          return l ^ r
-      case BinOp(left, BitAnd(), right):
-          l = self.interp_exp(left, env); r = self.interp_exp(right,env)
-          return l & r
-      case Call(Name('array_len'), [tup]):
-        t = self.interp_exp(tup, env)
-        return len(t)
-      case Call(Name('array_load'), [tup, index]):
-        t = self.interp_exp(tup, env)
-        i = self.interp_exp(index, env)
-        return t[i]
-      case Call(Name('array_store'), [tup, index, value]):
-        t = self.interp_exp(tup, env)
-        i = self.interp_exp(index, env)
-        v = self.interp_exp(value, env)
-        t[i] = v
-        return None
-      case _:
-        return super().interp_exp(e, env)
-
-  def interp_stmts(self, ss, env):
-    if len(ss) == 0:
-      return
-    match ss[0]:
-      case Assign([Subscript(lst, index)], value):
-        lst = self.interp_exp(lst, env)
-        index = self.interp_exp(index, env)
-        if index < 0:
-            raise IndexError('less than zero')
-        lst[index] = self.interp_exp(value, env)
-        return self.interp_stmts(ss[1:], env)
-      case _:
-        return super().interp_stmts(ss, env)
+  @handles("exp", AllocateArray)
+  def interp_allocate_array(self, e, env):  # FIXED
+      length = self.interp_exp(e.length, env)
+      return [None] * length
+
+  @handles("exp", ast.List)
+  def interp_list(self, e, env):
+      return [self.interp_exp(e, env) for e in e.elts]
+
+  @handles("exp", Subscript, Slice)
+  def interp_slice(self, e, env):
+      t = self.interp_exp(e.value, env)
+      l = self.interp_exp(e.slice.lower, env)
+      u = self.interp_exp(e.slice.upper, env)
+      return t[l:u]
+
+  @handles("exp", BinOp, Mult)
+  def interp_mult(self, e, env):
+      l = self.interp_exp(e.left, env); r = self.interp_exp(e.right, env)
+      return l * r
+
+  @handles("exp", BinOp, FloorDiv)
+  def interp_floor_div(self, e, env):
+      l = self.interp_exp(e.left, env); r = self.interp_exp(e.right, env)
+      aq = abs(l) // abs(r)
+      return aq if l * r >=0 else -aq
+
+  @handles("exp", BinOp, Mod)
+  def interp_mod(self, e, env):
+      l = self.interp_exp(e.left, env); r = self.interp_exp(e.right, env)
+      ar = abs(l) % abs(r)
+      return ar if l >=0 else -ar
+
+  @handles("exp", BinOp, LShift)
+  def interp_lshift(self, e, env):
+      l = self.interp_exp(e.left, env); r = self.interp_exp(e.right,env)
+      return l << r
+
+  @handles("exp", BinOp, RShift)
+  def interp_rshift(self, e, env):
+      l = self.interp_exp(e.left, env); r = self.interp_exp(e.right,env)
+      return l >> r
+
+  @handles("exp", BinOp, BitOr)
+  def interp_bit_or(self, e, env):
+      l = self.interp_exp(e.left, env); r = self.interp_exp(e.right, env)
+      return l | r
+
+  @handles("exp", BinOp, BitXor)
+  def interp_bit_xor(self, e, env):
+      l = self.interp_exp(e.left, env); r = self.interp_exp(e.right,env)
+      return l ^ r
+
+  @handles("exp", BinOp, BitAnd)
+  def interp_bit_and(self, e, env):
+      l = self.interp_exp(e.left, env); r = self.interp_exp(e.right,env)
+      return l & r
+
+  @handles("exp", Call, 'array_len')
+  def interp_array_len(self, e, env):
+    t = self.interp_exp(e.args[0], env)
+    return len(t)
+
+  @handles("exp", Call, 'array_load')
+  def interp_array_load(self, e, env):
+    [tup, index] = e.args
+    t = self.interp_exp(tup, env)
+    i = self.interp_exp(index, env)
+    return t[i]
+
+  @handles("exp", Call, 'array_store')
+  def interp_array_store(self, e, env):
+    [tup, index, value] = e.args
+    t = self.interp_exp(tup, env)
+    i = self.interp_exp(index, env)
+    v = self.interp_exp(value, env)
+    t[i] = v
+    return None
+
+  @handles("stmt", Assign, Subscript)
+  def interp_assign_subscript(self, s, env):
+    lst = self.interp_exp(s.targets[0].value, env)
+    index = self.interp_exp(s.targets[0].slice, env)
+    if index < 0:
+        raise IndexError('less than zero')
+    lst[index] = self.interp_exp(s.value, env)
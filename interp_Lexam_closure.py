@@ -0,0 +1,445 @@
+import ast
+import dataclasses
+import utils
+import sink
+import watchdog
+
+# A faster interpreter for L_exam with the same behavior as InterpLexam.
+#
+# InterpLexam matches every node against the chain of cases of all its
+# superclasses each time the node is evaluated. This interpreter instead
+# compiles the program once into nested Python closures, with the
+# operators chosen and the variables resolved to slots at compile time,
+# and then runs the closures.
+#
+# Every function call gets a frame, a list with a slot for each
+# parameter and local variable of the function. The top level of the
+# module has a frame of its own, which the functions read their free
+# variables (the functions themselves) from. The compiled expressions
+# and statements take the frame as their only argument.
+#
+# A compiled statement returns None, or a control signal as in
+# InterpLfun.interp_stmts: a ReturnValue, BREAK or CONTINUE.
+
+
+class ReturnValue:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return "ReturnValue(" + repr(self.value) + ")"
+
+
+BREAK = ast.Break()
+CONTINUE = ast.Continue()
+
+
+def floor_div(l, r):
+    # truncates toward zero, like idivq
+    aq = abs(l) // abs(r)
+    return aq if l * r >= 0 else -aq
+
+
+def mod(l, r):
+    # takes the sign of the dividend, like idivq
+    ar = abs(l) % abs(r)
+    return ar if l >= 0 else -ar
+
+
+def children(node):
+    if dataclasses.is_dataclass(node):
+        return [getattr(node, f.name) for f in dataclasses.fields(node)]
+    if isinstance(node, ast.AST):
+        return [getattr(node, f, None) for f in node._fields]
+    return []
+
+
+# Collects the variables that are assigned in `node`, in order. The
+# bodies of function definitions are scopes of their own; only the name
+# of the function is collected.
+def assigned_names(node, names: list[str]) -> list[str]:
+    match node:
+        case list():
+            for n in node:
+                assigned_names(n, names)
+        case dict():
+            for n in node.values():
+                assigned_names(n, names)
+        case ast.Assign([ast.Name(x)], value):
+            names.append(x)
+            assigned_names(value, names)
+        case ast.FunctionDef(name):
+            names.append(name)
+        case _:
+            for child in children(node):
+                assigned_names(child, names)
+    return names
+
+
+# The variables of a function (or of the top level) and their slots in
+# the frame. `frame` is the frame of the top level, which exists at
+# compile time already; it is None for functions.
+class Scope:
+    def __init__(self, names, outer=None, frame=None):
+        self.slots: dict[str, int] = {}
+        for x in names:
+            self.slots.setdefault(x, len(self.slots))
+        self.outer = outer
+        self.frame = frame
+
+    def size(self) -> int:
+        return len(self.slots)
+
+
+class Function:
+    __slots__ = ("name", "arity", "size", "body")
+
+    def __init__(self, name, arity, size, body=None):
+        self.name = name
+        self.arity = arity
+        self.size = size
+        self.body = body
+
+    def __repr__(self):
+        return "Function(" + self.name + ", ...)"
+
+    def new_frame(self, args):
+        if len(args) != self.arity:
+            args = (args + [None] * self.arity)[: self.arity]
+        return args + [None] * (self.size - self.arity)
+
+    def call(self, args):
+        watchdog.current.step()
+        r = self.body(self.new_frame(args))
+        if r.__class__ is ReturnValue:
+            return r.value
+        if r is BREAK or r is CONTINUE:
+            raise Exception("illegal return from call: " + repr(r))
+        return r
+
+
+class InterpLexamClosure:
+    def error(self, message, node):
+        return Exception(
+            message
+            + repr(node)
+            + (("\nAST info 1: " + utils.ast_loc(node)) if isinstance(node, ast.AST) else "")
+        )
+
+    def compile_name(self, x, scope):
+        if x in scope.slots:
+            i = scope.slots[x]
+            return lambda frame: frame[i]
+        outer = scope.outer
+        if outer is not None and x in outer.slots:
+            outer_frame = outer.frame
+            i = outer.slots[x]
+            return lambda frame: outer_frame[i]
+
+        def unbound(frame):
+            raise KeyError(x)
+
+        return unbound
+
+    def compile_cmp(self, cmp, l, r):
+        match cmp:
+            case ast.Eq():
+                return lambda frame: l(frame) == r(frame)
+            case ast.NotEq():
+                return lambda frame: l(frame) != r(frame)
+            case ast.Lt():
+                return lambda frame: l(frame) < r(frame)
+            case ast.LtE():
+                return lambda frame: l(frame) <= r(frame)
+            case ast.Gt():
+                return lambda frame: l(frame) > r(frame)
+            case ast.GtE():
+                return lambda frame: l(frame) >= r(frame)
+            case ast.Is():
+                return lambda frame: l(frame) is r(frame)
+            case _:
+                raise self.error("compile_cmp: unexpected ", cmp)
+
+    def compile_binop(self, op, l, r):
+        match op:
+            case ast.Add():
+                return lambda frame: l(frame) + r(frame)
+            case ast.Sub():
+                return lambda frame: l(frame) - r(frame)
+            case ast.Mult():
+                return lambda frame: l(frame) * r(frame)
+            case ast.FloorDiv():
+                return lambda frame: floor_div(l(frame), r(frame))
+            case ast.Mod():
+                return lambda frame: mod(l(frame), r(frame))
+            case ast.LShift():
+                return lambda frame: l(frame) << r(frame)
+            case ast.RShift():
+                return lambda frame: l(frame) >> r(frame)
+            case ast.BitOr():
+                return lambda frame: l(frame) | r(frame)
+            case ast.BitXor():
+                return lambda frame: l(frame) ^ r(frame)
+            case ast.BitAnd():
+                return lambda frame: l(frame) & r(frame)
+            case _:
+                raise self.error("compile_binop: unexpected ", op)
+
+    def compile_exp(self, e, scope):
+        match e:
+            case ast.Constant(value):
+                return lambda frame: value
+            case ast.Name(x):
+                return self.compile_name(x, scope)
+            case utils.FunRef(x, arity):
+                return self.compile_name(x, scope)
+            case ast.BinOp(left, op, right):
+                l = self.compile_exp(left, scope)
+                r = self.compile_exp(right, scope)
+                return self.compile_binop(op, l, r)
+            case ast.UnaryOp(ast.USub(), v):
+                v = self.compile_exp(v, scope)
+                return lambda frame: -v(frame)
+            case ast.UnaryOp(ast.Not(), v):
+                v = self.compile_exp(v, scope)
+                return lambda frame: not v(frame)
+            case ast.Compare(left, [cmp], [right]):
+                l = self.compile_exp(left, scope)
+                r = self.compile_exp(right, scope)
+                return self.compile_cmp(cmp, l, r)
+            case ast.IfExp(test, body, orelse):
+                test = self.compile_exp(test, scope)
+                body = self.compile_exp(body, scope)
+                orelse = self.compile_exp(orelse, scope)
+
+                def if_exp(frame):
+                    t = test(frame)
+                    if t is True:
+                        return body(frame)
+                    if t is False:
+                        return orelse(frame)
+
+                return if_exp
+            case ast.BoolOp(ast.And(), [left, right]):
+                l = self.compile_exp(left, scope)
+                r = self.compile_exp(right, scope)
+
+                def and_exp(frame):
+                    t = l(frame)
+                    if t is True:
+                        return r(frame)
+                    if t is False:
+                        return False
+
+                return and_exp
+            case ast.BoolOp(ast.Or(), [left, right]):
+                l = self.compile_exp(left, scope)
+                r = self.compile_exp(right, scope)
+
+                def or_exp(frame):
+                    t = l(frame)
+                    if t is True:
+                        return True
+                    if t is False:
+                        return r(frame)
+
+                return or_exp
+            case utils.Begin(ss, result):
+                body = self.compile_stmts(ss, scope)
+                result = self.compile_exp(result, scope)
+
+                def begin(frame):
+                    body(frame)
+                    return result(frame)
+
+                return begin
+            case ast.Tuple(es, ast.Load()) | ast.List(es, ast.Load()):
+                # use a list for mutability
+                es = [self.compile_exp(e, scope) for e in es]
+                return lambda frame: [e(frame) for e in es]
+            case ast.Subscript(tup, ast.Slice(lower, upper), ast.Load()):
+                t = self.compile_exp(tup, scope)
+                l = self.compile_exp(lower, scope)
+                u = self.compile_exp(upper, scope)
+                return lambda frame: t(frame)[l(frame) : u(frame)]
+            case ast.Subscript(tup, index, ast.Load()):
+                t = self.compile_exp(tup, scope)
+                index = self.compile_exp(index, scope)
+
+                def subscript(frame):
+                    tup = t(frame)
+                    n = index(frame)
+                    if n < 0:
+                        raise IndexError("less than zero")
+                    return tup[n]
+
+                return subscript
+            case utils.Allocate(length, typ):
+                return lambda frame: [None] * length
+            case utils.AllocateArray(length, typ):
+                length = self.compile_exp(length, scope)
+                return lambda frame: [None] * length(frame)
+            case utils.GlobalValue(name):
+                return lambda frame: 0
+            case ast.Call(ast.Name("input_int"), []):
+                return lambda frame: sink.read_int()
+            case ast.Call(ast.Name("len" | "array_len"), [tup]):
+                t = self.compile_exp(tup, scope)
+                return lambda frame: len(t(frame))
+            case ast.Call(ast.Name("array_load"), [tup, index]):
+                t = self.compile_exp(tup, scope)
+                i = self.compile_exp(index, scope)
+                return lambda frame: t(frame)[i(frame)]
+            case ast.Call(ast.Name("array_store"), [tup, index, value]):
+                t = self.compile_exp(tup, scope)
+                i = self.compile_exp(index, scope)
+                v = self.compile_exp(value, scope)
+
+                def array_store(frame):
+                    tup = t(frame)
+                    index = i(frame)
+                    tup[index] = v(frame)
+
+                return array_store
+            case ast.Call(ast.Name("print"), args):
+                raise self.error("compile_exp: unexpected ", e)
+            case ast.Call(func, args):
+                f = self.compile_exp(func, scope)
+                args = [self.compile_exp(arg, scope) for arg in args]
+                return lambda frame: f(frame).call([arg(frame) for arg in args])
+            case _:
+                raise self.error("compile_exp: unexpected ", e)
+
+    # Returns the compiled statement, or None if it does nothing.
+    def compile_stmt(self, s, scope):
+        match s:
+            case ast.Expr(ast.Call(ast.Name("print"), [arg])):
+                arg = self.compile_exp(arg, scope)
+
+                def print_stmt(frame):
+                    sink.emit(arg(frame))
+
+                return print_stmt
+            case ast.Expr(value):
+                value = self.compile_exp(value, scope)
+
+                def exp_stmt(frame):
+                    value(frame)
+
+                return exp_stmt
+            case ast.Assign([ast.Name(x)], value):
+                i = scope.slots[x]
+                value = self.compile_exp(value, scope)
+
+                def assign(frame):
+                    frame[i] = value(frame)
+
+                return assign
+            case ast.Assign([ast.Subscript(lst, index)], value):
+                lst = self.compile_exp(lst, scope)
+                index = self.compile_exp(index, scope)
+                value = self.compile_exp(value, scope)
+
+                def assign_subscript(frame):
+                    l = lst(frame)
+                    i = index(frame)
+                    if i < 0:
+                        raise IndexError("less than zero")
+                    l[i] = value(frame)
+
+                return assign_subscript
+            case ast.If(test, body, orelse):
+                test = self.compile_exp(test, scope)
+                body = self.compile_stmts(body, scope)
+                orelse = self.compile_stmts(orelse, scope)
+
+                def if_stmt(frame):
+                    t = test(frame)
+                    if t is True:
+                        return body(frame)
+                    if t is False:
+                        return orelse(frame)
+
+                return if_stmt
+            case ast.While(test, body, []):
+                test = self.compile_exp(test, scope)
+                body = self.compile_stmts(body, scope)
+
+                def while_stmt(frame):
+                    budget = watchdog.current
+                    while test(frame):
+                        budget.steps += 1
+                        if budget.steps >= budget.next_check:
+                            budget.check()
+                        r = body(frame)
+                        if r is None or r is CONTINUE:
+                            continue
+                        if r is BREAK:
+                            break
+                        return r
+
+                return while_stmt
+            case ast.Return(value):
+                value = self.compile_exp(value, scope)
+                return lambda frame: ReturnValue(value(frame))
+            case ast.Continue():
+                return lambda frame: CONTINUE
+            case ast.Break():
+                return lambda frame: BREAK
+            case ast.FunctionDef(name, params, body):
+                if scope.outer is not None:
+                    raise self.error("compile_stmt: nested function ", s)
+                i = scope.slots[name]
+                fun = self.compile_function(name, params, body, scope)
+
+                def function_def(frame):
+                    frame[i] = fun
+
+                return function_def
+            case utils.Collect(size):
+                return None
+            case _:
+                raise self.error("compile_stmt: unexpected ", s)
+
+    def compile_stmts(self, ss, scope):
+        codes = [self.compile_stmt(s, scope) for s in ss]
+        codes = [code for code in codes if code is not None]
+        if len(codes) == 0:
+            return lambda frame: None
+        if len(codes) == 1:
+            return codes[0]
+
+        def stmts(frame):
+            for code in codes:
+                r = code(frame)
+                if r is not None:
+                    return r
+
+        return stmts
+
+    def param_names(self, params) -> list[str]:
+        if isinstance(params, ast.arguments):
+            return [p.arg for p in params.args]
+        return [x for (x, t) in params]
+
+    def compile_function(self, name, params, body, outer):
+        xs = self.param_names(params)
+        scope = Scope(xs + assigned_names(body, []), outer)
+        fun = Function(name, len(xs), scope.size())
+        fun.body = self.compile_stmts(body, scope)
+        return fun
+
+    def interp(self, p):
+        match p:
+            case ast.Module(ss):
+                scope = Scope(assigned_names(ss, []))
+                scope.frame = [None] * scope.size()
+                code = self.compile_stmts(ss, scope)
+                code(scope.frame)
+                if "main" in scope.slots and scope.frame[scope.slots["main"]] is not None:
+                    scope.frame[scope.slots["main"]].call([])
+                sink.flush()
+            case _:
+                raise self.error("interp: unexpected ", p)
@@ -1,7 +1,9 @@
 import ast
 from typing import Optional
 import utils
+import sink
 from interp_Ltup import InterpLtup
+from dispatch import handles
 
 
 class Function:
@@ -17,70 +19,83 @@ class Function:
         return "Function(" + self.name + ", ...)"
 
 
+# The environment of a function call. It holds the parameters and the
+# local variables of the call; every other name is looked up in the
+# environment the function was defined in. That environment is shared
+# rather than copied, so a call costs the same however many functions
+# the program defines.
+class Frame(dict):
+    __slots__ = ("outer",)
+
+    def __init__(self, outer):
+        super().__init__()
+        self.outer = outer
+
+    def __missing__(self, x):
+        return self.outer[x]
+
+
 class InterpLfun(InterpLtup):
     def apply_fun(self, fun, args, e):
         match fun:
             case Function(name, xs, body, env):
-                new_env = {x: v for (x, v) in env.items()}
+                new_env = Frame(env)
                 for (x, arg) in zip(xs, args):
                     new_env[x] = arg
                 return self.interp_stmts(body, new_env)
             case _:
                 raise Exception("apply_fun: unexpected: " + repr(fun))
 
-    def interp_exp(self, e, env):
-        match e:
-            case ast.Call(ast.Name(f), args) \
-                if (f == "input_int") or (f == "len") or (f == "print"):
-                return super().interp_exp(e, env)
-            case ast.Call(func, args):
-                f = self.interp_exp(func, env)
-                vs = [self.interp_exp(arg, env) for arg in args]
-                r = self.apply_fun(f, vs, e)
-                match r:
-                    case ast.Return(v):
-                        return v
-                    case ast.Break() | ast.Continue():
-                        raise Exception("illegal return from call: " + repr(r))
-                    case _:
-                        return r
-            case utils.FunRef(id, arity):
-                return env[id]
-            case _:
-                return super().interp_exp(e, env)
-
-    def interp_stmts(self, ss, env) -> Optional[ast.Continue | ast.Break | ast.Return]:
-        if len(ss) == 0:
-            return
-        match ss[0]:
-            case ast.Return(value):
-                return ast.Return(self.interp_exp(value, env))
-            case ast.While(test, body, []):
-                while self.interp_exp(test, env):
-                    r = self.interp_stmts(body, env)
-                    if r is None:
-                        continue
-                    match r:
-                        case ast.Continue():
-                            continue
-                        case ast.Break():
-                            break
-                        case _:
-                            return r
-                return self.interp_stmts(ss[1:], env)
-            case ast.Continue():
-                return ast.Continue()
-            case ast.Break():
-                return ast.Break()
-            case ast.FunctionDef(name, params, bod, dl, returns, comment):
-                if isinstance(params, ast.arguments):
-                    ps = [p.arg for p in params.args]
-                else:
-                    ps = [x for (x, t) in params]  # type: ignore
-                env[name] = Function(name, ps, bod, env)
-                return self.interp_stmts(ss[1:], env)
+    @handles("exp", ast.Call)
+    def interp_call(self, e, env):
+        f = self.interp_exp(e.func, env)
+        vs = [self.interp_exp(arg, env) for arg in e.args]
+        r = self.apply_fun(f, vs, e)
+        match r:
+            case ast.Return(v):
+                return v
+            case ast.Break() | ast.Continue():
+                raise Exception("illegal return from call: " + repr(r))
             case _:
-                return super().interp_stmts(ss, env)
+                return r
+
+    @handles("exp", utils.FunRef)
+    def interp_fun_ref(self, e, env):
+        return env[e.name]
+
+    @handles("stmt", ast.Return)
+    def interp_return(self, s, env) -> ast.Return:
+        return ast.Return(self.interp_exp(s.value, env))
+
+    @handles("stmt", ast.While)
+    def interp_while(self, s, env) -> Optional[ast.Return]:
+        while self.interp_exp(s.test, env):
+            r = self.interp_stmts(s.body, env)
+            if r is None:
+                continue
+            match r:
+                case ast.Continue():
+                    continue
+                case ast.Break():
+                    break
+                case _:
+                    return r
+
+    @handles("stmt", ast.Continue)
+    def interp_continue(self, s, env) -> ast.Continue:
+        return ast.Continue()
+
+    @handles("stmt", ast.Break)
+    def interp_break(self, s, env) -> ast.Break:
+        return ast.Break()
+
+    @handles("stmt", ast.FunctionDef)
+    def interp_function_def(self, s, env):
+        if isinstance(s.args, ast.arguments):
+            ps = [p.arg for p in s.args.args]
+        else:
+            ps = [x for (x, t) in s.args]  # type: ignore
+        env[s.name] = Function(s.name, ps, s.body, env)
 
     def interp(self, p):
         match p:
@@ -90,6 +105,7 @@ class InterpLfun(InterpLtup):
                 # trace('interp global env: ' + repr(env))
                 if "main" in env.keys():
                     self.apply_fun(env["main"], [], None)
+                sink.flush()
             case _:
                 raise Exception(
                     "interp: unexpected "
@@ -1,6 +1,7 @@
 from ast import *
 from interp_Lvar import InterpLvar
 from utils import *
+from dispatch import handles
 
 class InterpLif(InterpLvar):
 
@@ -19,54 +20,58 @@ class InterpLif(InterpLvar):
       case NotEq():
         return lambda x, y: x != y
 
-  def interp_exp(self, e, env):
-    match e:
-      case IfExp(test, body, orelse):
-        match self.interp_exp(test, env):
-          case True:
-            return self.interp_exp(body, env)
-          case False:
-            return self.interp_exp(orelse, env)
-      case UnaryOp(Not(), v):
-        return not self.interp_exp(v, env)
-      case BoolOp(And(), values):
-        left = values[0]; right = values[1]
-        match self.interp_exp(left, env):
-          case True:
-            return self.interp_exp(right, env)
-          case False:
-            return False
-      case BoolOp(Or(), values):
-        left = values[0]; right = values[1]
-        match self.interp_exp(left, env):
-          case True:
-            return True
-          case False:
-            return self.interp_exp(right, env)
-      case Compare(left, [cmp], [right]):
-        l = self.interp_exp(left, env)
-        r = self.interp_exp(right, env)
-        return self.interp_cmp(cmp)(l, r)
-      # case Let(Name(x), rhs, body):
-      #   v = self.interp_exp(rhs, env)
-      #   new_env = dict(env)
-      #   new_env[x] = v
-      #   return self.interp_exp(body, new_env)
-      case Begin(ss, e):
-        self.interp_stmts(ss, env)
-        return self.interp_exp(e, env)
-      case _:
-        return super().interp_exp(e, env)
+  @handles("exp", IfExp)
+  def interp_if_exp(self, e, env):
+    match self.interp_exp(e.test, env):
+      case True:
+        return self.interp_exp(e.body, env)
+      case False:
+        return self.interp_exp(e.orelse, env)
 
-  def interp_stmts(self, ss, env):
-    if len(ss) == 0:
-      return
-    match ss[0]:
-      case If(test, body, orelse):
-        match self.interp_exp(test, env):
-          case True:
-            return self.interp_stmts(body + ss[1:], env)
-          case False:
-            return self.interp_stmts(orelse + ss[1:], env)
-      case _:
-        return super().interp_stmts(ss, env)
+  @handles("exp", UnaryOp, Not)
+  def interp_not(self, e, env):
+    return not self.interp_exp(e.operand, env)
+
+  @handles("exp", BoolOp, And)
+  def interp_and(self, e, env):
+    left = e.values[0]; right = e.values[1]
+    match self.interp_exp(left, env):
+      case True:
+        return self.interp_exp(right, env)
+      case False:
+        return False
+
+  @handles("exp", BoolOp, Or)
+  def interp_or(self, e, env):
+    left = e.values[0]; right = e.values[1]
+    match self.interp_exp(left, env):
+      case True:
+        return True
+      case False:
+        return self.interp_exp(right, env)
+
+  @handles("exp", Compare)
+  def interp_compare(self, e, env):
+    l = self.interp_exp(e.left, env)
+    r = self.interp_exp(e.comparators[0], env)
+    return self.interp_cmp(e.ops[0])(l, r)
+
+  # @handles("exp", Let)
+  # def interp_let(self, e, env):
+  #   v = self.interp_exp(e.rhs, env)
+  #   new_env = dict(env)
+  #   new_env[e.var.id] = v
+  #   return self.interp_exp(e.body, new_env)
+
+  @handles("exp", Begin)
+  def interp_begin(self, e, env):
+    self.interp_stmts(e.body, env)
+    return self.interp_exp(e.result, env)
+
+  @handles("stmt", If)
+  def interp_if(self, s, env):
+    match self.interp_exp(s.test, env):
+      case True:
+        return self.interp_stmts(s.body, env)
+      case False:
+        return self.interp_stmts(s.orelse, env)
@@ -1,5 +1,8 @@
 import ast
 import utils
+import sink
+import watchdog
+from dispatch import Dispatcher, handles
 
 
 def interp_exp(e):
@@ -17,7 +20,7 @@ def interp_exp(e):
         case ast.Constant(value):
             return value
         case ast.Call(ast.Name("input_int"), []):
-            return int(input())
+            return sink.read_int()
         case _:
             raise Exception(
                 "error in interp_exp, unexpected "
@@ -33,7 +36,7 @@ def interp_exp(e):
 def interp_stmt(s):
     match s:
         case ast.Expr(ast.Call(ast.Name("print"), [arg])):
-            print(interp_exp(arg))
+            sink.emit(str(interp_exp(arg)) + "\n")
         case ast.Expr(value):
             interp_exp(value)
 
@@ -43,63 +46,96 @@ def interp(p):
         case ast.Module(body):
             for s in body:
                 interp_stmt(s)
+            sink.flush()
 
 
 # This version is for InterpLvar to inherit from
-class InterpLint:
+class InterpLint(Dispatcher):
     def interp_exp(self, e, env):
-        match e:
-            case ast.BinOp(left, ast.Add(), right):
-                l = self.interp_exp(left, env)
-                r = self.interp_exp(right, env)
-                return l + r
-            case ast.BinOp(left, ast.Sub(), right):
-                l = self.interp_exp(left, env)
-                r = self.interp_exp(right, env)
-                return l - r
-            case ast.UnaryOp(ast.USub(), v):
-                return -self.interp_exp(v, env)
-            case ast.Constant(value):
-                return value
-            case ast.Call(ast.Name("input_int"), []):
-                return int(input())
-            case _:
-                raise Exception(
-                    "error in interp_exp, unexpected "
-                    + repr(e)
-                    + (
-                        ("\nAST info 1: " + utils.ast_loc(e))
-                        if isinstance(e, ast.AST)
-                        else ""
-                    )
-                )
+        return self.dispatch("exp", e, env)
+
+    @handles("exp", ast.BinOp, ast.Add)
+    def interp_add(self, e, env):
+        l = self.interp_exp(e.left, env)
+        r = self.interp_exp(e.right, env)
+        return l + r
+
+    @handles("exp", ast.BinOp, ast.Sub)
+    def interp_sub(self, e, env):
+        l = self.interp_exp(e.left, env)
+        r = self.interp_exp(e.right, env)
+        return l - r
+
+    @handles("exp", ast.UnaryOp, ast.USub)
+    def interp_neg(self, e, env):
+        return -self.interp_exp(e.operand, env)
+
+    @handles("exp", ast.Constant)
+    def interp_constant(self, e, env):
+        return e.value
+
+    @handles("exp", ast.Call, "input_int")
+    def interp_input_int(self, e, env):
+        return sink.read_int()
+
+    @handles("exp")
+    def interp_unexpected_exp(self, e, env):
+        raise Exception(
+            "error in interp_exp, unexpected "
+            + repr(e)
+            + (
+                ("\nAST info 1: " + utils.ast_loc(e))
+                if isinstance(e, ast.AST)
+                else ""
+            )
+        )
 
+    # Executes the statements one after the other. A statement may
+    # return a control signal (Return, Break and Continue, or Goto and
+    # TailCallHelper in the C interpreters); it stops the execution of
+    # the statements and is returned to the enclosing construct. Every
+    # statement is a step of the watchdog budget.
     def interp_stmts(self, ss, env):
-        if len(ss) == 0:
-            return
-        match ss[0]:
-            case ast.Expr(ast.Call(ast.Name("print"), [arg])):
-                val = self.interp_exp(arg, env)
-                print(val, end="")
-                return self.interp_stmts(ss[1:], env)
-            case ast.Expr(value):
-                self.interp_exp(value, env)
-                return self.interp_stmts(ss[1:], env)
-            case _:
-                raise Exception(
-                    "error in interp_stmts, unexpected "
-                    + repr(ss[0])
-                    + (
-                        ("\nAST info 1: " + utils.ast_loc(ss[0]))
-                        if isinstance(ss[0], ast.AST)
-                        else ""
-                    )
-                )
+        budget = watchdog.current
+        for s in ss:
+            budget.steps += 1
+            if budget.steps >= budget.next_check:
+                budget.check()
+            r = self.interp_stmt(s, env)
+            if r is not None:
+                return r
+        return None
+
+    def interp_stmt(self, s, env):
+        return self.dispatch("stmt", s, env)
+
+    @handles("stmt", ast.Expr, "print")
+    def interp_print(self, s, env):
+        [arg] = s.value.args
+        val = self.interp_exp(arg, env)
+        sink.emit(val)
+
+    @handles("stmt", ast.Expr)
+    def interp_expr_stmt(self, s, env):
+        self.interp_exp(s.value, env)
+
+    @handles("stmt")
+    def interp_unexpected_stmt(self, s, env):
+        raise Exception(
+            "error in interp_stmt, unexpected "
+            + repr(s)
+            + (
+                ("\nAST info 1: " + utils.ast_loc(s))
+                if isinstance(s, ast.AST)
+                else ""
+            )
+        )
 
     def interp(self, p):
         match p:
             case ast.Module(body):
                 self.interp_stmts(body, {})
+                sink.flush()
 
 
 if __name__ == "__main__":
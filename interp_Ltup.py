@@ -1,6 +1,7 @@
 from ast import *
 from interp_Lwhile import InterpLwhile
 from utils import *
+from dispatch import handles
 
 class InterpLtup(InterpLwhile):
 
@@ -11,41 +12,42 @@ class InterpLtup(InterpLwhile):
       case _:
         return super().interp_cmp(cmp)      
     
-  def interp_exp(self, e, env):
-    match e:
-      case Tuple(es, Load()):
-        # use a list for mutability
-        return [self.interp_exp(e, env) for e in es]
-      case Subscript(tup, index, Load()):
-        t = self.interp_exp(tup, env)
-        n = self.interp_exp(index, env)
-        if n < 0:
-          raise IndexError('less than zero')
-        return t[n]
-      case Call(Name('len'), [tup]):
-        t = self.interp_exp(tup, env)
-        return len(t)
-      case Allocate(length, typ):
-        array = [None] * length
-        return array
-      case GlobalValue(name):
-        return 0 # ???
-      case _:
-        return super().interp_exp(e, env)
-
-  def interp_stmts(self, ss, env):
-    if len(ss) == 0:
-      return
-    match ss[0]:
-      case Collect(size):
-        return self.interp_stmts(ss[1:], env)
-      case Assign([Subscript(tup, index)], value):
-        tup = self.interp_exp(tup, env)
-        index = self.interp_exp(index, env)
-        tup[index] = self.interp_exp(value, env)
-        return self.interp_stmts(ss[1:], env)
-      case _:
-        return super().interp_stmts(ss, env)
+  @handles("exp", Tuple)
+  def interp_tuple(self, e, env):
+    # use a list for mutability
+    return [self.interp_exp(e, env) for e in e.elts]
+
+  @handles("exp", Subscript)
+  def interp_subscript(self, e, env):
+    t = self.interp_exp(e.value, env)
+    n = self.interp_exp(e.slice, env)
+    if n < 0:
+      raise IndexError('less than zero')
+    return t[n]
+
+  @handles("exp", Call, 'len')
+  def interp_len(self, e, env):
+    t = self.interp_exp(e.args[0], env)
+    return len(t)
+
+  @handles("exp", Allocate)
+  def interp_allocate(self, e, env):
+    array = [None] * e.length
+    return array
+
+  @handles("exp", GlobalValue)
+  def interp_global_value(self, e, env):
+    return 0 # ???
+
+  @handles("stmt", Collect)
+  def interp_collect(self, s, env):
+    pass
+
+  @handles("stmt", Assign, Subscript)
+  def interp_assign_subscript(self, s, env):
+    tup = self.interp_exp(s.targets[0].value, env)
+    index = self.interp_exp(s.targets[0].slice, env)
+    tup[index] = self.interp_exp(s.value, env)
     
 if __name__ == "__main__":
   t1 = Tuple([Constant(1), Constant(2)], Load())
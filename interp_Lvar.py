@@ -1,30 +1,24 @@
 import ast
 import utils
+import sink
 from interp_Lint import InterpLint
+from dispatch import handles
 
 
 class InterpLvar(InterpLint):
-    def interp_exp(self, e, env):
-        match e:
-            case ast.Name(id):
-                return env[id]
-            case _:
-                return super().interp_exp(e, env)
+    @handles("exp", ast.Name)
+    def interp_name(self, e, env):
+        return env[e.id]
 
-    def interp_stmts(self, ss, env):
-        if len(ss) == 0:
-            return
-        match ss[0]:
-            case ast.Assign([lhs], value):
-                env[lhs.id] = self.interp_exp(value, env)  # type: ignore
-                return self.interp_stmts(ss[1:], env)
-            case _:
-                return super().interp_stmts(ss, env)
+    @handles("stmt", ast.Assign, ast.Name)
+    def interp_assign(self, s, env):
+        env[s.targets[0].id] = self.interp_exp(s.value, env)
 
     def interp(self, p):
         match p:
             case ast.Module(body):
                 self.interp_stmts(body, {})
+                sink.flush()
             case _:
                 raise Exception(
                     "interp: unexpected "
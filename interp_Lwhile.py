@@ -1,17 +1,11 @@
 from ast import *
 from interp_Lif import InterpLif
 from utils import *
+from dispatch import handles
 
 class InterpLwhile(InterpLif):
 
-  def interp_stmts(self, ss, env):
-    if len(ss) == 0:
-      return
-    match ss[0]:
-      case While(test, body, []):
-        while self.interp_exp(test, env):
-            self.interp_stmts(body, env)
-        return self.interp_stmts(ss[1:], env)
-      case _:
-        return super().interp_stmts(ss, env)
-    
+  @handles("stmt", While)
+  def interp_while(self, s, env):
+    while self.interp_exp(s.test, env):
+        self.interp_stmts(s.body, env)
@@ -1,75 +1,71 @@
-# Convert from the x86 AST classes defined in utils.py into the parse
-# tree format used by the interpreter.
+# Convert the parse trees of x86 text (see parser_x86.py) into the x86
+# AST classes defined in x86_ast.py, which the emulator executes.
 
-from lark import Tree
 from x86_ast import *
-import utils
+from .machine import BYTE_REGISTERS
 
 
-def convert_int(value):
-    if value >= 0:
-        return Tree("int_a", [value])
+def convert_int(tree):
+    # a token of the tree is a str
+    if isinstance(tree, str):
+        return int(tree)
+    elif tree.data == "int_a":
+        return convert_int(tree.children[0])
+    elif tree.data == "neg_a":
+        return -convert_int(tree.children[0])
     else:
-        return Tree("neg_a", [Tree("int_a", [-value])])
+        raise Exception("convert_int: unhandled " + repr(tree))
 
 
-def convert_arg(arg):
-    match arg:
-        case Reg(id):
-            return Tree("reg_a", [id])
-        case Variable(id):
-            return Tree("var_a", [id])
-        case Immediate(value):
-            return convert_int(value)
-        case Deref(reg, offset):
-            return Tree("mem_a", [convert_int(offset), reg])
-        case ByteReg(id):
-            return Tree("reg_a", [id])
-        case Global(id):
-            return Tree("global_val_a", [id, "rip"])
+def convert_arg(tree):
+    match tree.data:
+        case "reg_a" if str(tree.children[0]) in BYTE_REGISTERS:
+            return ByteReg(str(tree.children[0]))
+        case "reg_a":
+            return Reg(str(tree.children[0]))
+        case "var_a":
+            return Variable(str(tree.children[0]))
+        case "int_a" | "neg_a":
+            return Immediate(convert_int(tree))
+        case "mem_a":
+            (offset, reg) = tree.children
+            return Deref(str(reg), convert_int(offset))
+        case "direct_mem_a":
+            return Deref(str(tree.children[0]), 0)
+        case "global_val_a" if str(tree.children[1]) == "rip":
+            return Global(str(tree.children[0]))
         case _:
-            raise Exception("convert_arg: unhandled " + repr(arg))
+            raise Exception("convert_arg: unhandled " + repr(tree))
 
 
-def convert_instr(instr):
-    match instr:
-        case Instr(instr, args):
-            return Tree(instr, [convert_arg(arg) for arg in args])
-        case Callq(func, args):
-            return Tree("callq", [func])
-        case Jump(label):
-            return Tree("jmp", [label])
-        case JumpIf(cc, label):
-            return Tree("j" + cc, [label])
-        case IndirectCallq(func, numargs):
-            return Tree("indirect_callq", [convert_arg(func)])
-        case IndirectJump(l):
-            return Tree("indirect_jmp", [convert_arg(l)])
-        case TailJump(l, i):
-            # Treat the jump like an indirect call
-            return Tree("tail_jmp", [convert_arg(l)])
+def convert_instr(tree):
+    match tree.data:
+        case "callq":
+            return Callq(str(tree.children[0]), 0)
+        case "jmp":
+            return Jump(str(tree.children[0]))
+        case "je" | "jne" | "jl" | "jle" | "jg" | "jge":
+            return JumpIf(tree.data[1:], str(tree.children[0]))
+        case "indirect_callq":
+            return IndirectCallq(convert_arg(tree.children[0]), 0)
+        case "indirect_jmp":
+            return IndirectJump(convert_arg(tree.children[0]))
         case _:
-            raise Exception("error in convert_instr, unhandled " + repr(instr))
+            return Instr(str(tree.data), [convert_arg(arg) for arg in tree.children])
 
 
-def convert_program(p):
-    if hasattr(p, "defs"):
-        blocks = []
-        for df in p.defs:
-            for (l, ss) in df.body.items():
-                blocks.append(
-                    Tree("block", [l] + [convert_instr(instr) for instr in ss])
-                )
-        return Tree("prog", blocks)
-    else:
-        if isinstance(p.body, list):
-            main_instrs = [convert_instr(instr) for instr in p.body]
-            main_block = Tree("block", [utils.Label("main")] + main_instrs)
-            return Tree("prog", [main_block])
-        elif isinstance(p.body, dict):
-            blocks = []
-            for (l, ss) in p.body.items():
-                blocks.append(
-                    Tree("block", [l] + [convert_instr(instr) for instr in ss])
-                )
-            return Tree("prog", blocks)
+# The directives (.globl and .align) are blocks without instructions in
+# the parse tree, which the block of the label overwrites.
+def convert_program(tree):
+    assert tree.data == "prog"
+    body = {}
+    for b in tree.children:
+        assert b.data == "block"
+        label, *instrs = b.children
+        body[str(label)] = [convert_instr(instr) for instr in instrs]
+    return X86Program(body)
+
+
+def convert_instrs(tree):
+    assert tree.data == "instrs"
+    return [convert_instr(instr) for instr in tree.children]
@@ -0,0 +1,192 @@
+from array import array
+from utils import Label
+from x86_ast import *
+from .machine import REGISTER_NUMBERS, RSP, NULL_PAGE_SIZE, STACK_END
+
+# Performance counters of the x86 emulator: how many times every
+# instruction executes, the loads and stores of memory by region, the
+# conditional jumps taken and not taken, the calls, and an estimate of
+# the cycles the program takes. They only depend on the program and its
+# input, unlike a wall clock, so they show the effect of a change to the
+# generated code (fewer spills are fewer stack loads and stores).
+#
+# The emulator counts the executions of every address of the code and
+# the memory accesses of every instruction (see X86Emulator.counters);
+# the counts by opcode are summed when the report is made. The work of
+# the runtime functions, which the emulator implements itself, is not
+# counted: a call to collect is one call, whatever it copies.
+
+# Rough latencies in cycles of the instructions, and of an access to
+# memory that hits the L1 cache. An instruction that is not listed
+# takes DEFAULT_LATENCY.
+LATENCIES = {
+    "imulq": 3,
+    "idivq": 40,
+    "callq": 3,
+    "retq": 3,
+    "tailjmp": 2,
+}
+DEFAULT_LATENCY = 1
+LOAD_LATENCY = 4
+STORE_LATENCY = 1
+
+REGIONS = ["stack", "root_stack", "heap", "globals"]
+(STACK, ROOT_STACK, HEAP, GLOBALS) = range(len(REGIONS))
+
+ROOTSTACK_BEGIN = str(Label("rootstack_begin"))
+ROOTSTACK_END = str(Label("rootstack_end"))
+
+RUNTIME_NAMES = {
+    str(Label(name)): name for name in ["print_int", "read_int", "initialize", "collect"]
+}
+
+
+# The name of the opcode of `instr`, as in the assembly.
+def mnemonic(instr) -> str:
+    match instr:
+        case Instr(op, _):
+            return op
+        case Callq(_, _) | IndirectCallq(_, _):
+            return "callq"
+        case Jump(_) | IndirectJump(_):
+            return "jmp"
+        case JumpIf(cc, _):
+            return "j" + cc
+        case TailJump(_, _):
+            return "tailjmp"
+        case _:
+            return type(instr).__name__
+
+
+# The memory accesses of `instr`, as (register number, offset, store)
+# triples: the address is the register plus the offset, before the
+# instruction executes; the register is None for a global. An operand
+# that is read and written is a load and a store.
+def memory_accesses(instr) -> list:
+    def access(a, store):
+        match a:
+            case Deref(reg, offset) if reg in REGISTER_NUMBERS:
+                return [(REGISTER_NUMBERS[reg], offset, store)]
+            case Global(_):
+                return [(None, 0, store)]
+            case _:
+                return []
+
+    def load(a):
+        return access(a, False)
+
+    def store(a):
+        return access(a, True)
+
+    push = [(RSP, -8, True)]
+    pop = [(RSP, 0, False)]
+    match instr:
+        case Instr("leaq", [_, dst]):
+            return store(dst)
+        case Instr("movq" | "movabsq" | "movzbq", [src, dst]):
+            return load(src) + store(dst)
+        case Instr("cmpq", [src, dst]):
+            return load(src) + load(dst)
+        case Instr("pushq", [src]):
+            return load(src) + push
+        case Instr("popq", [dst]):
+            return pop + store(dst)
+        case Instr("idivq", [src]):
+            return load(src)
+        case Instr(op, [dst]) if op.startswith("set"):
+            return store(dst)
+        case Instr("retq", []):
+            return pop
+        case Instr(_, [*srcs, dst]):
+            # the other instructions read their operands and write the
+            # last one
+            return [a for src in srcs for a in load(src)] + load(dst) + store(dst)
+        case Callq(func, _) if str(func) not in RUNTIME_NAMES:
+            return push
+        case IndirectCallq(func, _):
+            return load(func) + push
+        case IndirectJump(target):
+            return load(target)
+        case TailJump(func, _):
+            return load(func) + pop
+        case _:
+            return []
+
+
+class Counters:
+    def __init__(self):
+        self.start([], {})
+
+    # Starts counting, from 0, the run of the decoded `code` (see
+    # X86Emulator.decode_program), whose root stack is given by
+    # `global_vals`.
+    def start(self, code, global_vals):
+        self.code = code
+        self.global_vals = global_vals
+        # executions and taken jumps by address
+        self.executions = array("q", bytes(8 * len(code)))
+        self.taken = array("q", bytes(8 * len(code)))
+        # the memory accesses of every instruction (see memory_accesses)
+        self.accesses = [memory_accesses(instr) for (_, _, _, _, instr) in code]
+        # loads and stores by region
+        self.loads = [0] * len(REGIONS)
+        self.stores = [0] * len(REGIONS)
+
+    # Counts the execution of the instruction at `pc`, before it
+    # executes with the registers `registers`.
+    def execute(self, pc: int, registers):
+        self.executions[pc] += 1
+        for (reg, offset, store) in self.accesses[pc]:
+            region = GLOBALS if reg is None else self.region(registers[reg] + offset)
+            if store:
+                self.stores[region] += 1
+            else:
+                self.loads[region] += 1
+
+    def region(self, address: int) -> int:
+        if NULL_PAGE_SIZE <= address < STACK_END:
+            return STACK
+        if (
+            self.global_vals.get(ROOTSTACK_BEGIN, 0)
+            <= address
+            < self.global_vals.get(ROOTSTACK_END, 0)
+        ):
+            return ROOT_STACK
+        return HEAP
+
+    # The counters as a dict that can be written as JSON.
+    def report(self) -> dict:
+        opcodes = {}
+        taken = 0
+        not_taken = 0
+        calls = 0
+        runtime_calls = {}
+        for (pc, (_, _, _, _, instr)) in enumerate(self.code):
+            n = self.executions[pc]
+            if n == 0:
+                continue
+            name = mnemonic(instr)
+            opcodes[name] = opcodes.get(name, 0) + n
+            match instr:
+                case JumpIf(_, _):
+                    taken += self.taken[pc]
+                    not_taken += n - self.taken[pc]
+                case Callq(func, _) if str(func) in RUNTIME_NAMES:
+                    name = RUNTIME_NAMES[str(func)]
+                    runtime_calls[name] = runtime_calls.get(name, 0) + n
+                case Callq(_, _) | IndirectCallq(_, _):
+                    calls += n
+        cycles = sum(n * LATENCIES.get(name, DEFAULT_LATENCY) for (name, n) in opcodes.items())
+        cycles += LOAD_LATENCY * sum(self.loads) + STORE_LATENCY * sum(self.stores)
+        return {
+            "instructions": sum(opcodes.values()),
+            "opcodes": dict(sorted(opcodes.items(), key=lambda item: (-item[1], item[0]))),
+            "loads": dict(zip(REGIONS, self.loads)),
+            "stores": dict(zip(REGIONS, self.stores)),
+            "branches": {"taken": taken, "not_taken": not_taken},
+            "calls": calls,
+            "tail_calls": opcodes.get("tailjmp", 0),
+            "runtime_calls": runtime_calls,
+            "collects": runtime_calls.get("collect", 0),
+            "cycles": cycles,
+        }
@@ -1,439 +1,738 @@
 # Author: Joe Near
 # License: GPLv3
 
-from collections import defaultdict
-from dataclasses import dataclass
+from array import array
 from utils import *
-from lark import Tree
-
-from .parser_x86 import x86_parser, x86_parser_instrs
-from .convert_x86 import convert_program
-
-
-def interp_x86(program):
-    x86_program = convert_program(program)
-    emu = X86Emulator(logging=False)
-    x86_output = emu.eval_program(x86_program)
-    for s in x86_output:
-        print(s, end="")
+from x86_ast import *
+import sink
+import watchdog
+
+from .parser_x86 import parse_program, parse_instrs, parse_file
+from .convert_x86 import convert_program, convert_instrs
+from .machine import *
+from .runtime import Runtime
+from .trace_x86 import Tracer, render_table
+
+
+# Runs the x86 program, an X86Program or X86ProgramDefs, translating its
+# blocks to Python (see translate_x86.py) unless `translate` is False.
+# The performance counters of the run are kept in the Counters
+# `counters`, if given (see counters.py).
+def interp_x86(program, translate=True, counters=None):
+    emu = X86Emulator(logging=False, translate=translate, counters=counters)
+    emu.eval_program(program)
+
+
+# Opcodes of the decoded instructions
+(
+    MOVQ,
+    MOVQ_IMM,
+    ADDQ,
+    ADDQ_IMM,
+    SUBQ,
+    SUBQ_IMM,
+    CMPQ,
+    CMPQ_IMM,
+    JMP,
+    JCC,
+    SETCC,
+    PUSHQ,
+    POPQ,
+    XORQ,
+    ANDQ,
+    NEGQ,
+    SALQ,
+    SARQ,
+    SHRQ,
+    IMULQ,
+    CQTO,
+    IDIVQ,
+    CALLQ,
+    RETQ,
+    PRINT_INT,
+    READ_INT,
+    INITIALIZE,
+    COLLECT,
+    LEAQ,
+    INDIRECT_CALLQ,
+    INDIRECT_JMP,
+    TAIL_JMP,
+    UNKNOWN,
+) = range(33)
+
+OPCODES = {
+    "addq": ADDQ,
+    "subq": SUBQ,
+    "cmpq": CMPQ,
+    "xorq": XORQ,
+    "andq": ANDQ,
+    "xorb": XORQ,
+    "andb": ANDQ,
+    "imulq": IMULQ,
+    "pushq": PUSHQ,
+    "popq": POPQ,
+    "negq": NEGQ,
+    "idivq": IDIVQ,
+    "leaq": LEAQ,
+    "salq": SALQ,
+    "shlq": SALQ,
+    "sarq": SARQ,
+    "shrq": SHRQ,
+}
+
+# the opcodes of the instructions with an immediate source operand
+IMMEDIATE_OPCODES = {"addq": ADDQ_IMM, "subq": SUBQ_IMM, "cmpq": CMPQ_IMM}
+
+# the flags for which a conditional jump is taken, or a set instruction
+# stores 1
+JUMP_FLAGS = {
+    "jmp": None,
+    "je": FLAG_E,
+    "jne": FLAG_L | FLAG_G,
+    "jl": FLAG_L,
+    "jle": FLAG_L | FLAG_E,
+    "jg": FLAG_G,
+    "jge": FLAG_G | FLAG_E,
+}
+SET_FLAGS = {
+    "sete": FLAG_E,
+    "setne": FLAG_L | FLAG_G,
+    "setl": FLAG_L,
+    "setle": FLAG_L | FLAG_E,
+    "setg": FLAG_G,
+    "setge": FLAG_G | FLAG_E,
+}
+
+# the functions of the runtime, which the emulator implements itself
+RUNTIME_FUNCTIONS = {
+    str(Label("print_int")): PRINT_INT,
+    str(Label("read_int")): READ_INT,
+    str(Label("initialize")): INITIALIZE,
+    str(Label("collect")): COLLECT,
+}
+
+
+def is_immediate(a):
+    return isinstance(a, Immediate)
+
+
+# The value of the immediate `a`, as a signed 64-bit int.
+def fold_immediate(a):
+    return wrap(int(a.value))
+
+
+# The blocks of the program by label, in program order.
+def program_blocks(p):
+    if isinstance(p, X86ProgramDefs):
+        blocks = {}
+        for df in p.defs:
+            blocks.update({str(l): ss for (l, ss) in df.body.items()})
+        return blocks
+    elif isinstance(p.body, dict):
+        return {str(l): ss for (l, ss) in p.body.items()}
+    else:
+        return {str(Label("main")): p.body}
 
 
-@dataclass
-class FunPointer:
-    fun_name: str
+# The name of the instruction, for the messages.
+def instr_name(instr):
+    match instr:
+        case Instr(op, _):
+            return op
+        case _:
+            return type(instr).__name__
 
 
 class X86Emulator:
-    def __init__(self, logging=True):
-        self.registers = defaultdict(lambda: None)
-        self.memory = defaultdict(lambda: None)
-        self.variables = defaultdict(lambda: None)
+    # With `translate`, the blocks of the program run as Python
+    # functions; the instructions are only executed one at a time, with
+    # eval_code, when tracing with the Tracer `tracer` (see
+    # trace_x86.py) and when counting into the Counters `counters`.
+    # Logging prints the trace as it is made, and the final state.
+    def __init__(self, logging=True, translate=True, counters=None, tracer=None):
+        self.machine = Machine()
+        # the variables of the pseudo-x86 programs, by slot; the slot of
+        # every variable is given when the program is decoded
+        self.variables = array("q")
+        self.variable_slots = {}
         self.logging = logging
-        self.registers["rbp"] = 1000
-        self.registers["rsp"] = 1000
-
+        self.translate = translate
+        self.counters = counters
+        if tracer is None and logging:
+            tracer = Tracer(echo=True)
+        self.tracer = tracer
+
+        # the labels of the program, and the values of the globals of
+        # the runtime
         self.global_vals = {}
+        self.runtime = Runtime(self.machine, self.global_vals)
+
+        # number of instructions executed so far
+        self.instruction_count = 0
 
     def log(self, s):
         if self.logging:
             print(s)
 
-    def parse_and_eval_program(self, s):
-        p = x86_parser.parse(s)
+    def parse_and_eval_program(self, s, output=None):
+        self.eval_program(convert_program(parse_program(s)), output)
 
-    def eval_program(self, p):
-        assert p.data == "prog"
-        blocks = {}
-        output = []
+    # Runs the .s file `filename` (see parse_file for the memo of parsed
+    # files).
+    def eval_file(self, filename, output=None):
+        self.eval_program(convert_program(parse_file(filename)), output)
 
-        # transform the program into a dict of blocks
-        for b in p.children:
-            assert b.data == "block"
-            block_name, *instrs = b.children
-            name = str(block_name)
-            blocks[name] = instrs
-            self.global_vals[name] = FunPointer(name)
+    # Runs the X86Program or X86ProgramDefs `p`. What the program prints
+    # is written to `output`, by default the current sink.
+    def eval_program(self, p, output=None):
+        if output is None:
+            output = sink.current
+
+        (code, labels) = self.decode_program(program_blocks(p))
+        self.global_vals.update(labels)
+        if self.counters is not None:
+            self.counters.start(code, self.global_vals)
+        if self.tracer is not None:
+            self.tracer.start(self, code, labels)
 
         self.log("========== STARTING EXECUTION ==============================")
 
-        # start evaluating at "main" or at "start"
-        if Label("main") in blocks.keys():
-            self.eval_instrs(blocks[Label("main")], blocks, output)
-        elif Label("start") in blocks.keys():
-            self.eval_instrs(blocks[Label("start")], blocks, output)
+        # start evaluating at "main" or at "start", called with the end
+        # of the code as return address
+        for start in [str(Label("main")), str(Label("start"))]:
+            if start in labels:
+                self.machine.push(len(code))
+                if self.translate and self.tracer is None and self.counters is None:
+                    self.eval_translated(code, labels, labels[start], output)
+                else:
+                    self.eval_code(code, labels, labels[start], output)
+                break
 
         self.log("FINAL STATE:")
         if self.logging:
             print(self.print_state())
 
-        self.log(f"OUTPUT: {output}")
+        output.flush()
         self.log("========== FINISHED EXECUTION ==============================")
 
-        return output
-
-    def eval_instructions(self, s):
-        import pandas as pd
-
-        p = x86_parser_instrs.parse(s)
+    # Executes the instructions `s` and returns the locations they
+    # changed, as a table (a pandas DataFrame with `pretty`).
+    def eval_instructions(self, s, pretty=False):
+        instrs = convert_instrs(parse_instrs(s))
+        output = sink.MemorySink()
 
-        assert p.data == "instrs"
-        blocks = {}
-        output = []
-
-        orig_memory = self.memory.copy()
-        orig_registers = self.registers.copy()
-        orig_variables = self.variables.copy()
+        code = self.decode_block(instrs, {})
+        if self.counters is not None:
+            self.counters.start(code, self.global_vals)
+        if self.tracer is not None:
+            self.tracer.start(self, code, {})
+        (orig_memory, orig_registers, orig_variables) = self.state()
 
         self.log("Executing instructions:")
         self.log(s)
 
         self.log("========== STARTING EXECUTION ==============================")
 
-        # start evaluating at "main"
-        self.eval_instrs(p.children, blocks, output)
+        self.eval_code(code, {}, 0, output)
 
         self.log("FINAL STATE:")
         if self.logging:
             print(self.print_state())
 
-        self.log(f"OUTPUT: {output}")
+        self.log(f"OUTPUT: {output.getvalue()}")
         self.log("========== FINISHED EXECUTION ==============================")
 
+        (memory, registers, variables) = self.state()
         changes_memory = [
-            [f"mem {k}", orig_memory[k], self.memory[k]]
-            for k in self.diff_dicts(self.memory, orig_memory)
+            [f"mem {k}", orig_memory.get(k, 0), memory.get(k, 0)]
+            for k in self.diff_dicts(memory, orig_memory)
         ]
         changes_registers = [
-            [f"reg {k}", orig_registers[k], self.registers[k]]
-            for k in self.diff_dicts(self.registers, orig_registers)
+            [f"reg {k}", orig_registers[k], registers[k]]
+            for k in self.diff_dicts(registers, orig_registers)
         ]
         changes_variables = [
-            [f"var {k}", orig_variables[k], self.variables[k]]
-            for k in self.diff_dicts(self.variables, orig_variables)
+            [f"var {k}", orig_variables[k], variables[k]]
+            for k in self.diff_dicts(variables, orig_variables)
         ]
 
         all_changes = changes_memory + changes_registers + changes_variables
 
-        changes_df = pd.DataFrame(all_changes, columns=["Location", "Old", "New"])
+        return render_table(all_changes, ["Location", "Old", "New"], pretty)
 
-        return changes_df
+    # The words of memory that are not 0, the registers and the variables.
+    def state(self):
+        machine = self.machine
+        variables = {
+            name: self.variables[slot] for (name, slot) in self.variable_slots.items()
+        }
+        return (machine.memory_contents(), machine.register_contents(), variables)
 
     def diff_dicts(self, d_after, d_orig):
         keys_diff = []
-        for k in d_after.keys():
-            if d_orig[k] != d_after[k]:
+        for k in d_after.keys() | d_orig.keys():
+            if d_orig.get(k, 0) != d_after.get(k, 0):
                 keys_diff.append(k)
-        return keys_diff
-
-    def print_state(self):
-        import pandas as pd
-
-        pd.set_option("display.max_rows", None)
-        memory = [[f"mem {k}", self.memory[k]] for k in sorted(self.memory.keys())]
-        registers = [[f"reg {k}", self.registers[k]] for k in self.registers.keys()]
-        variables = [[f"var {k}", self.variables[k]] for k in self.variables.keys()]
+        return sorted(keys_diff)
+
+    # The whole state, as a table (a pandas DataFrame with `pretty`).
+    def print_state(self, pretty=False):
+        (memory, registers, variables) = self.state()
+        memory = [[f"mem {k}", v] for (k, v) in memory.items()]
+        registers = [[f"reg {k}", v] for (k, v) in registers.items()]
+        registers.append(["flags", self.machine.flags])
+        variables = [[f"var {k}", v] for (k, v) in variables.items()]
         gvals = [[f"{k}", self.global_vals[k]] for k in self.global_vals.keys()]
 
         all_state = memory + registers + variables + gvals
 
-        state_df = pd.DataFrame(all_state, columns=["Location", "Value"])
-
-        return state_df
+        return render_table(all_state, ["Location", "Value"], pretty)
 
     def print_mem(self, mem):
         for k, v in mem.items():
             self.log(f" {k}:\t {v}")
 
-    def eval_imm(self, e):
-        if e.data == "int_a":
-            return int(e.children[0])
-        elif e.data == "neg_a":
-            return -self.eval_imm(e.children[0])
-        else:
-            raise Exception("eval_imm: unknown immediate:", e)
-
-    def eval_arg(self, a):
-        if a.data == "reg_a":
-            return self.registers[str(a.children[0])]
-        elif a.data == "var_a":
-            return self.variables[str(a.children[0])]
-        elif a.data == "int_a":
-            return int(a.children[0])
-        elif a.data == "mem_a":
-            offset, reg = a.children
-            addr = self.registers[reg]
-            offset_addr = addr + self.eval_imm(offset)
-            return self.memory[offset_addr]
-        elif a.data == "global_val_a":
-            loc, reg = a.children
-            assert str(reg) == "rip", a
-            return self.global_vals[str(loc)]
+    # Decoding: the program is turned once into a list of tuples
+    # (opcode, x, y, z, instr), the code, with its blocks in program order;
+    # the address of an instruction is its index in the code, and
+    # `labels` maps every label to the address of its block. The meaning
+    # of x, y and z depends on the opcode (see eval_code). Operands become
+    # accessors, functions that load or store the operand with its
+    # register number, offset, variable slot or global already resolved,
+    # immediates are folded to ints, and jump and call targets are
+    # resolved to their address. An instruction or operand the emulator
+    # does not know still decodes; it raises when it is executed.
+
+    # Returns the code of the program and its labels.
+    def decode_program(self, blocks):
+        labels = {}
+        address = 0
+        for (name, instrs) in blocks.items():
+            labels[name] = address
+            address += len(instrs)
+        code = []
+        for instrs in blocks.values():
+            code.extend(self.decode_block(instrs, labels))
+        return (code, labels)
+
+    def decode_block(self, instrs, labels):
+        return [self.decode_instr(instr, labels) for instr in instrs]
+
+    def decode_instr(self, instr, labels):
+        match instr:
+            case Instr(op, args):
+                return self.decode_operation(op, args, instr)
+            case Jump(label):
+                target = str(label)
+                return (JMP, labels.get(target), target, None, instr)
+            case JumpIf(cc, label) if "j" + cc in JUMP_FLAGS:
+                target = str(label)
+                return (JCC, labels.get(target), target, JUMP_FLAGS["j" + cc], instr)
+            case Callq(func, _):
+                target = str(func)
+                if target in RUNTIME_FUNCTIONS:
+                    return (RUNTIME_FUNCTIONS[target], None, None, None, instr)
+                return (CALLQ, labels.get(target), target, None, instr)
+            case IndirectCallq(func, _):
+                (load, _) = self.decode_arg(func)
+                return (INDIRECT_CALLQ, load, None, None, instr)
+            case IndirectJump(target):
+                (load, _) = self.decode_arg(target)
+                return (INDIRECT_JMP, load, None, None, instr)
+            case TailJump(func, _):
+                (load, _) = self.decode_arg(func)
+                return (TAIL_JMP, load, None, None, instr)
+            case _:
+                return (UNKNOWN, None, None, None, instr)
+
+    # Decodes the instruction `instr`, which is Instr(op, args).
+    def decode_operation(self, op, args, instr):
+        if op in ["movq", "movabsq", "movzbq"]:
+            if op == "movzbq":
+                (load, _) = self.decode_byte_arg(args[0])
+            else:
+                (load, _) = self.decode_arg(args[0])
+            (_, store) = self.decode_arg(args[1])
+            if is_immediate(args[0]):
+                return (MOVQ_IMM, fold_immediate(args[0]), store, None, instr)
+            return (MOVQ, load, store, None, instr)
+        elif op in ["addq", "subq", "cmpq", "xorq", "andq", "imulq"]:
+            (load1, _) = self.decode_arg(args[0])
+            (load2, store2) = self.decode_arg(args[1])
+            if is_immediate(args[0]) and op in IMMEDIATE_OPCODES:
+                return (IMMEDIATE_OPCODES[op], fold_immediate(args[0]), load2, store2, instr)
+            return (OPCODES[op], load1, load2, store2, instr)
+        elif op in ["xorb", "andb"]:
+            (load1, _) = self.decode_byte_arg(args[0])
+            (load2, store2) = self.decode_byte_arg(args[1])
+            return (OPCODES[op], load1, load2, store2, instr)
+        elif op in ["salq", "shlq", "sarq", "shrq"]:
+            # the count is 1 when it is left out
+            if len(args) == 1:
+                count = lambda: 1
+            else:
+                (count, _) = self.decode_arg(args[0])
+            (load, store) = self.decode_arg(args[-1])
+            return (OPCODES[op], count, load, store, instr)
+        elif op == "leaq" and isinstance(args[0], Deref):
+            (_, store) = self.decode_arg(args[1])
+            return (LEAQ, self.decode_address(args[0]), store, None, instr)
+        elif op in ["pushq", "popq", "negq", "idivq", "leaq"]:
+            (load, store) = self.decode_arg(args[0])
+            if op == "leaq":
+                (_, store) = self.decode_arg(args[1])
+            return (OPCODES[op], load, store, None, instr)
+        elif op == "cqto":
+            return (CQTO, None, None, None, instr)
+        elif op in SET_FLAGS:
+            (_, store) = self.decode_byte_arg(args[0])
+            return (SETCC, store, SET_FLAGS[op], None, instr)
+        elif op == "retq":
+            return (RETQ, None, None, None, instr)
         else:
-            raise RuntimeError(f"Unknown arg in eval_arg: {a}")
+            return (UNKNOWN, None, None, None, instr)
 
-    def store_arg(self, a, v):
-        if a.data == "reg_a":
-            self.registers[str(a.children[0])] = v
-        elif a.data == "var_a":
-            self.variables[str(a.children[0])] = v
-        elif a.data == "mem_a":
-            offset, reg = a.children
-            addr = self.registers[reg]
-            offset_addr = addr + self.eval_imm(offset)
-            self.memory[offset_addr] = v
-        elif a.data == "direct_mem_a":
-            reg = a.children[0]
-            addr = self.registers[reg]
-            self.memory[addr] = v
-        elif a.data == "global_val_a":
-            loc, reg = a.children
-            assert str(reg) == "rip", a
-            self.global_vals[str(loc)] = v
+    # Returns the (load, store) accessors of the operand `a`.
+    def decode_arg(self, a):
+        machine = self.machine
+        registers = machine.registers
+        words = machine.words
 
-        else:
+        def load():
+            raise RuntimeError(f"Unknown arg in eval_arg: {a}")
+
+        def store(v):
             raise RuntimeError(f"Unknown arg in store_arg: {a}")
 
-    def eval_instrs(self, instrs, blocks, output):
-        i = 0
-        for instr in instrs:
-            i += 1
-            self.log(f"Evaluating instruction: {instr.pretty()}")
-            if instr.data == "pushq":
-                a = instr.children[0]
-                self.registers["rsp"] = self.registers["rsp"] - 8
-                v = self.eval_arg(a)
-                self.memory[self.registers["rsp"]] = v
-
-            elif instr.data == "popq":
-                a = instr.children[0]
-                v = self.memory[self.registers["rsp"]]
-                self.registers["rsp"] = self.registers["rsp"] + 8
-                self.store_arg(a, v)
-
-            elif instr.data == "movq":
-                a1, a2 = instr.children
-                v = self.eval_arg(a1)
-                self.store_arg(a2, v)
-
-            elif instr.data == "movzbq":
-                a1, a2 = instr.children
-                v = self.eval_arg(a1)
-                self.store_arg(a2, v)
-
-            elif instr.data == "addq":
-                a1, a2 = instr.children
-                v1 = self.eval_arg(a1)
-                v2 = self.eval_arg(a2)
-                self.store_arg(a2, v1 + v2)
-
-            elif instr.data == "subq":
-                a1, a2 = instr.children
-                v1 = self.eval_arg(a1)
-                v2 = self.eval_arg(a2)
-                self.store_arg(a2, v2 - v1)
-
-            elif instr.data == "xorq":
-                a1, a2 = instr.children
-                v1 = self.eval_arg(a1)
-                v2 = self.eval_arg(a2)
-                self.store_arg(a2, v1 ^ v2)
-
-            elif instr.data == "negq":
-                a1 = instr.children[0]
-                v1 = self.eval_arg(a1)
-                self.store_arg(a1, (-v1))
-
-            elif instr.data == "sarq":
-                a1 = instr.children[0]
-                v1 = self.eval_arg(a1)
-                self.store_arg(a1, v1 >> 1)
-
-            elif instr.data == "andq":
-                a1, a2 = instr.children
-                v1 = self.eval_arg(a1)
-                v2 = self.eval_arg(a2)
-                self.store_arg(a2, v1 & v2)
-
-            elif instr.data in ["jmp", "je", "jne", "jl", "jle", "jg", "jge"]:
-                target = str(instr.children[0])
-                perform_jump = False
-
-                if instr.data == "jmp":
-                    perform_jump = True
-                elif instr.data == "je" and self.registers["EFLAGS"] == "e":
-                    perform_jump = True
-                elif instr.data == "jne" and self.registers["EFLAGS"] in ["g", "l"]:
-                    perform_jump = True
-                elif instr.data == "jl" and self.registers["EFLAGS"] == "l":
-                    perform_jump = True
-                elif instr.data == "jle" and self.registers["EFLAGS"] in ["l", "e"]:
-                    perform_jump = True
-                elif instr.data == "jg" and self.registers["EFLAGS"] == "g":
-                    perform_jump = True
-                elif instr.data == "jge" and self.registers["EFLAGS"] in ["g", "e"]:
-                    perform_jump = True
-
-                if perform_jump:
-                    if target in blocks.keys():
-                        self.eval_instrs(blocks[target], blocks, output)
-                    elif target == Label("conclusion"):
-                        return
-                    else:
-                        raise Exception("jump to invalid target " + target)
-                    return  # after jumping, toss continuation
-
-            elif instr.data in ["sete", "setne", "setl", "setle", "setg", "setge"]:
-                a1 = instr.children[0]
-
-                if instr.data == "sete" and self.registers["EFLAGS"] == "e":
-                    self.store_arg(a1, 1)
-                elif instr.data == "setne" and self.registers["EFLAGS"] != "e":
-                    self.store_arg(a1, 1)
-                elif instr.data == "setl" and self.registers["EFLAGS"] == "l":
-                    self.store_arg(a1, 1)
-                elif instr.data == "setle" and self.registers["EFLAGS"] in ["l", "e"]:
-                    self.store_arg(a1, 1)
-                elif instr.data == "setg" and self.registers["EFLAGS"] == "g":
-                    self.store_arg(a1, 1)
-                elif instr.data == "setge" and self.registers["EFLAGS"] in ["g", "e"]:
-                    self.store_arg(a1, 1)
-                else:
-                    self.store_arg(a1, 0)
-
-            elif instr.data == "callq":
-                target = str(instr.children[0])
-                if target == Label("print_int"):
-                    self.log(f'CALL TO print_int: {self.registers["rdi"]}')
-                    output.append(self.registers["rdi"])
-                    if self.logging:
-                        print(self.print_state())
-
-                elif target == Label("read_int"):
-                    self.registers["rax"] = int(input())
-                    self.log(f'CALL TO read_int: {self.registers["rax"]}')
-                    if self.logging:
-                        print(self.print_state())
-
-                elif target == "initialize":
-                    self.log(
-                        f'CALL TO initialize: {self.registers["rdi"]}, {self.registers["rsi"]}'
-                    )
-                    rootstack_size = self.registers["rdi"]
-                    heap_size = self.registers["rsi"]
-
-                    rs_begin = 2000
-                    rs_end = rs_begin + rootstack_size
-
-                    fromspace_begin = 100000
-                    fromspace_end = fromspace_begin + heap_size
-
-                    self.global_vals = {
-                        **self.global_vals,
-                        "rootstack_begin": rs_begin,
-                        "rootstack_end": rs_end,
-                        "free_ptr": fromspace_begin,
-                        "fromspace_begin": fromspace_begin,
-                        "fromspace_end": fromspace_end,
-                    }
-
-                    if self.logging:
-                        print(self.print_state())
-
-                elif target == "collect":
-                    self.log(f'CALL TO collect: need {self.registers["rsi"]} bytes')
-
-                    needed = self.registers["rsi"]
-                    fsb = self.global_vals["fromspace_begin"]
-                    fse = self.global_vals["fromspace_end"]
-
-                    current_space = fse - fsb
-
-                    new_space = current_space
-                    while new_space - current_space < needed:
-                        new_space = new_space * 2
-
-                    new_fse = fsb + new_space
-                    self.global_vals["fromspace_end"] = new_fse
-
-                    if self.logging:
-                        print(self.print_state())
+        match a:
+            case Reg(name) | ByteReg(name) if name in REGISTER_NUMBERS:
+                reg = REGISTER_NUMBERS[name]
+
+                def load():
+                    return registers[reg]
+
+                def store(v):
+                    registers[reg] = v
 
-                else:
-                    self.eval_instrs(blocks[target], blocks, output)
-
-            elif instr.data == "retq":
-                return
-
-            elif instr.data == "cmpq":
-                a1, a2 = instr.children
-                v1 = self.eval_arg(a1)
-                v2 = self.eval_arg(a2)
-
-                if v1 == v2:
-                    self.registers["EFLAGS"] = "e"
-                elif v2 < v1:
-                    self.registers["EFLAGS"] = "l"
-                elif v2 > v1:
-                    self.registers["EFLAGS"] = "g"
-                else:
-                    raise RuntimeError(f"failed comparison: {instr}")
-
-            elif instr.data == "leaq":
-                a1, a2 = instr.children
-                v1 = self.eval_arg(a1)
-                assert isinstance(v1, FunPointer)
-                self.store_arg(a2, v1)
-
-            elif instr.data == "indirect_callq":
-                v = self.eval_arg(instr.children[0])
-                assert isinstance(v, FunPointer)
-                target = v.fun_name
-                self.eval_instrs(blocks[target], blocks, output)
-
-            elif instr.data == "indirect_jmp":
-                v = self.eval_arg(instr.children[0])
-                assert isinstance(v, FunPointer)
-                target = v.fun_name
-                self.eval_instrs(blocks[target], blocks, output)
-                return  # after jumping, toss continuation
-
-            elif instr.data == "tail_jmp":
-                v = self.eval_arg(instr.children[0])
-                assert isinstance(v, FunPointer)
-                target = v.fun_name
-                self.eval_instrs(blocks[target], blocks, output)
-                return  # after jumping, toss continuation
-                v = self.eval_arg(instr.children[0])
-                self.eval_instrs(
-                    [Tree("popq", [Tree("reg_a", ["rbp"])])] + blocks[v.fun_name],
-                    blocks,
-                    output,
-                )
-                return
-                """
-                # Treat like indirect call
-                pop = Tree("popq", [Tree("reg_a", ["rbp"])])
-                indirect_jmp = Tree("indirect_jmp", [instr.children[0]])
-                # Pop rbp
-                a = Tree("reg_a", ["rbp"])
-                v = self.memory[self.registers['rsp']]
-                self.registers['rsp'] = self.registers['rsp'] + 8
-                self.store_arg(a, v)
-                # indirect jump
-                v = self.eval_arg(instr.children[0])
-                assert isinstance(v, FunPointer)
-                target = v.fun_name
-                self.eval_instrs(blocks[target], blocks, output)
-                return # after jumping, toss continuation
-                self.eval_instrs([pop, indirect_jmp], blocks, output)
-                return
-                """
+            case Reg(name) | ByteReg(name) if name in BYTE_REGISTERS:
+                reg = BYTE_REGISTERS[name]
 
-            else:
-                raise RuntimeError(f"Unknown instruction: {instr.data}")
+                def load():
+                    return registers[reg] & 0xFF
+
+                def store(v):
+                    registers[reg] = (registers[reg] & ~0xFF) | (v & 0xFF)
+
+            case Variable(name):
+                variables = self.variables
+                slot = self.variable_slot(str(name))
+
+                def load():
+                    return variables[slot]
+
+                def store(v):
+                    variables[slot] = v
+
+            case Immediate(_):
+                value = fold_immediate(a)
+
+                def load():
+                    return value
+
+            case Deref(reg, offset):
+                reg = REGISTER_NUMBERS[reg]
+
+                # aligned words of the memory are read directly; the rest
+                # goes through the machine, which raises MemoryFault outside
+                # of the memory
+                def load():
+                    address = registers[reg] + offset
+                    if address & 7 or address < NULL_PAGE_SIZE:
+                        return machine.load(address)
+                    try:
+                        return words[address >> 3]
+                    except IndexError:
+                        return machine.load(address)
+
+                def store(v):
+                    address = registers[reg] + offset
+                    if address & 7 or address < NULL_PAGE_SIZE:
+                        return machine.store(address, v)
+                    try:
+                        words[address >> 3] = v
+                    except IndexError:
+                        machine.store(address, v)
+
+            case Global(name):
+                global_vals = self.global_vals
+                loc = str(name)
+
+                def load():
+                    return global_vals[loc]
+
+                def store(v):
+                    global_vals[loc] = v
+
+        return (load, store)
+
+    def variable_slot(self, var):
+        if var not in self.variable_slots:
+            self.variable_slots[var] = len(self.variables)
+            self.variables.append(0)
+        return self.variable_slots[var]
+
+    # Returns a function computing the address of the memory operand `a`,
+    # a Deref.
+    def decode_address(self, a):
+        registers = self.machine.registers
+        reg = REGISTER_NUMBERS[a.reg]
+        offset = a.offset
+        return lambda: registers[reg] + offset
+
+    # Returns the (load, store) accessors of the byte operand `a`: a byte
+    # of memory, or the low byte of a register or of a variable. The
+    # loaded value is unsigned.
+    def decode_byte_arg(self, a):
+        machine = self.machine
+        if isinstance(a, Deref):
+            address = self.decode_address(a)
+
+            def load():
+                return machine.load_byte(address())
+
+            def store(v):
+                machine.store_byte(address(), v)
+
+            return (load, store)
+
+        (load_word, store_word) = self.decode_arg(a)
+        if isinstance(a, (Reg, ByteReg)) and a.id in BYTE_REGISTERS:
+            return (load_word, store_word)
+
+        def load():
+            return load_word() & 0xFF
+
+        def store(v):
+            store_word((load_word() & ~0xFF) | (v & 0xFF))
+
+        return (load, store)
+
+    # Executes `code` from the address `pc` until it runs past the end
+    # of the code. Calls push their return address on the stack and retq
+    # pops it, as on the machine, so that jumps and calls do not nest
+    # Python calls. The variables of a pseudo-x86 program are those of
+    # the running function: a call saves the variables of the caller and
+    # the return restores them, as their homes on the stack would be.
+    def eval_code(self, code, labels, pc, output):
+        # the steps and the flags are kept in locals, and written back
+        # when the budget is checked and when the code returns or raises
+        budget = watchdog.current
+        first_step = budget.steps
+        steps = first_step
+        next_check = budget.next_check
+        machine = self.machine
+        registers = machine.registers
+        flags = machine.flags
+        counters = self.counters
+        tracer = self.tracer
+        end = len(code)
+        variables = self.variables
+        saved_variables = []
+        try:
+            while pc < end:
+                (op, x, y, z, instr) = code[pc]
+                if counters is not None:
+                    counters.execute(pc, registers)
+                pc += 1
+                steps += 1
+                if steps >= next_check:
+                    budget.steps = steps
+                    budget.check()
+                    next_check = budget.next_check
+                if tracer is not None:
+                    machine.flags = flags
+                    traced = tracer.before(pc - 1, instr)
+
+                # the most frequent instructions first
+                if op == MOVQ:
+                    # x: load the source, y: store the destination
+                    y(x())
+
+                elif op == MOVQ_IMM:
+                    # x: the immediate
+                    y(x)
+
+                elif op == ADDQ:
+                    # x: load the source, y, z: load and store the destination
+                    z(((x() + y() + SIGN_BIT) & WORD_MASK) - SIGN_BIT)
+
+                elif op == ADDQ_IMM:
+                    z(((x + y() + SIGN_BIT) & WORD_MASK) - SIGN_BIT)
+
+                elif op == SUBQ:
+                    z(((y() - x() + SIGN_BIT) & WORD_MASK) - SIGN_BIT)
+
+                elif op == SUBQ_IMM:
+                    z(((y() - x + SIGN_BIT) & WORD_MASK) - SIGN_BIT)
+
+                elif op == CMPQ or op == CMPQ_IMM:
+                    v1 = x() if op == CMPQ else x
+                    v2 = y()
+                    if v1 == v2:
+                        flags = FLAG_E
+                    elif v2 < v1:
+                        flags = FLAG_L
+                    else:
+                        flags = FLAG_G
+
+                elif op == JCC or op == JMP:
+                    # x: the address of the target, y: its label, z: the
+                    # flags that take the jump
+                    if op == JMP or flags & z:
+                        if counters is not None and op == JCC:
+                            counters.taken[pc - 1] += 1
+                        if x is not None:
+                            pc = x
+                        elif y == str(Label("conclusion")):
+                            # the conclusion is not generated yet: return
+                            pc = machine.pop()
+                            if saved_variables:
+                                variables[:] = saved_variables.pop()
+                        else:
+                            raise Exception("jump to invalid target " + y)
+
+                elif op == SETCC:
+                    # x: store the destination, y: the flags that set it
+                    x(1 if flags & y else 0)
+
+                elif op == PUSHQ:
+                    # x: load the operand
+                    machine.push(x())
+
+                elif op == POPQ:
+                    # y: store the operand
+                    y(machine.pop())
+
+                elif op == XORQ:
+                    z(x() ^ y())
+
+                elif op == ANDQ:
+                    z(x() & y())
+
+                elif op == NEGQ:
+                    # x, y: load and store the operand
+                    y(wrap(-x()))
+
+                elif op == IMULQ:
+                    # x: load the source, y, z: load and store the destination
+                    z(((x() * y() + SIGN_BIT) & WORD_MASK) - SIGN_BIT)
+
+                elif op == SALQ:
+                    # x: load the count, y, z: load and store the operand
+                    z(wrap(y() << (x() & 63)))
+
+                elif op == SARQ:
+                    z(y() >> (x() & 63))
+
+                elif op == SHRQ:
+                    z(wrap((y() & WORD_MASK) >> (x() & 63)))
+
+                elif op == CQTO:
+                    registers[RDX] = -1 if registers[RAX] < 0 else 0
+
+                elif op == IDIVQ:
+                    # x: load the divisor; rdx:rax is the dividend
+                    (registers[RAX], registers[RDX]) = idiv(registers[RDX], registers[RAX], x())
+
+                elif op == CALLQ:
+                    # x: the address of the target, y: its label
+                    if x is None:
+                        raise KeyError(y)
+                    machine.push(pc)
+                    pc = x
+                    if variables:
+                        saved_variables.append(variables[:])
+
+                elif op == RETQ:
+                    pc = self.code_address(machine.pop(), end)
+                    if saved_variables:
+                        variables[:] = saved_variables.pop()
+
+                elif op == PRINT_INT:
+                    self.log(f"CALL TO print_int: {registers[RDI]}")
+                    output.write(str(registers[RDI]))
+
+                elif op == READ_INT:
+                    registers[RAX] = wrap(sink.read_int(output))
+                    self.log(f"CALL TO read_int: {registers[RAX]}")
+
+                elif op == INITIALIZE:
+                    self.log(f"CALL TO initialize: {registers[RDI]}, {registers[RSI]}")
+                    self.runtime.initialize(registers[RDI], registers[RSI])
+
+                elif op == COLLECT:
+                    self.log(f"CALL TO collect: need {registers[RSI]} bytes")
+                    self.runtime.collect(registers[RDI], registers[RSI])
+
+                elif op == LEAQ:
+                    # x: load the source, y: store the destination
+                    y(x())
+
+                elif op == INDIRECT_CALLQ or op == INDIRECT_JMP:
+                    # x: load the operand
+                    target = self.code_address(x(), end)
+                    if op == INDIRECT_CALLQ:
+                        machine.push(pc)
+                        if variables:
+                            saved_variables.append(variables[:])
+                    pc = target
+
+                elif op == TAIL_JMP:
+                    # before prelude_and_conclusion, a tail call only
+                    # has the frame pointer of its function to pop
+                    target = self.code_address(x(), end)
+                    registers[RBP] = machine.pop()
+                    pc = target
 
-            if self.logging:
-                print(self.print_state())
+                else:
+                    raise RuntimeError(f"Unknown instruction: {instr_name(instr)}")
+
+                if tracer is not None and traced is not None:
+                    machine.flags = flags
+                    tracer.after(traced)
+        finally:
+            machine.flags = flags
+            budget.steps = steps
+            self.instruction_count += steps - first_step
+
+    # Executes `code` like eval_code, a block at a time: the blocks are
+    # translated to Python functions when they are first executed, and
+    # each returns the address of the next one (see translate_x86.py).
+    def eval_translated(self, code, labels, pc, output):
+        from .translate_x86 import BlockTranslator
+
+        budget = watchdog.current
+        first_step = budget.steps
+        translator = BlockTranslator(self, code, labels, output, [], budget)
+        blocks = translator.blocks
+        end = len(code)
+        try:
+            while pc < end:
+                block = blocks.get(pc)
+                if block is None:
+                    block = translator.translate(pc)
+                pc = block()
+                if budget.steps >= budget.next_check:
+                    budget.check()
+        finally:
+            self.instruction_count += budget.steps - first_step
+
+    # Checks that `v`, the target of an indirect jump or call or a return
+    # address, is an address in the code (or its end).
+    def code_address(self, v, end):
+        if not 0 <= v <= end:
+            raise RuntimeError(f"jump to invalid address {v}")
+        return v
 
 
 prog1 = """
@@ -560,13 +859,13 @@ instrs = [
     "addq $2, %rax",
     "addq $3, %rax",
     "addq $5, %rax\n movq %rax, %rdi",
-    "movq $42, (%rax)",
+    "movq $42, -8(%rbp)",
 ]
 
 if __name__ == "__main__":
     for prog in prog1, prog2, prog3, prog4, prog5:
         emu = X86Emulator(logging=True)
-        emu.eval_program(prog)
+        emu.parse_and_eval_program(prog)
 
     emu = X86Emulator(logging=False)
     for i in instrs:
@@ -0,0 +1,202 @@
+from array import array
+
+# The machine state of the x86 emulator: the register file, the memory
+# and the flags.
+#
+# The registers are a fixed array of 64-bit words indexed by register
+# number; a byte register is the low byte of its 64-bit register. The
+# memory is one array of 64-bit words: the null page, which may not be
+# accessed, the stack, which grows down from STACK_END, and then the
+# regions allocated by the runtime (the root stack and the heap), each
+# after the previous one. Values are signed 64-bit ints; arithmetic
+# wraps around, see wrap().
+#
+# Memory is addressed in bytes, little-endian, like on the machine.
+# Accesses to aligned words are an index into the array; unaligned ones
+# and accesses to single bytes are supported, more slowly. An access
+# outside of the memory raises MemoryFault.
+
+REGISTERS = [
+    "rax",
+    "rbx",
+    "rcx",
+    "rdx",
+    "rsi",
+    "rdi",
+    "rbp",
+    "rsp",
+    "r8",
+    "r9",
+    "r10",
+    "r11",
+    "r12",
+    "r13",
+    "r14",
+    "r15",
+]
+REGISTER_NUMBERS = {name: number for (number, name) in enumerate(REGISTERS)}
+
+RAX = REGISTER_NUMBERS["rax"]
+RDX = REGISTER_NUMBERS["rdx"]
+RSI = REGISTER_NUMBERS["rsi"]
+RDI = REGISTER_NUMBERS["rdi"]
+RBP = REGISTER_NUMBERS["rbp"]
+RSP = REGISTER_NUMBERS["rsp"]
+
+# the 64-bit register of every byte register
+BYTE_REGISTERS = {
+    "al": RAX,
+    "bl": REGISTER_NUMBERS["rbx"],
+    "cl": REGISTER_NUMBERS["rcx"],
+    "dl": REGISTER_NUMBERS["rdx"],
+    "sil": RSI,
+    "dil": RDI,
+    "bpl": RBP,
+    "spl": RSP,
+    **{"r" + str(n) + "b": REGISTER_NUMBERS["r" + str(n)] for n in range(8, 16)},
+}
+
+# The flags are those of the result of the last comparison: one of
+# FLAG_E, FLAG_L and FLAG_G (0 before the first comparison). A
+# condition is the mask of the flags it holds for.
+FLAG_E = 1
+FLAG_L = 2
+FLAG_G = 4
+
+WORD_SIZE = 8
+SIGN_BIT = 1 << 63
+WORD_MASK = (1 << 64) - 1
+
+
+# The signed 64-bit value of the int `v`.
+def wrap(v: int) -> int:
+    return ((v + SIGN_BIT) & WORD_MASK) - SIGN_BIT
+
+
+NULL_PAGE_SIZE = 4096
+STACK_SIZE = 8 << 20
+STACK_END = NULL_PAGE_SIZE + STACK_SIZE
+
+
+class MemoryFault(Exception):
+    def __init__(self, address: int):
+        super().__init__("invalid memory access at address " + str(address))
+        self.address = address
+
+
+# A division by 0, or with a quotient that does not fit in 64 bits:
+# the divide error of idivq.
+class DivideError(Exception):
+    def __init__(self, dividend: int, divisor: int):
+        super().__init__("divide error: " + str(dividend) + " / " + str(divisor))
+        self.dividend = dividend
+        self.divisor = divisor
+
+
+# Divides the 128-bit `high`:`low` by `divisor` like idivq: returns the
+# quotient, rounded toward 0, and the remainder, which has the sign of
+# the dividend.
+def idiv(high: int, low: int, divisor: int) -> tuple[int, int]:
+    dividend = (high << 64) | (low & WORD_MASK)
+    if divisor == 0:
+        raise DivideError(dividend, divisor)
+    quotient = abs(dividend) // abs(divisor)
+    if (dividend < 0) != (divisor < 0):
+        quotient = -quotient
+    if quotient != wrap(quotient):
+        raise DivideError(dividend, divisor)
+    return (quotient, dividend - quotient * divisor)
+
+
+class Machine:
+    def __init__(self):
+        self.registers = array("q", bytes(WORD_SIZE * len(REGISTERS)))
+        self.words = array("q", bytes(STACK_END))
+        self.flags = 0
+        self.registers[RBP] = STACK_END
+        self.registers[RSP] = STACK_END
+
+    # The address of the end of the memory.
+    def end(self) -> int:
+        return len(self.words) * WORD_SIZE
+
+    # Adds a zeroed region of `size` bytes at the end of the memory and
+    # returns its address.
+    def allocate(self, size: int) -> int:
+        begin = self.end()
+        self.words.frombytes(bytes(-(-size // WORD_SIZE) * WORD_SIZE))
+        return begin
+
+    # Extends the memory, if needed, up to the address `end`.
+    def grow(self, end: int):
+        if end > self.end():
+            self.allocate(end - self.end())
+
+    def check(self, address: int, size: int = WORD_SIZE):
+        if address < NULL_PAGE_SIZE or address + size > self.end():
+            raise MemoryFault(address)
+
+    def load(self, address: int) -> int:
+        self.check(address)
+        (index, offset) = divmod(address, WORD_SIZE)
+        if offset == 0:
+            return self.words[index]
+        # the two words the unaligned word spans, as one 128-bit int
+        words = self.words[index + 1] & WORD_MASK
+        words = (words << 64) | (self.words[index] & WORD_MASK)
+        return wrap(words >> (8 * offset))
+
+    def store(self, address: int, value: int):
+        self.check(address)
+        (index, offset) = divmod(address, WORD_SIZE)
+        if offset == 0:
+            self.words[index] = value
+            return
+        shift = 8 * offset
+        words = self.words[index + 1] & WORD_MASK
+        words = (words << 64) | (self.words[index] & WORD_MASK)
+        words = (words & ~(WORD_MASK << shift)) | ((value & WORD_MASK) << shift)
+        self.words[index] = wrap(words)
+        self.words[index + 1] = wrap(words >> 64)
+
+    def load_byte(self, address: int) -> int:
+        self.check(address, 1)
+        (index, offset) = divmod(address, WORD_SIZE)
+        return (self.words[index] >> (8 * offset)) & 0xFF
+
+    def store_byte(self, address: int, value: int):
+        self.check(address, 1)
+        (index, offset) = divmod(address, WORD_SIZE)
+        shift = 8 * offset
+        word = self.words[index] & WORD_MASK
+        word = (word & ~(0xFF << shift)) | ((value & 0xFF) << shift)
+        self.words[index] = wrap(word)
+
+    def push(self, value: int):
+        self.registers[RSP] -= WORD_SIZE
+        self.store(self.registers[RSP], value)
+
+    def pop(self) -> int:
+        value = self.load(self.registers[RSP])
+        self.registers[RSP] += WORD_SIZE
+        return value
+
+    # The registers by name, and the words of memory that are not 0 by
+    # address, for printing the state.
+    def register_contents(self) -> dict:
+        return {name: self.registers[number] for (number, name) in enumerate(REGISTERS)}
+
+    def memory_contents(self) -> dict:
+        contents = {}
+        memory = self.words.tobytes()
+        zero_page = bytes(NULL_PAGE_SIZE)
+        # most of the memory is zero: look at the words of the pages
+        # that are not
+        for page in range(0, len(memory), NULL_PAGE_SIZE):
+            if memory[page : page + NULL_PAGE_SIZE] != zero_page:
+                first = page // WORD_SIZE
+                last = min(first + NULL_PAGE_SIZE // WORD_SIZE, len(self.words))
+                for index in range(first, last):
+                    if self.words[index] != 0:
+                        contents[index * WORD_SIZE] = self.words[index]
+        return contents
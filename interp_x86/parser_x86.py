@@ -1,111 +1,125 @@
 # Author: Joe Near
 # License: GPLv3
 
-from lark import Lark
+import hashlib
+from pathlib import Path
 
-x86_parser = Lark(r"""
+# The parser of x86 text: whole programs (prog) and lists of
+# instructions (instrs). It is LALR, so parsing takes time linear in the
+# text, and it is only built, and lark imported, the first time it is
+# used. Lark caches its tables in a file of the temporary directory,
+# keyed by the grammar, so later processes load them instead of building
+# them.
+
+GRAMMAR = r"""
     ?instr: "movq" arg "," arg -> movq
           | "addq" arg "," arg -> addq
           | "subq" arg "," arg -> subq
           | "cmpq" arg "," arg -> cmpq
           | "xorq" arg "," arg -> xorq
+          | "andq" arg "," arg -> andq
           | "leaq" arg "," arg -> leaq
+          | "movabsq" arg "," arg -> movabsq
+          | "imulq" arg "," arg -> imulq
+          | "idivq" arg -> idivq
+          | "cqto" -> cqto
+          | "salq" arg ("," arg)? -> salq
+          | "shlq" arg ("," arg)? -> shlq
+          | "sarq" arg ("," arg)? -> sarq
+          | "shrq" arg ("," arg)? -> shrq
+          | "xorb" arg "," arg -> xorb
+          | "andb" arg "," arg -> andb
           | "negq" arg -> negq
-          | "jmp" CNAME -> jmp
+          | "jmp" LABEL -> jmp
           | "jmp" "*" arg -> indirect_jmp
-          | "je" CNAME -> je
-          | "jl" CNAME -> jl
-          | "jle" CNAME -> jle
-          | "jg" CNAME -> jg
-          | "jge" CNAME -> jge
+          | "je" LABEL -> je
+          | "jne" LABEL -> jne
+          | "jl" LABEL -> jl
+          | "jle" LABEL -> jle
+          | "jg" LABEL -> jg
+          | "jge" LABEL -> jge
           | "sete" arg -> sete
+          | "setne" arg -> setne
           | "setl" arg -> setl
           | "setle" arg -> setle
           | "setg" arg -> setg
           | "setge" arg -> setge
           | "movzbq" arg "," arg -> movzbq
-          | "xorq" arg "," arg -> xorq
-          | "callq" CNAME -> callq
+          | "callq" LABEL -> callq
           | "callq" "*" arg -> indirect_callq
           | "pushq" arg -> pushq
           | "popq" arg -> popq
           | "retq" -> retq
 
-    block: ".globl" CNAME
+    block: ".globl" LABEL
          |  ".align" NUMBER
-         | CNAME ":" (instr)*
+         | LABEL ":" (instr)*
 
     ?arg: "$" atom -> int_a
         | "%" reg -> reg_a
-        | "#" CNAME -> var_a
+        | "#" LABEL -> var_a
         | "(" "%" reg ")" -> direct_mem_a
         | atom "(" "%" reg ")" -> mem_a
-        | CNAME "(" "%" reg ")" -> global_val_a
+        | LABEL "(" "%" reg ")" -> global_val_a
 
     ?atom: NUMBER -> int_a
          | "-" atom  -> neg_a
 
     !?reg: "rsp" | "rbp" | "rax" | "rbx" | "rcx" | "rdx" | "rsi" | "rdi" 
          | "r8" | "r9" | "r10" | "r11" | "r12" | "r13" | "r14" | "r15"
-         | "al" | "rip"
+         | "al" | "bl" | "cl" | "dl" | "sil" | "dil" | "bpl" | "spl"
+         | "r8b" | "r9b" | "r10b" | "r11b" | "r12b" | "r13b" | "r14b" | "r15b"
+         | "rip"
 
     prog: block*
 
+    instrs: instr*
+
+    // labels may have dots, like the ones the compiler generates
+    LABEL: /[A-Za-z_.][A-Za-z0-9_.]*/
+
     %import common.NUMBER
-    %import common.CNAME
 
     %import common.WS
     %ignore WS
-    """, start='prog', parser='lalr')
+    """
 
-x86_parser_instrs = Lark(r"""
-    ?instr: "movq" arg "," arg -> movq
-          | "addq" arg "," arg -> addq
-          | "subq" arg "," arg -> subq
-          | "cmpq" arg "," arg -> cmpq
-          | "xorq" arg "," arg -> xorq
-          | "leaq" arg "," arg -> leaq
-          | "negq" arg -> negq
-          | "jmp" CNAME -> jmp
-          | "jmp" "*" arg -> indirect_jmp
-          | "je" CNAME -> je
-          | "jl" CNAME -> jl
-          | "jle" CNAME -> jle
-          | "jg" CNAME -> jg
-          | "jge" CNAME -> jge
-          | "sete" arg -> sete
-          | "setl" arg -> setl
-          | "setle" arg -> setle
-          | "setg" arg -> setg
-          | "setge" arg -> setge
-          | "movzbq" arg "," arg -> movzbq
-          | "xorq" arg "," arg -> xorq
-          | "callq" CNAME -> callq
-          | "callq" "*" arg -> indirect_callq
-          | "pushq" arg -> pushq
-          | "popq" arg -> popq
-          | "retq" -> retq
+x86_parser = None
 
-    instrs: instr*
 
-    ?arg: "$" atom -> int_a
-        | "%" reg -> reg_a
-        | "#" CNAME -> var_a
-        | "(" "%" reg ")" -> direct_mem_a
-        | atom "(" "%" reg ")" -> mem_a
-        | CNAME "(" "%" reg ")" -> global_val_a
+def get_parser():
+    global x86_parser
+    if x86_parser is None:
+        from lark import Lark
 
-    ?atom: NUMBER -> int_a
-         | "-" atom  -> neg_a
+        x86_parser = Lark(GRAMMAR, start=["prog", "instrs"], parser="lalr", cache=True)
+    return x86_parser
 
-    !?reg: "rsp" | "rbp" | "rax" | "rbx" | "rcx" | "rdx" | "rsi" | "rdi" 
-         | "r8" | "r9" | "r10" | "r11" | "r12" | "r13" | "r14" | "r15"
-         | "al" | "rip"
 
-    %import common.NUMBER
-    %import common.CNAME
+def parse_program(s: str):
+    return get_parser().parse(s, start="prog")
+
+
+def parse_instrs(s: str):
+    return get_parser().parse(s, start="instrs")
+
+
+# Parse trees of .s files by the hash of their text, when enabled: the
+# same assembly file is only parsed once per process.
+memo_enabled = False
+memo = {}
+
+
+def enable_memo():
+    global memo_enabled
+    memo_enabled = True
 
-    %import common.WS
-    %ignore WS
-    """, start='instrs', parser='lalr')
 
+def parse_file(filename):
+    text = Path(filename).read_text()
+    if not memo_enabled:
+        return parse_program(text)
+    key = hashlib.sha256(text.encode()).hexdigest()
+    if key not in memo:
+        memo[key] = parse_program(text)
+    return memo[key]
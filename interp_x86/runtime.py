@@ -0,0 +1,172 @@
+from utils import Label
+from .machine import Machine, WORD_SIZE, wrap
+
+# The heap of the compiled programs for the x86 emulator: initialize
+# and collect of runtime.c, over the memory of the emulated machine.
+#
+# As in runtime.c, the heap is two semispaces, the fromspace the
+# program allocates in and the tospace, and collect copies the tuples
+# reachable from the root stack into the tospace with Cheney's
+# algorithm and flips the two. When that does not free enough space,
+# both semispaces are replaced by larger ones. The program sees the
+# globals of runtime.h (free_ptr, fromspace_begin, fromspace_end,
+# rootstack_begin and rootstack_end) in `global_vals`; the tospace is
+# only known to the collector.
+#
+# The memory of the machine only grows: the semispaces replaced when
+# the heap grows are not reused.
+
+# Tuple tag (see runtime.c):
+#   bit 0: 1 for a tag, 0 for a forwarding pointer
+#   bits 1-6: length
+#   bits 7-56: which elements are pointers
+# vecof tag: bit 1 says if the elements are pointers, bits 2-61 are
+# the length and bits 62-63 are not 0.
+TAG_IS_NOT_FORWARD_MASK = 1
+TAG_VEC_LENGTH_MASK = 126
+TAG_VEC_LENGTH_RSHIFT = 1
+TAG_VEC_PTR_BITFIELD_RSHIFT = 7
+TAG_VECOF_LENGTH_RSHIFT = 2
+TAG_VECOF_PTR_BITFIELD_RSHIFT = 1
+TAG_VECOF_RSHIFT = 62
+
+# The low bits of a value of type any say what it is; a tuple pointer
+# may carry one of those tags.
+ANY_TAG_MASK = 7
+ANY_TAG_VEC = 2
+ANY_TAG_VECOF = 6
+ANY_TAG_PTR = 0
+
+
+def is_forwarding(tag: int) -> bool:
+    return not tag & TAG_IS_NOT_FORWARD_MASK
+
+
+def is_vecof(tag: int) -> bool:
+    return tag >> TAG_VECOF_RSHIFT != 0
+
+
+def vec_length(tag: int) -> int:
+    if is_vecof(tag):
+        return (wrap(tag << 2) >> 2) >> TAG_VECOF_LENGTH_RSHIFT
+    return (tag & TAG_VEC_LENGTH_MASK) >> TAG_VEC_LENGTH_RSHIFT
+
+
+def is_ptr(v: int) -> bool:
+    return v != 0 and v & ANY_TAG_MASK in [ANY_TAG_PTR, ANY_TAG_VEC, ANY_TAG_VECOF]
+
+
+def to_ptr(v: int) -> int:
+    return v & ~ANY_TAG_MASK
+
+
+class Runtime:
+    def __init__(self, machine: Machine, global_vals: dict):
+        self.machine = machine
+        self.global_vals = global_vals
+        self.tospace_begin = None
+        self.tospace_end = None
+        # the free pointer of the tospace during a collection
+        self.free_ptr = None
+
+    def get(self, name: str) -> int:
+        return self.global_vals[str(Label(name))]
+
+    def set(self, name: str, value: int):
+        self.global_vals[str(Label(name))] = value
+
+    def initialize(self, rootstack_size: int, heap_size: int):
+        assert heap_size % WORD_SIZE == 0, heap_size
+        assert rootstack_size % WORD_SIZE == 0, rootstack_size
+        fromspace_begin = self.machine.allocate(heap_size)
+        self.tospace_begin = self.machine.allocate(heap_size)
+        self.tospace_end = self.tospace_begin + heap_size
+        rootstack_begin = self.machine.allocate(rootstack_size)
+        self.set("fromspace_begin", fromspace_begin)
+        self.set("fromspace_end", fromspace_begin + heap_size)
+        self.set("rootstack_begin", rootstack_begin)
+        self.set("rootstack_end", rootstack_begin + rootstack_size)
+        self.set("free_ptr", fromspace_begin)
+
+    def collect(self, rootstack_ptr: int, bytes_requested: int):
+        assert self.tospace_begin is not None, "collect before initialize"
+        assert self.get("rootstack_begin") <= rootstack_ptr < self.get("rootstack_end")
+
+        self.cheney(rootstack_ptr)
+
+        free_ptr = self.get("free_ptr")
+        if self.get("fromspace_end") - free_ptr < bytes_requested:
+            # double the heap until the occupied part and the request fit
+            occupied_bytes = free_ptr - self.get("fromspace_begin")
+            needed_bytes = occupied_bytes + bytes_requested
+            new_bytes = self.get("fromspace_end") - self.get("fromspace_begin")
+            while new_bytes <= needed_bytes:
+                new_bytes = 2 * new_bytes
+
+            # copy into a larger tospace, which becomes the fromspace,
+            # and give it a tospace of the same size
+            self.tospace_begin = self.machine.allocate(new_bytes)
+            self.tospace_end = self.tospace_begin + new_bytes
+            self.cheney(rootstack_ptr)
+            self.tospace_begin = self.machine.allocate(new_bytes)
+            self.tospace_end = self.tospace_begin + new_bytes
+
+        free_ptr = self.get("free_ptr")
+        assert self.get("fromspace_begin") <= free_ptr < self.get("fromspace_end")
+
+    # Copies the tuples reachable from the roots below `rootstack_ptr`
+    # into the tospace, breadth first, and flips the semispaces.
+    def cheney(self, rootstack_ptr: int):
+        self.free_ptr = self.tospace_begin
+        for root_loc in range(self.get("rootstack_begin"), rootstack_ptr, WORD_SIZE):
+            self.copy_vector(root_loc)
+
+        scan_ptr = self.tospace_begin
+        while scan_ptr != self.free_ptr:
+            scan_ptr = self.process_vector(scan_ptr)
+
+        (fromspace_begin, fromspace_end) = (self.get("fromspace_begin"), self.get("fromspace_end"))
+        self.set("fromspace_begin", self.tospace_begin)
+        self.set("fromspace_end", self.tospace_end)
+        self.set("free_ptr", self.free_ptr)
+        (self.tospace_begin, self.tospace_end) = (fromspace_begin, fromspace_end)
+
+    # Copies the tuples the pointers of the tuple at `scan_ptr` point to
+    # and returns the address of the next tuple.
+    def process_vector(self, scan_ptr: int) -> int:
+        tag = self.machine.load(scan_ptr)
+        next_ptr = scan_ptr + (vec_length(tag) + 1) * WORD_SIZE
+        if is_vecof(tag):
+            elements_are_pointers = (tag >> TAG_VECOF_PTR_BITFIELD_RSHIFT) & 1
+            pointer_bits = -1 if elements_are_pointers else 0
+        else:
+            pointer_bits = tag >> TAG_VEC_PTR_BITFIELD_RSHIFT
+        scan_ptr += WORD_SIZE
+        while scan_ptr != next_ptr:
+            if pointer_bits & 1:
+                self.copy_vector(scan_ptr)
+            pointer_bits >>= 1
+            scan_ptr += WORD_SIZE
+        return next_ptr
+
+    # Copies the tuple the pointer at `location` points to into the
+    # tospace, unless it was copied already, and makes the pointer point
+    # to the copy.
+    def copy_vector(self, location: int):
+        machine = self.machine
+        old_vector_ptr = machine.load(location)
+        if not is_ptr(old_vector_ptr):
+            return
+        old_tag = old_vector_ptr & ANY_TAG_MASK
+        old_vector_ptr = to_ptr(old_vector_ptr)
+        tag = machine.load(old_vector_ptr)
+        if is_forwarding(tag):
+            machine.store(location, tag | old_tag)
+            return
+        new_vector_ptr = self.free_ptr
+        length = vec_length(tag)
+        for i in range(0, (length + 1) * WORD_SIZE, WORD_SIZE):
+            machine.store(new_vector_ptr + i, machine.load(old_vector_ptr + i))
+        self.free_ptr = new_vector_ptr + (length + 1) * WORD_SIZE
+        machine.store(old_vector_ptr, new_vector_ptr)
+        machine.store(location, new_vector_ptr | old_tag)
@@ -0,0 +1,239 @@
+import bisect
+import json
+from collections import deque
+from utils import Label
+from x86_ast import *
+from .machine import REGISTERS, REGISTER_NUMBERS, BYTE_REGISTERS, MemoryFault
+from .machine import RAX, RDX, RSI, RDI, RSP
+
+# Tracing of the x86 emulator: for every instruction it executes, the
+# emulator records the locations the instruction touches (registers,
+# variables, words of memory, globals of the runtime and the flags) with
+# their values before and after it. The records are kept in a ring
+# buffer of the last `capacity` ones, and can also be streamed as JSON
+# lines to a file and printed as text as they are made. Only the
+# instructions of the blocks in `labels` are traced, if it is given.
+#
+# A record is a dict:
+#   {"step": 12, "address": 7, "label": "start",
+#    "instr": "movq %rax, -8(%rbp)",
+#    "touched": {"rax": [42, 42], "rbp": [...], "mem 8380400": [0, 42]}}
+# The step is the number of the instruction in the run, the address its
+# index in the decoded code, and the label that of its block.
+
+# The kinds of locations
+(REG, VAR, MEM, GLOBAL, FLAGS) = range(5)
+
+# the locations the functions of the runtime touch
+HEAP_GLOBALS = [
+    (GLOBAL, str(Label(name))) for name in ["free_ptr", "fromspace_begin", "fromspace_end"]
+]
+ROOTSTACK_GLOBALS = [(GLOBAL, str(Label(name))) for name in ["rootstack_begin", "rootstack_end"]]
+RUNTIME_LOCATIONS = {
+    str(Label("print_int")): [(REG, RDI)],
+    str(Label("read_int")): [(REG, RAX)],
+    str(Label("initialize")): [(REG, RDI), (REG, RSI)] + HEAP_GLOBALS + ROOTSTACK_GLOBALS,
+    str(Label("collect")): [(REG, RDI), (REG, RSI)] + HEAP_GLOBALS,
+}
+
+
+class Tracer:
+    # `labels` are names of labels, or (first, last) pairs of labels for
+    # the blocks from the one of `first` to the one of `last` in the
+    # order of the program. With `echo`, the records are also printed.
+    def __init__(self, capacity=1000, stream=None, labels=None, echo=False):
+        self.records = deque(maxlen=capacity)
+        self.stream = stream
+        self.labels = labels
+        self.echo = echo
+        self.steps = 0
+
+    # Starts tracing the decoded `code` of `emulator`, whose blocks
+    # start at the addresses of `labels`.
+    def start(self, emulator, code, labels):
+        self.emulator = emulator
+        self.machine = emulator.machine
+        blocks = sorted((address, label) for (label, address) in labels.items())
+        self.block_addresses = [address for (address, _) in blocks]
+        self.block_labels = [label for (_, label) in blocks]
+        self.traced = bytearray([1]) * len(code)
+        if self.labels is not None:
+            self.traced = bytearray(len(code))
+            for (first, last) in self.label_ranges(labels, blocks):
+                self.traced[first:last] = bytearray([1]) * (last - first)
+        self.locations = [self.instr_locations(instr) for (_, _, _, _, instr) in code]
+
+    # The [first, last) address ranges of the traced blocks.
+    def label_ranges(self, labels, blocks):
+        ends = {
+            address: next_address
+            for ((address, _), (next_address, _)) in zip(blocks, blocks[1:])
+        }
+        ranges = []
+        for entry in self.labels:
+            (first, last) = entry if isinstance(entry, tuple) else (entry, entry)
+            (first, last) = (labels.get(str(first)), labels.get(str(last)))
+            if first is not None and last is not None:
+                ranges.append((first, ends.get(last, len(self.traced))))
+        return ranges
+
+    def label(self, pc: int):
+        i = bisect.bisect_right(self.block_addresses, pc) - 1
+        return self.block_labels[i] if i >= 0 else None
+
+    # The locations `instr` touches, as (kind, key) pairs: a register
+    # number, a (slot, name) pair for a variable, a (register number,
+    # offset) pair for a word of memory, or the name of a global.
+    def instr_locations(self, instr) -> list:
+        locations = []
+
+        def operand(a):
+            match a:
+                case Reg(name) | ByteReg(name) if name in REGISTER_NUMBERS:
+                    locations.append((REG, REGISTER_NUMBERS[name]))
+                case Reg(name) | ByteReg(name) if name in BYTE_REGISTERS:
+                    locations.append((REG, BYTE_REGISTERS[name]))
+                case Variable(name):
+                    slot = self.emulator.variable_slot(str(name))
+                    locations.append((VAR, (slot, str(name))))
+                case Deref(reg, offset) if reg in REGISTER_NUMBERS:
+                    locations.append((REG, REGISTER_NUMBERS[reg]))
+                    locations.append((MEM, (REGISTER_NUMBERS[reg], offset)))
+                case Global(name):
+                    locations.append((GLOBAL, str(name)))
+
+        def stack(offset):
+            locations.append((REG, RSP))
+            locations.append((MEM, (RSP, offset)))
+
+        match instr:
+            case Instr(op, args):
+                for a in args:
+                    operand(a)
+                if op == "pushq":
+                    stack(-8)
+                elif op in ["popq", "retq"]:
+                    stack(0)
+                elif op in ["cqto", "idivq"]:
+                    locations += [(REG, RAX), (REG, RDX)]
+                elif op == "cmpq" or op.startswith("set"):
+                    locations.append((FLAGS, None))
+            case Callq(func, _) if str(func) in RUNTIME_LOCATIONS:
+                locations += RUNTIME_LOCATIONS[str(func)]
+            case Callq(_, _):
+                stack(-8)
+            case IndirectCallq(func, _):
+                operand(func)
+                stack(-8)
+            case IndirectJump(target):
+                operand(target)
+            case TailJump(func, _):
+                operand(func)
+                stack(0)
+            case JumpIf(_, _):
+                locations.append((FLAGS, None))
+        # each location once, in order
+        return list(dict.fromkeys(locations))
+
+    # Returns the name and the value of the location, before the
+    # instruction executes; a word of memory is named by its address.
+    def resolve(self, kind, key):
+        machine = self.machine
+        if kind == REG:
+            return (REGISTERS[key], lambda: machine.registers[key])
+        elif kind == VAR:
+            (slot, name) = key
+            return ("var " + name, lambda: self.emulator.variables[slot])
+        elif kind == MEM:
+            address = machine.registers[key[0]] + key[1]
+
+            def load():
+                try:
+                    return machine.load(address)
+                except MemoryFault:
+                    return None
+
+            return ("mem " + str(address), load)
+        elif kind == GLOBAL:
+            return (key, lambda: self.emulator.global_vals.get(key))
+        else:
+            return ("flags", lambda: machine.flags)
+
+    # Called before the instruction at `pc` executes, with the flags
+    # written back to the machine. Returns what `after` needs, or None
+    # if the instruction is not traced.
+    def before(self, pc: int, instr):
+        self.steps += 1
+        if not self.traced[pc]:
+            return None
+        locations = [self.resolve(kind, key) for (kind, key) in self.locations[pc]]
+        values = [load() for (_, load) in locations]
+        return (self.steps, pc, instr, locations, values)
+
+    # Called after the instruction executes, with what `before` returned.
+    def after(self, state):
+        (step, pc, instr, locations, values) = state
+        touched = {
+            name: [value, load()] for ((name, load), value) in zip(locations, values)
+        }
+        record = {
+            "step": step,
+            "address": pc,
+            "label": self.label(pc),
+            "instr": str(instr).strip(),
+            "touched": touched,
+        }
+        self.records.append(record)
+        if self.stream is not None:
+            self.stream.write(json.dumps(record) + "\n")
+        if self.echo:
+            print(describe(record))
+
+    # The records as a pandas DataFrame, with a row per touched location.
+    def dataframe(self):
+        import pandas as pd
+
+        rows = [
+            [r["step"], r["address"], r["label"], r["instr"], name, old, new]
+            for r in self.records
+            for (name, (old, new)) in r["touched"].items()
+        ]
+        columns = ["Step", "Address", "Label", "Instruction", "Location", "Old", "New"]
+        return pd.DataFrame(rows, columns=columns)
+
+
+# A line of text for the record.
+def describe(record) -> str:
+    changes = []
+    for (name, (old, new)) in record["touched"].items():
+        if old == new:
+            changes.append(name + "=" + str(new))
+        else:
+            changes.append(name + ": " + str(old) + " -> " + str(new))
+    return (
+        str(record["step"])
+        + " "
+        + str(record["label"])
+        + "+"
+        + str(record["address"])
+        + ": "
+        + record["instr"]
+        + "  ["
+        + ", ".join(changes)
+        + "]"
+    )
+
+
+# The rows as text in aligned columns, or as a pandas DataFrame with
+# `pretty`.
+def render_table(rows, columns, pretty=False):
+    if pretty:
+        import pandas as pd
+
+        pd.set_option("display.max_rows", None)
+        return pd.DataFrame(rows, columns=columns)
+    table = [columns] + [[str(v) for v in row] for row in rows]
+    widths = [max(len(row[i]) for row in table) for i in range(len(columns))]
+    return "\n".join(
+        "  ".join(v.ljust(w) for (v, w) in zip(row, widths)).rstrip() for row in table
+    )
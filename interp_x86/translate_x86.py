@@ -0,0 +1,514 @@
+from utils import Label
+from x86_ast import *
+import sink
+from .machine import *
+from .eval_x86 import (
+    JUMP_FLAGS,
+    SET_FLAGS,
+    RUNTIME_FUNCTIONS,
+    fold_immediate,
+    JMP,
+    JCC,
+    CALLQ,
+    RETQ,
+    INDIRECT_JMP,
+    TAIL_JMP,
+)
+
+# The translation tier of the x86 emulator: the blocks of the program
+# are translated, the first time they are executed, into Python
+# functions, which run the whole block and return the address of the
+# block to execute next. The functions are cached by the address of
+# their block for as long as the program runs; the code of a program
+# never changes, so they are never invalidated.
+#
+# A block starts at a label or after a call. Its function follows the
+# unconditional jumps (and falls through into the next label) until it
+# reaches a call, a return, an indirect jump or MAX_BLOCK_SIZE
+# instructions; conditional jumps leave it in the middle. A jump back to
+# the start of the block is a loop in the function, so that a loop of
+# the program runs in one call. Only the labels that can only be reached
+# from the block, and those that jump back to its start (the conditions
+# of loops), are followed: other labels start blocks of their own, so
+# that no code is translated into many functions.
+#
+# In the function, the registers and the flags are locals, loaded from
+# the machine when it starts and written back when it ends, and operands
+# are inlined: a register is a local, a variable an index into the
+# variables, an aligned word of memory an index into the words of the
+# machine, and anything else goes through the machine, which checks the
+# access. The function counts the steps it takes, exactly, in the
+# current budget, and checks the budget whenever it loops.
+
+MAX_BLOCK_SIZE = 200
+
+# The generated code refers to the machine (M), its registers (R) and
+# words (W), the end of the memory (E), the variables (V), the globals
+# of the runtime (G), the runtime (RT), the variables saved by the calls
+# (S), the output (OUT) and the budget (B); the registers are the locals
+# of the same name, the flags the local `flags`, the steps taken the
+# local `n`, and t1, t2... are temporaries.
+
+
+# The code of the signed 64-bit value of the expression `e`.
+def wrap_code(e: str) -> str:
+    return "(((" + e + ") + " + str(SIGN_BIT) + ") & " + str(WORD_MASK) + ") - " + str(SIGN_BIT)
+
+
+class BlockTranslator:
+    def __init__(self, emulator, code, labels, output, saved_variables, budget):
+        machine = emulator.machine
+        self.emulator = emulator
+        self.code = code
+        self.labels = labels
+        self.label_addresses = set(labels.values())
+        self.count_predecessors()
+        # the functions of the translated blocks by address
+        self.blocks = {}
+        self.namespace = {
+            "M": machine,
+            "R": machine.registers,
+            "W": machine.words,
+            "V": emulator.variables,
+            "G": emulator.global_vals,
+            "RT": emulator.runtime,
+            "S": saved_variables,
+            "OUT": output,
+            "B": budget,
+            "check_address": lambda v: emulator.code_address(v, len(code)),
+            "idiv": idiv,
+            "read_int": sink.read_int,
+            "fail": fail,
+        }
+
+    # The number of ways into every label: the jumps and calls to it, the
+    # instruction before it if it falls through, and two more if its
+    # address is taken.
+    def count_predecessors(self):
+        self.predecessors = {address: 0 for address in self.label_addresses}
+        for (pc, (op, x, y, z, instr)) in enumerate(self.code):
+            if op in [JMP, JCC, CALLQ] and y in self.labels:
+                self.predecessors[self.labels[y]] += 1
+            for a in instr.args if isinstance(instr, Instr) else []:
+                if isinstance(a, Global) and str(a.name) in self.labels:
+                    self.predecessors[self.labels[str(a.name)]] += 2
+            if pc + 1 in self.predecessors and op not in [JMP, RETQ, INDIRECT_JMP, TAIL_JMP]:
+                self.predecessors[pc + 1] += 1
+
+    # Whether the code at `address`, up to the next label or jump, jumps
+    # to the start of the block.
+    def jumps_to_start(self, address: int) -> bool:
+        for (op, x, y, z, instr) in self.code[address:]:
+            if op in [JMP, JCC] and x == self.start:
+                return True
+            if op in [JMP, RETQ, CALLQ, INDIRECT_JMP, TAIL_JMP]:
+                return False
+            address += 1
+            if address in self.label_addresses:
+                return False
+        return False
+
+    # Returns the function of the block at `start`, after translating it.
+    def translate(self, start):
+        self.start = start
+        self.lines = []
+        self.indent = 0
+        self.registers = set()
+        self.uses_flags = False
+        self.uses_memory = False
+        self.loops = False
+        self.temporaries = 0
+        # the instructions from the start of the block to the current one
+        self.steps = 0
+        self.followed = {start}
+
+        pc = start
+        while pc is not None:
+            if pc >= len(self.code) or self.steps >= MAX_BLOCK_SIZE:
+                self.exit(str(pc))
+                break
+            instr = self.code[pc][4]
+            self.steps += 1
+            pc = self.translate_instr(instr, pc + 1)
+            if pc in self.label_addresses:
+                pc = self.goto(pc)
+
+        name = "block_" + str(start)
+        registers = sorted(self.registers, key=REGISTER_NUMBERS.get)
+        source = ["def " + name + "():"]
+        source += [r + " = R[" + str(REGISTER_NUMBERS[r]) + "]" for r in registers]
+        if self.uses_flags:
+            source.append("flags = M.flags")
+        if self.uses_memory:
+            source.append("E = len(W) << 3")
+        source.append("n = 0")
+        if self.loops:
+            source.append("L = B.next_check - B.steps")
+        source.append("try:")
+        if self.loops:
+            source.append("    while True:")
+            source += ["        " + line for line in self.lines]
+        else:
+            source += ["    " + line for line in self.lines]
+        source.append("finally:")
+        source.append("    B.steps += n")
+        source += ["    R[" + str(REGISTER_NUMBERS[r]) + "] = " + r for r in registers]
+        if self.uses_flags:
+            source.append("    M.flags = flags")
+        source = [source[0]] + ["    " + line for line in source[1:]]
+        code = compile("\n".join(source) + "\n", "<x86 block " + str(start) + ">", "exec")
+        exec(code, self.namespace)
+        self.blocks[start] = self.namespace[name]
+        return self.blocks[start]
+
+    def emit(self, line: str):
+        self.lines.append("    " * self.indent + line)
+
+    def temporary(self) -> str:
+        self.temporaries += 1
+        return "t" + str(self.temporaries)
+
+    # The expression `e` if it is a local or a constant, and otherwise a
+    # temporary that holds its value.
+    def value(self, e: str) -> str:
+        if e.isidentifier() or e.lstrip("-").isdigit():
+            return e
+        t = self.temporary()
+        self.emit(t + " = " + e)
+        return t
+
+    # Leaves the function, to the block at the address `target`.
+    def exit(self, target: str):
+        self.emit("n += " + str(self.steps))
+        self.emit("return " + target)
+
+    # Continues at the label at `address`: loops if it is the start of
+    # the block, follows it if it can (see above), and leaves the
+    # function for it otherwise. Returns the address to continue
+    # translating at, if any.
+    def goto(self, address: int) -> int | None:
+        if address == self.start:
+            self.loops = True
+            self.emit("n += " + str(self.steps))
+            self.emit("if n >= L:")
+            self.emit("    B.steps += n")
+            self.emit("    n = 0")
+            self.emit("    B.check()")
+            self.emit("    L = B.next_check - B.steps")
+            self.emit("continue")
+            return None
+        if address in self.followed or not (
+            self.predecessors[address] == 1 or self.jumps_to_start(address)
+        ):
+            self.exit(str(address))
+            return None
+        self.followed.add(address)
+        return address
+
+    # Emits the code of `instr`, whose next instruction is at `next_pc`.
+    # Returns the address of the instruction to translate next, or None
+    # if the function ends with this one.
+    def translate_instr(self, instr, next_pc) -> int | None:
+        match instr:
+            case Instr(op, args):
+                return self.translate_operation(op, args, next_pc)
+            case Jump(label):
+                target = str(label)
+                if target in self.labels:
+                    # followed like the next label (see translate)
+                    return self.labels[target]
+                self.missing_target(target)
+                return None
+            case JumpIf(cc, label) if "j" + cc in JUMP_FLAGS:
+                target = str(label)
+                self.uses_flags = True
+                self.emit("if flags & " + str(JUMP_FLAGS["j" + cc]) + ":")
+                self.indent += 1
+                if target not in self.labels:
+                    self.missing_target(target)
+                elif self.labels[target] == self.start:
+                    self.goto(self.start)
+                else:
+                    self.exit(str(self.labels[target]))
+                self.indent -= 1
+                return next_pc
+            case Callq(func, _):
+                target = str(func)
+                if target in RUNTIME_FUNCTIONS:
+                    self.runtime_call(target)
+                    return next_pc
+                if target not in self.labels:
+                    self.emit("raise KeyError(" + repr(target) + ")")
+                    return None
+                self.call(str(self.labels[target]), next_pc)
+                return None
+            case IndirectCallq(func, _):
+                target = self.temporary()
+                self.emit(target + " = check_address(" + self.operand(func).load() + ")")
+                self.call(target, next_pc)
+                return None
+            case IndirectJump(target):
+                self.exit("check_address(" + self.operand(target).load() + ")")
+                return None
+            case TailJump(func, _):
+                # before prelude_and_conclusion, a tail call only has the
+                # frame pointer of its function to pop
+                target = self.temporary()
+                self.emit(target + " = check_address(" + self.operand(func).load() + ")")
+                self.use("rbp")
+                self.emit("rbp = " + self.pop())
+                self.exit(target)
+                return None
+            case _:
+                self.unknown_instr(type(instr).__name__)
+                return None
+
+    # Emits the code of Instr(op, args).
+    def translate_operation(self, op, args, next_pc) -> int | None:
+        if op in ["movq", "movabsq", "movzbq"]:
+            src = self.operand(args[0], op == "movzbq")
+            dst = self.operand(args[1])
+            dst.store(src.load())
+        elif op in ["addq", "subq", "imulq", "xorq", "andq", "xorb", "andb"]:
+            byte = op.endswith("b")
+            src = self.operand(args[0], byte)
+            dst = self.operand(args[1], byte)
+            operator = {"add": "+", "sub": "-", "imu": "*", "xor": "^", "and": "&"}[op[:3]]
+            value = dst.load() + " " + operator + " " + src.load()
+            dst.store(wrap_code(value) if operator in "+-*" else value)
+        elif op == "cmpq":
+            src = self.operand(args[0])
+            dst = self.operand(args[1])
+            (a, b) = (self.value(src.load()), self.value(dst.load()))
+            self.uses_flags = True
+            self.emit(
+                "flags = " + str(FLAG_E) + " if " + b + " == " + a
+                + " else (" + str(FLAG_L) + " if " + b + " < " + a
+                + " else " + str(FLAG_G) + ")"
+            )
+        elif op in ["salq", "shlq", "sarq", "shrq"]:
+            if len(args) == 1:
+                count = "1"
+            elif isinstance(args[0], Immediate):
+                count = str(fold_immediate(args[0]) & 63)
+            else:
+                count = "(" + self.operand(args[0]).load() + " & 63)"
+            dst = self.operand(args[-1])
+            if op == "sarq":
+                dst.store(dst.load() + " >> " + count)
+            elif op == "shrq":
+                dst.store(wrap_code("(" + dst.load() + " & " + str(WORD_MASK) + ") >> " + count))
+            else:
+                dst.store(wrap_code(dst.load() + " << " + count))
+        elif op == "negq":
+            dst = self.operand(args[0])
+            dst.store(wrap_code("-" + dst.load()))
+        elif op == "cqto":
+            self.use("rax", "rdx")
+            self.emit("rdx = -1 if rax < 0 else 0")
+        elif op == "idivq":
+            src = self.operand(args[0])
+            self.use("rax", "rdx")
+            self.emit("(rax, rdx) = idiv(rdx, rax, " + src.load() + ")")
+        elif op == "leaq":
+            if isinstance(args[0], Deref):
+                address = self.address(args[0])
+            else:
+                address = self.operand(args[0]).load()
+            self.operand(args[1]).store(address)
+        elif op == "pushq":
+            src = self.operand(args[0])
+            self.push(src.load())
+        elif op == "popq":
+            value = self.pop()
+            self.operand(args[0]).store(value)
+        elif op in SET_FLAGS:
+            dst = self.operand(args[0], True)
+            self.uses_flags = True
+            dst.store("1 if flags & " + str(SET_FLAGS[op]) + " else 0")
+        elif op == "retq":
+            self.ret()
+            return None
+        else:
+            self.unknown_instr(op)
+            return None
+        return next_pc
+
+    def unknown_instr(self, name: str):
+        self.emit("raise RuntimeError(" + repr("Unknown instruction: " + name) + ")")
+
+    # The functions of the runtime, which the emulator implements.
+    def runtime_call(self, target: str):
+        self.use("rdi", "rsi", "rax")
+        if target == str(Label("print_int")):
+            self.emit("OUT.write(str(rdi))")
+        elif target == str(Label("read_int")):
+            self.emit("rax = " + wrap_code("read_int(OUT)"))
+        elif target == str(Label("initialize")):
+            self.emit("RT.initialize(rdi, rsi)")
+            self.uses_memory = True
+            self.emit("E = len(W) << 3")
+        elif target == str(Label("collect")):
+            self.emit("RT.collect(rdi, rsi)")
+            self.uses_memory = True
+            self.emit("E = len(W) << 3")
+
+    def use(self, *registers):
+        self.registers.update(registers)
+
+    def push(self, value: str):
+        self.use("rsp")
+        self.uses_memory = True
+        value = self.value(value)
+        self.emit("rsp -= " + str(WORD_SIZE))
+        Memory(self, "rsp").store(value)
+
+    def pop(self) -> str:
+        self.use("rsp")
+        self.uses_memory = True
+        t = self.temporary()
+        self.emit(t + " = " + Memory(self, "rsp").load())
+        self.emit("rsp += " + str(WORD_SIZE))
+        return t
+
+    # A jump to a label that is not in the program.
+    def missing_target(self, target: str):
+        if target == str(Label("conclusion")):
+            # the conclusion is not generated yet: return
+            self.ret(check=False)
+        else:
+            self.emit("raise Exception(" + repr("jump to invalid target " + target) + ")")
+
+    def call(self, target: str, return_address: int):
+        self.push(str(return_address))
+        if len(self.emulator.variables) > 0:
+            self.emit("S.append(V[:])")
+        self.exit(target)
+
+    def ret(self, check=True):
+        value = self.pop()
+        self.emit("if S:")
+        self.emit("    V[:] = S.pop()")
+        self.exit("check_address(" + value + ")" if check else value)
+
+    # The address of the Deref `a`.
+    def address(self, a) -> str:
+        self.use(a.reg)
+        return a.reg + " + " + str(a.offset) if a.offset != 0 else a.reg
+
+    # The operand `a`, as a byte operand if `byte` is set.
+    def operand(self, a, byte=False):
+        match a:
+            case Reg(reg) | ByteReg(reg) if reg in REGISTER_NUMBERS:
+                self.use(reg)
+                return ByteOf(self, reg) if byte else Location(self, reg)
+            case Reg(name) | ByteReg(name) if name in BYTE_REGISTERS:
+                reg = REGISTERS[BYTE_REGISTERS[name]]
+                self.use(reg)
+                return ByteOf(self, reg)
+            case Variable(name):
+                slot = self.emulator.variable_slot(str(name))
+                location = Location(self, "V[" + str(slot) + "]")
+                return ByteOf(self, location.load()) if byte else location
+            case Immediate(_):
+                value = fold_immediate(a)
+                return Constant(str(value & 0xFF if byte else value))
+            case Deref(_, _):
+                t = self.temporary()
+                self.uses_memory = True
+                self.emit(t + " = " + self.address(a))
+                return ByteMemory(self, t) if byte else Memory(self, t)
+            case Global(name):
+                return Location(self, "G[" + repr(str(name)) + "]")
+            case _:
+                return Unknown(self, a)
+
+
+# The operands of the generated code: `load` returns the expression of
+# their value, and `store` emits the statements that store a value.
+
+
+class Location:
+    def __init__(self, translator, expr):
+        self.translator = translator
+        self.expr = expr
+
+    def load(self) -> str:
+        return self.expr
+
+    def store(self, value: str):
+        self.translator.emit(self.expr + " = " + value)
+
+
+class Constant:
+    def __init__(self, value):
+        self.value = value
+
+    def load(self) -> str:
+        return self.value
+
+    def store(self, value: str):
+        raise RuntimeError("store to the immediate " + self.value)
+
+
+class Unknown:
+    def __init__(self, translator, a):
+        self.translator = translator
+        self.a = a
+
+    def load(self) -> str:
+        return "fail(" + repr("Unknown arg in eval_arg: " + str(self.a)) + ")"
+
+    def store(self, value: str):
+        self.translator.emit("fail(" + repr("Unknown arg in store_arg: " + str(self.a)) + ")")
+
+
+# The low byte of a register or a variable.
+class ByteOf:
+    def __init__(self, translator, expr):
+        self.translator = translator
+        self.expr = expr
+
+    def load(self) -> str:
+        return "(" + self.expr + " & 255)"
+
+    def store(self, value: str):
+        self.translator.emit(
+            self.expr + " = (" + self.expr + " & -256) | ((" + value + ") & 255)"
+        )
+
+
+# The word of memory at the address in the local `address`.
+class Memory:
+    def __init__(self, translator, address):
+        self.translator = translator
+        self.address = address
+
+    def load(self) -> str:
+        a = self.address
+        return (
+            "(W[" + a + " >> 3] if " + str(NULL_PAGE_SIZE) + " <= " + a
+            + " < E and not " + a + " & 7 else M.load(" + a + "))"
+        )
+
+    def store(self, value: str):
+        a = self.address
+        t = self.translator.value(value)
+        emit = self.translator.emit
+        emit("if " + str(NULL_PAGE_SIZE) + " <= " + a + " < E and not " + a + " & 7:")
+        emit("    W[" + a + " >> 3] = " + t)
+        emit("else:")
+        emit("    M.store(" + a + ", " + t + ")")
+
+
+# The byte of memory at the address in the local `address`.
+class ByteMemory(Memory):
+    def load(self) -> str:
+        return "M.load_byte(" + self.address + ")"
+
+    def store(self, value: str):
+        self.translator.emit("M.store_byte(" + self.address + ", " + value + ")")
+
+
+def fail(message: str):
+    raise RuntimeError(message)
@@ -6,6 +6,8 @@ from utils import enable_tracing, run_tests, validate_tests
 from compiler_Lexam import CompilerLexam
 import sys
 
+import click
+
 
 sys.setrecursionlimit(10000)
 
@@ -17,14 +19,30 @@ if False:
 test_root = "tests/"
 test_suites = ["exam-2", "exam", "mytests"]
 
-if all(validate_tests(test_root + t, "exam", InterpLexam().interp) for t in test_suites):
-    print("Congratulations, the interpreter verifies all tests!")
-else:
-    print("The interpreter failed on one or more tests.")
-
-for test_suite in test_suites:
-    run_tests(test_suite, "exam", compiler, "exam",
-        type_check_P= TypeCheckLexam().type_check,
-        interp_P= InterpLexam().interp,
-        type_check_C= TypeCheckCexam().type_check,
-        interp_C= InterpCexam().interp)
+
+@click.command()
+@click.option(
+    "-j",
+    "--jobs",
+    default=1,
+    show_default=True,
+    help="Number of tests to run in parallel (0 = one per core)",
+    type=int,
+)
+def main(jobs):
+    if all(validate_tests(test_root + t, "exam", InterpLexam().interp) for t in test_suites):
+        print("Congratulations, the interpreter verifies all tests!")
+    else:
+        print("The interpreter failed on one or more tests.")
+
+    for test_suite in test_suites:
+        run_tests(test_suite, "exam", compiler, "exam",
+            type_check_P= TypeCheckLexam().type_check,
+            interp_P= InterpLexam().interp,
+            type_check_C= TypeCheckCexam().type_check,
+            interp_C= InterpCexam().interp,
+            jobs=jobs)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,10 +14,29 @@ import type_check_Lfun
 
 import interp_Cexam
 import interp_Lexam
+import interp_Cexam_closure
+import interp_Lexam_closure
 import type_check_Lexam
 import type_check_Cexam
 
-from utils import enable_tracing, run_one_test, run_tests
+from utils import (
+    disable_cache,
+    disable_x86_tests,
+    enable_build_times,
+    enable_counting,
+    enable_emulation,
+    enable_keep_outputs,
+    enable_profiling,
+    enable_report_steps,
+    enable_tracing,
+    run_one_test,
+    run_tests,
+    set_cache,
+    set_execution_timeout,
+    set_interp_budget,
+    write_counters,
+    write_profile,
+)
 
 # mapping of language names to type checkers and interpreters for that language
 processors : dict[str, dict[str, Callable]] = {
@@ -29,6 +48,15 @@ processors : dict[str, dict[str, Callable]] = {
         "type_check_C": type_check_Cexam.TypeCheckCexam().type_check,
         "interp_C": interp_Cexam.InterpCexam().interp
     },
+    # like "exam", with the closure compiling interpreters
+    "exam-closure":
+    {
+        "compiler": CompilerLexam(),
+        "type_check_P": type_check_Lexam.TypeCheckLexam().type_check,
+        "interp_P": interp_Lexam_closure.InterpLexamClosure().interp,
+        "type_check_C": type_check_Cexam.TypeCheckCexam().type_check,
+        "interp_C": interp_Cexam_closure.InterpCexamClosure().interp
+    },
     "fun":
     {
         "compiler": compiler.Compiler(),
@@ -43,8 +71,8 @@ processors : dict[str, dict[str, Callable]] = {
 @click.option("-v", "--verbose",
      is_flag=True, show_default=True, default=False, help="Print progress messages"
 )
-@click.option("-l", "--lang", help="Lang to use", required=True, type=click.Choice(["fun", "exam"]))
-@click.option("-c", "--compiler", help="Compiler to use", required=True, type=click.Choice(["fun", "exam"]))
+@click.option("-l", "--lang", help="Lang to use", required=True, type=click.Choice(list(processors)))
+@click.option("-c", "--compiler", help="Compiler to use", required=True, type=click.Choice(list(processors)))
 @click.option(
     "--trace/--no-trace",
     default=False,
@@ -60,17 +88,171 @@ processors : dict[str, dict[str, Callable]] = {
     help="Change the recursion limit",
     type=int,
 )
+@click.option(
+    "-j",
+    "--jobs",
+    default=1,
+    show_default=True,
+    help="Number of tests to run in parallel (0 = one per core)",
+    type=int,
+)
+@click.option(
+    "--build-jobs",
+    default=0,
+    show_default=True,
+    help="Number of gcc processes running in parallel (0 = one per core)",
+    type=int,
+)
+@click.option(
+    "--timeout",
+    default=10.0,
+    show_default=True,
+    help="Seconds a compiled test program may run",
+    type=float,
+)
+@click.option(
+    "--max-steps",
+    default=10_000_000,
+    show_default=True,
+    help="Steps the interpreters may take to check a pass (0 = no limit)",
+    type=int,
+)
+@click.option(
+    "--interp-timeout",
+    default=10.0,
+    show_default=True,
+    help="Seconds the interpreters may take to check a pass (0 = no limit)",
+    type=float,
+)
+@click.option(
+    "--report-steps",
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="Report the number of steps the interpreters take for every pass",
+)
+@click.option(
+    "--test-x86/--no-test-x86",
+    default=True,
+    show_default=True,
+    help="Check the x86 passes with the x86 emulator",
+)
+@click.option(
+    "--emulate",
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="Run the compiled programs on the x86 emulator instead of natively",
+)
+@click.option(
+    "--build-times",
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="Report the time spent in assemble, link and execute for every test",
+)
+@click.option(
+    "--keep-outputs",
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="Write the .out file of every pass, not only of failing ones",
+)
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    show_default=True,
+    help="Reuse the results of tests whose sources did not change",
+)
+@click.option(
+    "--cache-dir",
+    default=".test-cache",
+    show_default=True,
+    help="Directory of the test cache",
+    type=click.Path(file_okay=False),
+)
+@click.option(
+    "--cache-size",
+    default=256,
+    show_default=True,
+    help="Size limit of the test cache in megabytes",
+    type=int,
+)
+@click.option(
+    "--profile-out",
+    default=None,
+    help="Record time, peak memory and program size of every pass "
+    + "and write them to FILE (CSV if it ends in .csv, JSON otherwise)",
+    type=click.Path(dir_okay=False),
+)
+@click.option(
+    "--counters-out",
+    default=None,
+    help="Run the compiled program of every test on the x86 emulator with "
+    + "its performance counters and write them to FILE as JSON. The "
+    + "compiler generates the same code on every run only with a fixed "
+    + "PYTHONHASHSEED, so the tests are run again with PYTHONHASHSEED=0 "
+    + "if it is not set",
+    type=click.Path(dir_okay=False),
+)
 @click.argument("paths", nargs=-1, type=click.Path(exists=True))
-def main(verbose, lang, compiler, trace, recursion_limit, paths):
+def main(
+    verbose,
+    lang,
+    compiler,
+    trace,
+    recursion_limit,
+    jobs,
+    build_jobs,
+    timeout,
+    max_steps,
+    interp_timeout,
+    report_steps,
+    test_x86,
+    emulate,
+    build_times,
+    keep_outputs,
+    cache,
+    cache_dir,
+    cache_size,
+    profile_out,
+    counters_out,
+    paths,
+):
     """
     Runs tests found in PATH. If PATH is a directory,
     script will try to find and run all the tests in it.
     If it is a single file, script will try to run only that single
     test.
     """
+    if counters_out and os.environ.get("PYTHONHASHSEED", "random") == "random":
+        # the order of the sets of the compiler, and so the code it
+        # generates, depends on the hash seed
+        os.environ["PYTHONHASHSEED"] = "0"
+        sys.stdout.flush()
+        os.execv(sys.executable, [sys.executable] + sys.argv)
     sys.setrecursionlimit(recursion_limit)
     if trace:
         enable_tracing()
+    if build_times:
+        enable_build_times()
+    if keep_outputs:
+        enable_keep_outputs()
+    if not cache:
+        disable_cache()
+    set_cache(cache_dir, cache_size * 1024 * 1024)
+    if profile_out:
+        enable_profiling()
+    if counters_out:
+        enable_counting()
+    set_execution_timeout(timeout)
+    set_interp_budget(max_steps or None, interp_timeout or None)
+    if report_steps:
+        enable_report_steps()
+    if not test_x86:
+        disable_x86_tests()
+    if emulate:
+        enable_emulation()
     for path in paths:
         if verbose:
             print("processing path " + path)
@@ -81,6 +263,8 @@ def main(verbose, lang, compiler, trace, recursion_limit, paths):
                 lang=lang,
                 # compiler=_compiler,
                 compiler_name=compiler,
+                jobs=jobs,
+                build_jobs=build_jobs,
                 **processors[lang]
             )
         else:
@@ -111,6 +295,10 @@ def main(verbose, lang, compiler, trace, recursion_limit, paths):
                 + " on language "
                 + lang
             )
+    if profile_out:
+        write_profile(profile_out)
+    if counters_out:
+        write_counters(counters_out)
 
 
 if __name__ == "__main__":
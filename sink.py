@@ -0,0 +1,106 @@
+import atexit
+import io
+import sys
+from abc import ABC, abstractmethod
+
+# The output of the interpreted programs.
+#
+# The interpreters and the x86 emulator do not print what the program
+# prints; they write it to the current sink. A sink collects the text
+# and writes it out according to its flush policy, so that a program
+# printing in a loop does not cost a write to the terminal (or to the
+# captured stdout of the test harness) per value.
+#
+# The flush policy of a sink is given by
+#  - buffer_size: the buffered text is written out once it is at least
+#    that long; 0 writes every value out immediately, and
+#  - flush_on_input: the buffered text is written out before the program
+#    reads its input, so that what it printed so far is visible to the
+#    user typing the input.
+# Whatever is left is written out by flush(), which is also called at
+# exit for the default sink.
+
+
+class OutputSink(ABC):
+    def __init__(self, buffer_size: int = 1 << 16, flush_on_input: bool = True):
+        self.buffer_size = buffer_size
+        self.flush_on_input = flush_on_input
+        self.parts: list[str] = []
+        self.size = 0
+
+    def write(self, text: str):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            text = "".join(self.parts)
+            self.parts.clear()
+            self.size = 0
+            self.write_out(text)
+
+    # Writes out the text the sink has collected.
+    @abstractmethod
+    def write_out(self, text: str):
+        pass
+
+
+# Writes to a file, by default to the sys.stdout of the moment the
+# text is written out.
+class StreamSink(OutputSink):
+    def __init__(self, stream=None, buffer_size: int = 1 << 16, flush_on_input: bool = True):
+        super().__init__(buffer_size, flush_on_input)
+        self.stream = stream
+
+    def write_out(self, text: str):
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.write(text)
+        stream.flush()
+
+
+# Keeps everything in memory, for the test harness.
+class MemorySink(OutputSink):
+    def __init__(self):
+        super().__init__(buffer_size=sys.maxsize, flush_on_input=False)
+        self.contents = io.StringIO()
+
+    def write_out(self, text: str):
+        self.contents.write(text)
+
+    def getvalue(self) -> str:
+        self.flush()
+        return self.contents.getvalue()
+
+
+current: OutputSink = StreamSink()
+atexit.register(lambda: current.flush())
+
+
+# Makes `new_sink` the current sink and returns the previous one, after
+# flushing it.
+def set_sink(new_sink: OutputSink) -> OutputSink:
+    global current
+    previous = current
+    previous.flush()
+    current = new_sink
+    return previous
+
+
+def emit(value):
+    current.write(str(value))
+
+
+def flush():
+    current.flush()
+
+
+# Reads an integer for the input_int of the program that writes to
+# `output` (the current sink by default).
+def read_int(output: OutputSink | None = None) -> int:
+    if output is None:
+        output = current
+    if output.flush_on_input:
+        output.flush()
+    return int(input())
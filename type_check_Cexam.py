@@ -1,6 +1,7 @@
 import ast
 from type_check_Cfun import TypeCheckCfun
 import utils
+from dispatch import handles
 
 
 class TypeCheckCexam(TypeCheckCfun):
@@ -29,64 +30,55 @@ class TypeCheckCexam(TypeCheckCfun):
             case _:
                 super().check_type_equal(t1, t2, e)
 
-    def type_check_exp(self, e, env):
-        match e:
-            case utils.AllocateArray(length, typ):  # FIXED
-                return typ
-            case ast.List(es, ast.Load()):
-                ts = [self.type_check_exp(e, env) for e in es]
-                elt_ty = ts[0]
-                for (ty, elt) in zip(ts, es):
-                    self.check_type_equal(elt_ty, ty, elt)
-                e.has_type = utils.ListType(elt_ty)  # type: ignore
-                return e.has_type  # type: ignore
-            case ast.Call(ast.Name("len"), [tup]):
-                tup_t = self.type_check_exp(tup, env)
-                tup.has_type = tup_t  # type: ignore
-                match tup_t:
-                    case utils.TupleType(_) | utils.ListType(_):
-                        return utils.IntType()
-                    case utils.Bottom():
-                        return utils.Bottom()
-                    case _:
-                        raise Exception(
-                            "len expected a tuple, not "
-                            + repr(tup_t)
-                            + "\nAST info 1: "
-                            + utils.ast_loc(e)
-                            + " & AST info 2: "
-                            + utils.ast_loc(tup)
-                        )
-            case ast.Subscript(tup, index, ast.Load()):
-                tup_ty = self.type_check_exp(tup, env)
-                index_ty = self.type_check_exp(index, env)
-                self.check_type_equal(index_ty, utils.IntType(), index)
-                match tup_ty:
-                    case utils.TupleType(ts):
-                        match index:
-                            case ast.Constant(i):
-                                return ts[i]
-                            case _:
-                                raise Exception(
-                                    "subscript required constant integer index"
-                                    + "\nAST info 1: "
-                                    + utils.ast_loc(e)
-                                    + " & AST info 2: "
-                                    + utils.ast_loc(tup)
-                                    + (
-                                        (" & AST info 3: " + utils.ast_loc(index))
-                                        if isinstance(index, ast.AST)
-                                        else ""
-                                    )
-                                )
-                    case utils.ListType(ty):
-                        return ty
-                    case utils.Bottom():
-                        return utils.Bottom()
+    @handles("exp", utils.AllocateArray)
+    def type_check_allocate_array(self, e, env):  # FIXED
+        return e.ty
+
+    @handles("exp", ast.List)
+    def type_check_list(self, e, env):
+        es = e.elts
+        ts = [self.type_check_exp(e, env) for e in es]
+        elt_ty = ts[0]
+        for (ty, elt) in zip(ts, es):
+            self.check_type_equal(elt_ty, ty, elt)
+        e.has_type = utils.ListType(elt_ty)  # type: ignore
+        return e.has_type  # type: ignore
+
+    @handles("exp", ast.Call, "len")
+    def type_check_len(self, e, env):
+        [tup] = e.args
+        tup_t = self.type_check_exp(tup, env)
+        tup.has_type = tup_t  # type: ignore
+        match tup_t:
+            case utils.TupleType(_) | utils.ListType(_):
+                return utils.IntType()
+            case utils.Bottom():
+                return utils.Bottom()
+            case _:
+                raise Exception(
+                    "len expected a tuple, not "
+                    + repr(tup_t)
+                    + "\nAST info 1: "
+                    + utils.ast_loc(e)
+                    + " & AST info 2: "
+                    + utils.ast_loc(tup)
+                )
+
+    @handles("exp", ast.Subscript)
+    def type_check_subscript(self, e, env):
+        tup = e.value
+        index = e.slice
+        tup_ty = self.type_check_exp(tup, env)
+        index_ty = self.type_check_exp(index, env)
+        self.check_type_equal(index_ty, utils.IntType(), index)
+        match tup_ty:
+            case utils.TupleType(ts):
+                match index:
+                    case ast.Constant(i):
+                        return ts[i]
                     case _:
                         raise Exception(
-                            "subscript expected a tuple, not "
-                            + repr(tup_ty)
+                            "subscript required constant integer index"
                             + "\nAST info 1: "
                             + utils.ast_loc(e)
                             + " & AST info 2: "
@@ -97,14 +89,36 @@ class TypeCheckCexam(TypeCheckCfun):
                                 else ""
                             )
                         )
-            case ast.BinOp(left, ast.Mult() | ast.FloorDiv() | ast.Mod(), right):
-                l = self.type_check_exp(left, env)
-                self.check_type_equal(l, utils.IntType(), left)
-                r = self.type_check_exp(right, env)
-                self.check_type_equal(r, utils.IntType(), right)
-                return utils.IntType()
+            case utils.ListType(ty):
+                return ty
+            case utils.Bottom():
+                return utils.Bottom()
             case _:
-                return super().type_check_exp(e, env)
+                raise Exception(
+                    "subscript expected a tuple, not "
+                    + repr(tup_ty)
+                    + "\nAST info 1: "
+                    + utils.ast_loc(e)
+                    + " & AST info 2: "
+                    + utils.ast_loc(tup)
+                    + (
+                        (" & AST info 3: " + utils.ast_loc(index))
+                        if isinstance(index, ast.AST)
+                        else ""
+                    )
+                )
+
+    @handles("exp", ast.BinOp, ast.Mult)
+    @handles("exp", ast.BinOp, ast.FloorDiv)
+    @handles("exp", ast.BinOp, ast.Mod)
+    def type_check_arith(self, e, env):
+        left = e.left
+        right = e.right
+        l = self.type_check_exp(left, env)
+        self.check_type_equal(l, utils.IntType(), left)
+        r = self.type_check_exp(right, env)
+        self.check_type_equal(r, utils.IntType(), right)
+        return utils.IntType()
 
     def type_check_stmt(self, s, env):
         match s:
@@ -2,9 +2,10 @@ import ast
 from types import NoneType
 import utils
 import copy
+from dispatch import Dispatcher, handles
 
 
-class TypeCheckCif:
+class TypeCheckCif(Dispatcher):
     def check_type_equal(self, t1, t2, e):
         if t1 == utils.Bottom() or t2 == utils.Bottom():
             pass
@@ -54,67 +55,88 @@ class TypeCheckCif:
                 )
 
     def type_check_exp(self, e, env):
-        match e:
-            case ast.Name(id):
-                return self.type_check_atm(e, env)
-            case ast.Constant(value):
-                return self.type_check_atm(e, env)
-            case ast.IfExp(test, body, orelse):
-                test_t = self.type_check_exp(test, env)
-                self.check_type_equal(utils.BoolType(), test_t, test)
-                body_t = self.type_check_exp(body, env)
-                orelse_t = self.type_check_exp(orelse, env)
-                self.check_type_equal(body_t, orelse_t, e)
-                return body_t
-            case ast.BinOp(left, op, right) if isinstance(op, ast.Add) or isinstance(
-                op, ast.Sub
-            ):
-                l = self.type_check_atm(left, env)
-                self.check_type_equal(l, utils.IntType(), e)
-                r = self.type_check_atm(right, env)
-                self.check_type_equal(r, utils.IntType(), e)
-                return utils.IntType()
-            case ast.UnaryOp(ast.USub(), v):
-                t = self.type_check_atm(v, env)
-                self.check_type_equal(t, utils.IntType(), e)
-                return utils.IntType()
-            case ast.UnaryOp(ast.Not(), v):
-                t = self.type_check_exp(v, env)
-                self.check_type_equal(t, utils.BoolType(), e)
-                return utils.BoolType()
-            case ast.Compare(left, [cmp], [right]) if isinstance(
-                cmp, ast.Eq
-            ) or isinstance(cmp, ast.NotEq):
-                l = self.type_check_atm(left, env)
-                r = self.type_check_atm(right, env)
-                self.check_type_equal(l, r, e)
-                return utils.BoolType()
-            case ast.Compare(left, [cmp], [right]):
-                l = self.type_check_atm(left, env)
-                self.check_type_equal(l, utils.IntType(), left)
-                r = self.type_check_atm(right, env)
-                self.check_type_equal(r, utils.IntType(), right)
-                return utils.BoolType()
-            case ast.Call(ast.Name("input_int"), []):
-                return utils.IntType()
-            # case Let(Name(x), rhs, body):
-            #   t = self.type_check_exp(rhs, env)
-            #   new_env = dict(env)
-            #   new_env[x] = t
-            #   return self.type_check_exp(body, new_env)
-            case utils.Begin(ss, e):
-                self.type_check_stmts(ss, env)
-                return self.type_check_exp(e, env)
-            case _:
-                raise Exception(
-                    "error in type_check_exp, unexpected "
-                    + repr(e)
-                    + (
-                        ("\nAST info 1: " + utils.ast_loc(e))
-                        if isinstance(e, ast.AST)
-                        else ""
-                    )
-                )
+        return self.dispatch("exp", e, env)
+
+    @handles("exp", ast.Name)
+    @handles("exp", ast.Constant)
+    def type_check_atm_exp(self, e, env):
+        return self.type_check_atm(e, env)
+
+    @handles("exp", ast.IfExp)
+    def type_check_if_exp(self, e, env):
+        test_t = self.type_check_exp(e.test, env)
+        self.check_type_equal(utils.BoolType(), test_t, e.test)
+        body_t = self.type_check_exp(e.body, env)
+        orelse_t = self.type_check_exp(e.orelse, env)
+        self.check_type_equal(body_t, orelse_t, e)
+        return body_t
+
+    @handles("exp", ast.BinOp, ast.Add)
+    @handles("exp", ast.BinOp, ast.Sub)
+    def type_check_add_sub(self, e, env):
+        l = self.type_check_atm(e.left, env)
+        self.check_type_equal(l, utils.IntType(), e)
+        r = self.type_check_atm(e.right, env)
+        self.check_type_equal(r, utils.IntType(), e)
+        return utils.IntType()
+
+    @handles("exp", ast.UnaryOp, ast.USub)
+    def type_check_neg(self, e, env):
+        t = self.type_check_atm(e.operand, env)
+        self.check_type_equal(t, utils.IntType(), e)
+        return utils.IntType()
+
+    @handles("exp", ast.UnaryOp, ast.Not)
+    def type_check_not(self, e, env):
+        t = self.type_check_exp(e.operand, env)
+        self.check_type_equal(t, utils.BoolType(), e)
+        return utils.BoolType()
+
+    @handles("exp", ast.Compare, ast.Eq)
+    @handles("exp", ast.Compare, ast.NotEq)
+    def type_check_equality(self, e, env):
+        l = self.type_check_atm(e.left, env)
+        r = self.type_check_atm(e.comparators[0], env)
+        self.check_type_equal(l, r, e)
+        return utils.BoolType()
+
+    @handles("exp", ast.Compare)
+    def type_check_compare(self, e, env):
+        left = e.left
+        right = e.comparators[0]
+        l = self.type_check_atm(left, env)
+        self.check_type_equal(l, utils.IntType(), left)
+        r = self.type_check_atm(right, env)
+        self.check_type_equal(r, utils.IntType(), right)
+        return utils.BoolType()
+
+    @handles("exp", ast.Call, "input_int")
+    def type_check_input_int(self, e, env):
+        return utils.IntType()
+
+    # @handles("exp", Let)
+    # def type_check_let(self, e, env):
+    #   t = self.type_check_exp(e.rhs, env)
+    #   new_env = dict(env)
+    #   new_env[e.var.id] = t
+    #   return self.type_check_exp(e.body, new_env)
+
+    @handles("exp", utils.Begin)
+    def type_check_begin(self, e, env):
+        self.type_check_stmts(e.body, env)
+        return self.type_check_exp(e.result, env)
+
+    @handles("exp")
+    def type_check_unexpected(self, e, env):
+        raise Exception(
+            "error in type_check_exp, unexpected "
+            + repr(e)
+            + (
+                ("\nAST info 1: " + utils.ast_loc(e))
+                if isinstance(e, ast.AST)
+                else ""
+            )
+        )
 
     def type_check_stmts(self, ss, env):
         for s in ss:
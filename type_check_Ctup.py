@@ -1,6 +1,7 @@
 import ast
 from type_check_Cwhile import TypeCheckCwhile
 import utils
+from dispatch import handles
 
 
 class TypeCheckCtup(TypeCheckCwhile):
@@ -30,46 +31,52 @@ class TypeCheckCtup(TypeCheckCwhile):
             case _:
                 super().check_type_equal(t1, t2, e)
 
-    def type_check_exp(self, e, env):
-        match e:
-            case utils.Allocate(length, typ):
-                return typ
-            case utils.GlobalValue(name):
+    @handles("exp", utils.Allocate)
+    def type_check_allocate(self, e, env):
+        return e.ty
+
+    @handles("exp", utils.GlobalValue)
+    def type_check_global_value(self, e, env):
+        return utils.IntType()
+
+    @handles("exp", ast.Subscript, ast.Constant)
+    def type_check_subscript(self, e, env):
+        tup = e.value
+        index = e.slice.value
+        tup_t = self.type_check_atm(tup, env)
+        match tup_t:
+            case utils.TupleType(ts):
+                return ts[index]
+            case utils.Bottom():
+                return utils.Bottom()
+            case _:
+                raise Exception(
+                    "error, expected a tuple, not "
+                    + repr(tup_t)
+                    + "\nAST info 1: "
+                    + utils.ast_loc(e)
+                    + " & AST info 2: "
+                    + utils.ast_loc(tup)
+                )
+
+    @handles("exp", ast.Call, "len")
+    def type_check_len(self, e, env):
+        [tup] = e.args
+        tup_t = self.type_check_atm(tup, env)
+        match tup_t:
+            case utils.TupleType(ts):
                 return utils.IntType()
-            case ast.Subscript(tup, ast.Constant(index), ast.Load()):
-                tup_t = self.type_check_atm(tup, env)
-                match tup_t:
-                    case utils.TupleType(ts):
-                        return ts[index]
-                    case utils.Bottom():
-                        return utils.Bottom()
-                    case _:
-                        raise Exception(
-                            "error, expected a tuple, not "
-                            + repr(tup_t)
-                            + "\nAST info 1: "
-                            + utils.ast_loc(e)
-                            + " & AST info 2: "
-                            + utils.ast_loc(tup)
-                        )
-            case ast.Call(ast.Name("len"), [tup]):
-                tup_t = self.type_check_atm(tup, env)
-                match tup_t:
-                    case utils.TupleType(ts):
-                        return utils.IntType()
-                    case utils.Bottom():
-                        return utils.Bottom()
-                    case _:
-                        raise Exception(
-                            "error, expected a tuple, not "
-                            + repr(tup_t)
-                            + "\nAST info 1: "
-                            + utils.ast_loc(e)
-                            + " & AST info 2: "
-                            + utils.ast_loc(tup)
-                        )
+            case utils.Bottom():
+                return utils.Bottom()
             case _:
-                return super().type_check_exp(e, env)
+                raise Exception(
+                    "error, expected a tuple, not "
+                    + repr(tup_t)
+                    + "\nAST info 1: "
+                    + utils.ast_loc(e)
+                    + " & AST info 2: "
+                    + utils.ast_loc(tup)
+                )
 
     def type_check_stmt(self, s, env):
         match s:
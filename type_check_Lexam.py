@@ -2,6 +2,7 @@ import ast
 from types import NoneType
 from type_check_Lfun import TypeCheckLfun
 import utils
+from dispatch import handles
 
 
 class TypeCheckLexam(TypeCheckLfun):
@@ -17,150 +18,157 @@ class TypeCheckLexam(TypeCheckLfun):
 
 
 class TypeCheckLexam(TypeCheckLfun):
-    def type_check_exp(self, e, env):
-        match e:
-            case utils.AllocateArray(length, typ):  # FIXED
-                return typ
-            case ast.List(es, ast.Load()):
-                ts = [self.type_check_exp(e, env) for e in es]
-                elt_ty = ts[0] if len(ts) > 0 else utils.Bottom
-                for (ty, elt) in zip(ts, es):
-                    self.check_type_equal(elt_ty, ty, elt)
-                e.has_type = utils.ListType(elt_ty)  # type: ignore
-                return e.has_type  # type: ignore
-            case ast.Subscript(tup, ast.Slice(lower, upper), ast.Load()):
-                tup_t = self.type_check_exp(tup, env)
-                tup.has_type = tup_t
-                lower_ty = self.type_check_exp(lower, env)
-                upper_ty = self.type_check_exp(upper, env)
-                self.check_type_equal(lower_ty, utils.IntType(), lower)
-                self.check_type_equal(upper_ty, utils.IntType(), upper)
-                match (tup_t, lower, upper):
-                    case (utils.ListType(_), _, _):
-                        e.has_type = tup_t
-                        return tup_t
-                    case (
-                        utils.TupleType(tys),
-                        ast.Constant(lower_v),
-                        ast.Constant(upper_v),
-                    ):
-                        ret_t = tys[lower_v:upper_v]
-                        e.has_type = utils.TupleType(ret_t)
-                        return e.has_type
-                    case _:
-                        raise Exception(
-                            "untypable slicing expression: "
-                            + repr(e)
-                            + " with sequence type "
-                            + repr(tup_t)
-                            + "\nAST info 1: "
-                            + utils.ast_loc(e)
-                            + " & AST info 2: "
-                            + utils.ast_loc(tup)
-                        )
-            case ast.Call(ast.Name("len"), [tup]):
-                tup_t = self.type_check_exp(tup, env)
-                tup.has_type = tup_t  # type: ignore
-                match tup_t:
-                    case utils.TupleType(_) | utils.ListType(_):
-                        return utils.IntType()
-                    case utils.Bottom():
-                        return utils.Bottom()
-                    case _:
-                        raise Exception(
-                            "len expected tuple or list, not "
-                            + repr(tup_t)
-                            + "\nAST info 1: "
-                            + utils.ast_loc(e)
-                            + " & AST info 2: "
-                            + utils.ast_loc(tup)
-                        )
-            case ast.Call(ast.Name("array_len"), [tup]):
-                tup_t = self.type_check_exp(tup, env)
-                tup.has_type = tup_t  # type: ignore
-                match tup_t:
-                    case utils.ListType(_):
-                        return utils.IntType()
-                    case _:
-                        raise Exception(
-                            "array_len expected list, not "
-                            + repr(tup_t)
-                            + "\nAST info 1: "
-                            + utils.ast_loc(e)
-                            + " & AST info 2: "
-                            + utils.ast_loc(tup)
-                        )
-            case ast.Call(ast.Name("array_load"), [tup, index]):
-                tup_ty = self.type_check_exp(tup, env)
-                tup.has_type = tup_ty  # type: ignore
-                index_ty = self.type_check_exp(index, env)
-                self.check_type_equal(index_ty, utils.IntType(), index)
-                match tup_ty:
-                    case utils.ListType(t):
-                        return t
-                    case _:
-                        raise Exception(
-                            "array_len expected list, not "
-                            + repr(tup_ty)
-                            + "\nAST info 1: "
-                            + utils.ast_loc(e)
-                            + " & AST info 2: "
-                            + utils.ast_loc(tup)
-                            + " & AST info 3: "
-                            + utils.ast_loc(index)
-                        )
-            case ast.Call(ast.Name("array_store"), [tup, index, value]):
-                tup_ty = self.type_check_exp(tup, env)
-                tup.has_type = tup_ty  # type: ignore
-                index_ty = self.type_check_exp(index, env)
-                value_ty = self.type_check_exp(value, env)
-                self.check_type_equal(index_ty, utils.IntType(), index)
-                match tup_ty:
-                    case utils.ListType(t):
-                        self.check_type_equal(value_ty, t, value)
-                        return utils.VoidType()
-                    case _:
-                        raise Exception(
-                            "array_store expected list, not "
-                            + repr(tup_ty)
-                            + "\nAST info 1: "
-                            + utils.ast_loc(e)
-                            + " & AST info 2: "
-                            + utils.ast_loc(tup)
-                            + " & AST info 3: "
-                            + utils.ast_loc(index)
-                            + " & AST info 4: "
-                            + utils.ast_loc(value)
-                        )
-            case ast.Subscript(tup, index, ast.Load()):
-                tup_ty = self.type_check_exp(tup, env)
-                tup.has_type = tup_ty  # type: ignore
-                index_ty = self.type_check_exp(index, env)
-                self.check_type_equal(index_ty, utils.IntType(), index)
-                match tup_ty:
-                    case utils.TupleType(ts):
-                        match index:
-                            case ast.Constant(i):
-                                return ts[i]
-                            case _:
-                                raise Exception(
-                                    "subscript required constant integer index"
-                                    + "\nAST info 1: "
-                                    + utils.ast_loc(e)
-                                    + " & AST info 2: "
-                                    + utils.ast_loc(tup)
-                                    + (
-                                        (" & AST info 3: " + utils.ast_loc(index))
-                                        if isinstance(index, ast.AST)
-                                        else ""
-                                    )
-                                )
-                    case utils.ListType(ty):
-                        return ty
+    @handles("exp", utils.AllocateArray)
+    def type_check_allocate_array(self, e, env):  # FIXED
+        return e.ty
+
+    @handles("exp", ast.List)
+    def type_check_list(self, e, env):
+        es = e.elts
+        ts = [self.type_check_exp(e, env) for e in es]
+        elt_ty = ts[0] if len(ts) > 0 else utils.Bottom
+        for (ty, elt) in zip(ts, es):
+            self.check_type_equal(elt_ty, ty, elt)
+        e.has_type = utils.ListType(elt_ty)  # type: ignore
+        return e.has_type  # type: ignore
+
+    @handles("exp", ast.Subscript, ast.Slice)
+    def type_check_slice(self, e, env):
+        tup = e.value
+        lower = e.slice.lower
+        upper = e.slice.upper
+        tup_t = self.type_check_exp(tup, env)
+        tup.has_type = tup_t
+        lower_ty = self.type_check_exp(lower, env)
+        upper_ty = self.type_check_exp(upper, env)
+        self.check_type_equal(lower_ty, utils.IntType(), lower)
+        self.check_type_equal(upper_ty, utils.IntType(), upper)
+        match (tup_t, lower, upper):
+            case (utils.ListType(_), _, _):
+                e.has_type = tup_t
+                return tup_t
+            case (
+                utils.TupleType(tys),
+                ast.Constant(lower_v),
+                ast.Constant(upper_v),
+            ):
+                ret_t = tys[lower_v:upper_v]
+                e.has_type = utils.TupleType(ret_t)
+                return e.has_type
+            case _:
+                raise Exception(
+                    "untypable slicing expression: "
+                    + repr(e)
+                    + " with sequence type "
+                    + repr(tup_t)
+                    + "\nAST info 1: "
+                    + utils.ast_loc(e)
+                    + " & AST info 2: "
+                    + utils.ast_loc(tup)
+                )
+
+    @handles("exp", ast.Call, "len")
+    def type_check_len(self, e, env):
+        [tup] = e.args
+        tup_t = self.type_check_exp(tup, env)
+        tup.has_type = tup_t  # type: ignore
+        match tup_t:
+            case utils.TupleType(_) | utils.ListType(_):
+                return utils.IntType()
+            case utils.Bottom():
+                return utils.Bottom()
+            case _:
+                raise Exception(
+                    "len expected tuple or list, not "
+                    + repr(tup_t)
+                    + "\nAST info 1: "
+                    + utils.ast_loc(e)
+                    + " & AST info 2: "
+                    + utils.ast_loc(tup)
+                )
+
+    @handles("exp", ast.Call, "array_len")
+    def type_check_array_len(self, e, env):
+        [tup] = e.args
+        tup_t = self.type_check_exp(tup, env)
+        tup.has_type = tup_t  # type: ignore
+        match tup_t:
+            case utils.ListType(_):
+                return utils.IntType()
+            case _:
+                raise Exception(
+                    "array_len expected list, not "
+                    + repr(tup_t)
+                    + "\nAST info 1: "
+                    + utils.ast_loc(e)
+                    + " & AST info 2: "
+                    + utils.ast_loc(tup)
+                )
+
+    @handles("exp", ast.Call, "array_load")
+    def type_check_array_load(self, e, env):
+        [tup, index] = e.args
+        tup_ty = self.type_check_exp(tup, env)
+        tup.has_type = tup_ty  # type: ignore
+        index_ty = self.type_check_exp(index, env)
+        self.check_type_equal(index_ty, utils.IntType(), index)
+        match tup_ty:
+            case utils.ListType(t):
+                return t
+            case _:
+                raise Exception(
+                    "array_len expected list, not "
+                    + repr(tup_ty)
+                    + "\nAST info 1: "
+                    + utils.ast_loc(e)
+                    + " & AST info 2: "
+                    + utils.ast_loc(tup)
+                    + " & AST info 3: "
+                    + utils.ast_loc(index)
+                )
+
+    @handles("exp", ast.Call, "array_store")
+    def type_check_array_store(self, e, env):
+        [tup, index, value] = e.args
+        tup_ty = self.type_check_exp(tup, env)
+        tup.has_type = tup_ty  # type: ignore
+        index_ty = self.type_check_exp(index, env)
+        value_ty = self.type_check_exp(value, env)
+        self.check_type_equal(index_ty, utils.IntType(), index)
+        match tup_ty:
+            case utils.ListType(t):
+                self.check_type_equal(value_ty, t, value)
+                return utils.VoidType()
+            case _:
+                raise Exception(
+                    "array_store expected list, not "
+                    + repr(tup_ty)
+                    + "\nAST info 1: "
+                    + utils.ast_loc(e)
+                    + " & AST info 2: "
+                    + utils.ast_loc(tup)
+                    + " & AST info 3: "
+                    + utils.ast_loc(index)
+                    + " & AST info 4: "
+                    + utils.ast_loc(value)
+                )
+
+    @handles("exp", ast.Subscript)
+    def type_check_subscript(self, e, env):
+        tup = e.value
+        index = e.slice
+        tup_ty = self.type_check_exp(tup, env)
+        tup.has_type = tup_ty  # type: ignore
+        index_ty = self.type_check_exp(index, env)
+        self.check_type_equal(index_ty, utils.IntType(), index)
+        match tup_ty:
+            case utils.TupleType(ts):
+                match index:
+                    case ast.Constant(i):
+                        return ts[i]
                     case _:
                         raise Exception(
-                            "subscript expected a tuple, not "
-                            + repr(tup_ty)
+                            "subscript required constant integer index"
                             + "\nAST info 1: "
                             + utils.ast_loc(e)
                             + " & AST info 2: "
@@ -171,14 +179,34 @@ class TypeCheckLexam(TypeCheckLfun):
                                 else ""
                             )
                         )
-            case ast.BinOp(left, ast.Mult() | ast.FloorDiv() | ast.Mod(), right):
-                l = self.type_check_exp(left, env)
-                self.check_type_equal(l, utils.IntType(), left)
-                r = self.type_check_exp(right, env)
-                self.check_type_equal(r, utils.IntType(), right)
-                return utils.IntType()
+            case utils.ListType(ty):
+                return ty
             case _:
-                return super().type_check_exp(e, env)
+                raise Exception(
+                    "subscript expected a tuple, not "
+                    + repr(tup_ty)
+                    + "\nAST info 1: "
+                    + utils.ast_loc(e)
+                    + " & AST info 2: "
+                    + utils.ast_loc(tup)
+                    + (
+                        (" & AST info 3: " + utils.ast_loc(index))
+                        if isinstance(index, ast.AST)
+                        else ""
+                    )
+                )
+
+    @handles("exp", ast.BinOp, ast.Mult)
+    @handles("exp", ast.BinOp, ast.FloorDiv)
+    @handles("exp", ast.BinOp, ast.Mod)
+    def type_check_arith(self, e, env):
+        left = e.left
+        right = e.right
+        l = self.type_check_exp(left, env)
+        self.check_type_equal(l, utils.IntType(), left)
+        r = self.type_check_exp(right, env)
+        self.check_type_equal(r, utils.IntType(), right)
+        return utils.IntType()
 
     def type_check_stmts(self, ss, env, idx=0):
         def _logic(obj, env):
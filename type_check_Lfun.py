@@ -2,6 +2,7 @@ import ast
 from types import NoneType
 from type_check_Ltup import TypeCheckLtup
 import utils
+from dispatch import handles
 
 
 class TypeCheckLfun(TypeCheckLtup):
@@ -80,33 +81,29 @@ class TypeCheckLfun(TypeCheckLtup):
                     )
                 )
 
-    def type_check_exp(self, e, env):
-        match e:
-            case utils.FunRef(id, arity):
-                return env[id]
-            case ast.Call(ast.Name("input_int"), []):
-                return super().type_check_exp(e, env)
-            case ast.Call(ast.Name("len"), [tup]):
-                return super().type_check_exp(e, env)
-            case ast.Call(func, args):
-                func_t = self.type_check_exp(func, env)
-                args_t = [self.type_check_exp(arg, env) for arg in args]
-                match func_t:
-                    case utils.FunctionType(params_t, return_t):
-                        for (arg_t, param_t) in zip(args_t, params_t):
-                            self.check_type_equal(param_t, arg_t, e)
-                        return return_t
-                    case _:
-                        raise Exception(
-                            "type_check_exp: in call, unexpected "
-                            + repr(func_t)
-                            + "\nAST info 1: "
-                            + utils.ast_loc(e)
-                            + " & AST info 2: "
-                            + utils.ast_loc(func)
-                        )
+    @handles("exp", utils.FunRef)
+    def type_check_fun_ref(self, e, env):
+        return env[e.name]
+
+    # input_int and len are handled by the handlers registered for them
+    @handles("exp", ast.Call)
+    def type_check_call(self, e, env):
+        func_t = self.type_check_exp(e.func, env)
+        args_t = [self.type_check_exp(arg, env) for arg in e.args]
+        match func_t:
+            case utils.FunctionType(params_t, return_t):
+                for (arg_t, param_t) in zip(args_t, params_t):
+                    self.check_type_equal(param_t, arg_t, e)
+                return return_t
             case _:
-                return super().type_check_exp(e, env)
+                raise Exception(
+                    "type_check_exp: in call, unexpected "
+                    + repr(func_t)
+                    + "\nAST info 1: "
+                    + utils.ast_loc(e)
+                    + " & AST info 2: "
+                    + utils.ast_loc(e.func)
+                )
 
     def type_check_stmts(self, ss, env, idx=0):
         def _logic(obj, env):
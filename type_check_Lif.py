@@ -1,60 +1,77 @@
 from ast import *
 from type_check_Lvar import TypeCheckLvar
 from utils import *
+from dispatch import handles
 
 
 class TypeCheckLif(TypeCheckLvar):
-    def type_check_exp(self, e, env):
-        match e:
-            case Constant(value) if isinstance(value, bool):
-                return BoolType()
-            case IfExp(test, body, orelse):
-                test_t = self.type_check_exp(test, env)
-                self.check_type_equal(BoolType(), test_t, test)
-                body_t = self.type_check_exp(body, env)
-                orelse_t = self.type_check_exp(orelse, env)
-                self.check_type_equal(body_t, orelse_t, e)
-                return body_t
-            case BinOp(left, Sub(), right):
-                l = self.type_check_exp(left, env)
-                self.check_type_equal(l, IntType(), left)
-                r = self.type_check_exp(right, env)
-                self.check_type_equal(r, IntType(), right)
-                return IntType()
-            case UnaryOp(Not(), v):
-                t = self.type_check_exp(v, env)
-                self.check_type_equal(t, BoolType(), v)
-                return BoolType()
-            case BoolOp(op, values):
-                left = values[0]
-                right = values[1]
-                l = self.type_check_exp(left, env)
-                self.check_type_equal(l, BoolType(), left)
-                r = self.type_check_exp(right, env)
-                self.check_type_equal(r, BoolType(), right)
-                return BoolType()
-            case Compare(left, [cmp], [right]) if isinstance(cmp, Eq) or isinstance(
-                cmp, NotEq
-            ):
-                l = self.type_check_exp(left, env)
-                r = self.type_check_exp(right, env)
-                self.check_type_equal(l, r, e)
-                return BoolType()
-            case Compare(left, [cmp], [right]):
-                l = self.type_check_exp(left, env)
-                self.check_type_equal(l, IntType(), left)
-                r = self.type_check_exp(right, env)
-                self.check_type_equal(r, IntType(), right)
-                return BoolType()
-            # case Let(Name(x), rhs, body):
-            #   t = self.type_check_exp(rhs, env)
-            #   new_env = dict(env); new_env[x] = t
-            #   return self.type_check_exp(body, new_env)
-            case Begin(ss, e):
-                self.type_check_stmts(ss, env)
-                return self.type_check_exp(e, env)
-            case _:
-                return super().type_check_exp(e, env)
+    @handles("exp", Constant)
+    def type_check_constant(self, e, env):
+        if isinstance(e.value, bool):
+            return BoolType()
+        return super().type_check_constant(e, env)
+
+    @handles("exp", IfExp)
+    def type_check_if_exp(self, e, env):
+        test_t = self.type_check_exp(e.test, env)
+        self.check_type_equal(BoolType(), test_t, e.test)
+        body_t = self.type_check_exp(e.body, env)
+        orelse_t = self.type_check_exp(e.orelse, env)
+        self.check_type_equal(body_t, orelse_t, e)
+        return body_t
+
+    @handles("exp", BinOp, Sub)
+    def type_check_sub(self, e, env):
+        l = self.type_check_exp(e.left, env)
+        self.check_type_equal(l, IntType(), e.left)
+        r = self.type_check_exp(e.right, env)
+        self.check_type_equal(r, IntType(), e.right)
+        return IntType()
+
+    @handles("exp", UnaryOp, Not)
+    def type_check_not(self, e, env):
+        t = self.type_check_exp(e.operand, env)
+        self.check_type_equal(t, BoolType(), e.operand)
+        return BoolType()
+
+    @handles("exp", BoolOp)
+    def type_check_bool_op(self, e, env):
+        left = e.values[0]
+        right = e.values[1]
+        l = self.type_check_exp(left, env)
+        self.check_type_equal(l, BoolType(), left)
+        r = self.type_check_exp(right, env)
+        self.check_type_equal(r, BoolType(), right)
+        return BoolType()
+
+    @handles("exp", Compare, Eq)
+    @handles("exp", Compare, NotEq)
+    def type_check_equality(self, e, env):
+        l = self.type_check_exp(e.left, env)
+        r = self.type_check_exp(e.comparators[0], env)
+        self.check_type_equal(l, r, e)
+        return BoolType()
+
+    @handles("exp", Compare)
+    def type_check_compare(self, e, env):
+        left = e.left
+        right = e.comparators[0]
+        l = self.type_check_exp(left, env)
+        self.check_type_equal(l, IntType(), left)
+        r = self.type_check_exp(right, env)
+        self.check_type_equal(r, IntType(), right)
+        return BoolType()
+
+    # @handles("exp", Let)
+    # def type_check_let(self, e, env):
+    #   t = self.type_check_exp(e.rhs, env)
+    #   new_env = dict(env); new_env[e.var.id] = t
+    #   return self.type_check_exp(e.body, new_env)
+
+    @handles("exp", Begin)
+    def type_check_begin(self, e, env):
+        self.type_check_stmts(e.body, env)
+        return self.type_check_exp(e.result, env)
 
     def type_check_stmts(self, ss, env, idx=0):
         # Couldn't modify here because of the entanglement
@@ -2,6 +2,7 @@ import ast
 from types import NoneType
 from type_check_Lwhile import TypeCheckLwhile
 import utils
+from dispatch import handles
 
 
 class TypeCheckLtup(TypeCheckLwhile):
@@ -29,56 +30,66 @@ class TypeCheckLtup(TypeCheckLwhile):
             case _:
                 super().check_type_equal(t1, t2, e)
 
-    def type_check_exp(self, e, env):
-        match e:
-            case ast.Compare(left, [cmp], [right]) if isinstance(cmp, ast.Is):
-                l = self.type_check_exp(left, env)
-                r = self.type_check_exp(right, env)
-                self.check_type_equal(l, r, e)
-                return utils.BoolType()
-            case ast.Tuple(es, ast.Load()):
-                ts = [self.type_check_exp(e, env) for e in es]
-                e.has_type = utils.TupleType(ts)  # type: ignore
-                return e.has_type  # type: ignore
-            case ast.Subscript(tup, ast.Constant(index), ast.Load()):
-                tup_ty = self.type_check_exp(tup, env)
-                index_ty = self.type_check_exp(ast.Constant(index), env)
-                self.check_type_equal(index_ty, utils.IntType(), index)
-                match tup_ty:
-                    case utils.TupleType(ts):
-                        return ts[index]
-                    case _:
-                        raise Exception(
-                            "subscript expected a tuple, not "
-                            + repr(tup_ty)
-                            + "\nAST info 1: "
-                            + utils.ast_loc(e)
-                            + " & AST info 2: "
-                            + utils.ast_loc(tup)
-                        )
-            case ast.Call(ast.Name("len"), [tup]):
-                tup_t = self.type_check_exp(tup, env)
-                match tup_t:
-                    case utils.TupleType(ts):
-                        return utils.IntType()
-                    case utils.Bottom():
-                        return utils.Bottom()
-                    case _:
-                        raise Exception(
-                            "len expected a tuple, not "
-                            + repr(tup_t)
-                            + "\nAST info 1: "
-                            + utils.ast_loc(e)
-                            + " & AST info 2: "
-                            + utils.ast_loc(tup)
-                        )
-            # after expose_allocation
-            case utils.GlobalValue(name):
+    @handles("exp", ast.Compare, ast.Is)
+    def type_check_is(self, e, env):
+        l = self.type_check_exp(e.left, env)
+        r = self.type_check_exp(e.comparators[0], env)
+        self.check_type_equal(l, r, e)
+        return utils.BoolType()
+
+    @handles("exp", ast.Tuple)
+    def type_check_tuple(self, e, env):
+        ts = [self.type_check_exp(e, env) for e in e.elts]
+        e.has_type = utils.TupleType(ts)  # type: ignore
+        return e.has_type  # type: ignore
+
+    @handles("exp", ast.Subscript, ast.Constant)
+    def type_check_subscript(self, e, env):
+        tup = e.value
+        index = e.slice.value
+        tup_ty = self.type_check_exp(tup, env)
+        index_ty = self.type_check_exp(ast.Constant(index), env)
+        self.check_type_equal(index_ty, utils.IntType(), index)
+        match tup_ty:
+            case utils.TupleType(ts):
+                return ts[index]
+            case _:
+                raise Exception(
+                    "subscript expected a tuple, not "
+                    + repr(tup_ty)
+                    + "\nAST info 1: "
+                    + utils.ast_loc(e)
+                    + " & AST info 2: "
+                    + utils.ast_loc(tup)
+                )
+
+    @handles("exp", ast.Call, "len")
+    def type_check_len(self, e, env):
+        tup = e.args[0]
+        tup_t = self.type_check_exp(tup, env)
+        match tup_t:
+            case utils.TupleType(ts):
                 return utils.IntType()
-            case utils.Allocate(length, typ):
-                return typ
+            case utils.Bottom():
+                return utils.Bottom()
             case _:
-                return super().type_check_exp(e, env)
+                raise Exception(
+                    "len expected a tuple, not "
+                    + repr(tup_t)
+                    + "\nAST info 1: "
+                    + utils.ast_loc(e)
+                    + " & AST info 2: "
+                    + utils.ast_loc(tup)
+                )
+
+    # after expose_allocation
+    @handles("exp", utils.GlobalValue)
+    def type_check_global_value(self, e, env):
+        return utils.IntType()
+
+    @handles("exp", utils.Allocate)
+    def type_check_allocate(self, e, env):
+        return e.ty
 
     def type_check_stmts(self, ss, env, idx=0):
         def _logic(obj, env):
@@ -1,9 +1,10 @@
 import ast
 from types import NoneType
 import utils
+from dispatch import Dispatcher, handles
 
 
-class TypeCheckLvar:
+class TypeCheckLvar(Dispatcher):
     def check_type_equal(self, t1, t2, e):
         if t1 != t2:
             raise Exception(
@@ -21,32 +22,46 @@ class TypeCheckLvar:
             )
 
     def type_check_exp(self, e, env):
-        match e:
-            case ast.BinOp(left, ast.Add(), right):
-                l = self.type_check_exp(left, env)
-                self.check_type_equal(l, utils.IntType(), left)
-                r = self.type_check_exp(right, env)
-                self.check_type_equal(r, utils.IntType(), right)
-                return utils.IntType()
-            case ast.UnaryOp(ast.USub(), v):
-                t = self.type_check_exp(v, env)
-                self.check_type_equal(t, utils.IntType(), v)
-                return utils.IntType()
-            case ast.Name(id):
-                return env[id]
-            case ast.Constant(value) if isinstance(value, int):
-                return utils.IntType()
-            case ast.Constant(value) if isinstance(value, NoneType):
-                return utils.VoidType()
-            case ast.Call(ast.Name("input_int"), []):
-                return utils.IntType()
-            case _:
-                raise Exception(
-                    "type_check_exp: unexpected "
-                    + repr(e)
-                    + "\nAST info 1: "
-                    + utils.ast_loc(e)
-                )
+        return self.dispatch("exp", e, env)
+
+    @handles("exp", ast.BinOp, ast.Add)
+    def type_check_add(self, e, env):
+        l = self.type_check_exp(e.left, env)
+        self.check_type_equal(l, utils.IntType(), e.left)
+        r = self.type_check_exp(e.right, env)
+        self.check_type_equal(r, utils.IntType(), e.right)
+        return utils.IntType()
+
+    @handles("exp", ast.UnaryOp, ast.USub)
+    def type_check_neg(self, e, env):
+        t = self.type_check_exp(e.operand, env)
+        self.check_type_equal(t, utils.IntType(), e.operand)
+        return utils.IntType()
+
+    @handles("exp", ast.Name)
+    def type_check_name(self, e, env):
+        return env[e.id]
+
+    @handles("exp", ast.Constant)
+    def type_check_constant(self, e, env):
+        if isinstance(e.value, int):
+            return utils.IntType()
+        if isinstance(e.value, NoneType):
+            return utils.VoidType()
+        return self.type_check_unexpected(e, env)
+
+    @handles("exp", ast.Call, "input_int")
+    def type_check_input_int(self, e, env):
+        return utils.IntType()
+
+    @handles("exp")
+    def type_check_unexpected(self, e, env):
+        raise Exception(
+            "type_check_exp: unexpected "
+            + repr(e)
+            + "\nAST info 1: "
+            + utils.ast_loc(e)
+        )
 
     def type_check_stmts(self, ss, env, idx=0):
         def _logic(obj, env):
@@ -1,11 +1,22 @@
 import os
 from pathlib import Path
 import sys
+import io
 import ast
+import subprocess
+import tempfile
+import time
+import hashlib
+import json
+import shutil
+import copy
+import tracemalloc
 from dataclasses import dataclass
 from types import NotImplementedType
 from typing import Callable, Dict, List
 from filecmp import cmp
+import sink
+import watchdog
 
 MAX_INT_64 = 9223372036854775807
 MIN_INT_64 = -9223372036854775808
@@ -633,6 +644,15 @@ def generate_name(name):
     return ls[0] + "." + str(new_id)
 
 
+# Starts the fresh names and the labels of the blocks (see create_block)
+# from 0 again, so that compiling a program gives the same code whatever
+# was compiled before it in the process.
+def reset_names():
+    global name_id, block_id
+    name_id = 0
+    block_id = 0
+
+
 ################################################################################
 # AST classes
 ################################################################################
@@ -1058,23 +1078,175 @@ compare_files: Callable[[Path, Path], bool] = lambda file1, file2: cmp(
 )
 
 
+# write the .out file of every pass, not only of the failing ones
+keep_outputs = False
+
+
+def enable_keep_outputs():
+    global keep_outputs
+    keep_outputs = True
+
+
+# The same as ensure_final_newline, for output that is kept in memory.
+def with_final_newline(text: str) -> str:
+    if text != "" and not text.endswith("\n"):
+        return text + "\n"
+    return text
+
+
+# Reads the input and the expected output of a test program, once for
+# all the passes that are checked against them.
+def read_test_data(program_root: str) -> tuple[str, str]:
+    with open(program_root + ".in") as input_file:
+        input_data = input_file.read()
+    with open(program_root + ".golden") as golden_file:
+        golden = with_final_newline(golden_file.read())
+    return (input_data, golden)
+
+
+# Runs `interp` on `_ast` with stdin connected to an in-memory buffer
+# and returns what it printed, which it writes to an in-memory sink.
+def run_captured(interp, _ast, input_data: str) -> str:
+    stdin = sys.stdin
+    sys.stdin = io.StringIO(input_data)
+    output = sink.MemorySink()
+    previous = sink.set_sink(output)
+    try:
+        interp(_ast)
+        return output.getvalue()
+    finally:
+        sys.stdin = stdin
+        sink.set_sink(previous)
+
+
+# Compares the output of a pass to the golden output. The output is
+# written to the .out file of the test if it differs (or if all outputs
+# are kept), so that it can be inspected afterwards.
+def check_output(output: str, golden: str, program_root: str) -> bool:
+    output = with_final_newline(output)
+    result = output == golden
+    if keep_outputs or not result:
+        with open(program_root + ".out", "w") as output_file:
+            output_file.write(output)
+    return result
+
+
+# The interpreters and the emulator checking a pass may run for at most
+# `interp_max_steps` steps and `interp_timeout` seconds (None for no
+# limit); see watchdog.py.
+interp_max_steps = 10_000_000
+interp_timeout = 10.0
+
+# print the number of steps the interpreter took for every pass
+report_steps = False
+
+
+def set_interp_budget(max_steps: int | None, seconds: float | None) -> None:
+    global interp_max_steps, interp_timeout
+    interp_max_steps = max_steps
+    interp_timeout = seconds
+
+
+def enable_report_steps():
+    global report_steps
+    report_steps = True
+
+
+# check the outputs of the x86 passes with the x86 emulator
+test_x86 = True
+
+# run the final program on the x86 emulator instead of assembling,
+# linking and executing it
+emulate_x86 = False
+
+
+def disable_x86_tests():
+    global test_x86
+    test_x86 = False
+
+
+def enable_emulation():
+    global emulate_x86
+    emulate_x86 = True
+
+
+# Runs the x86 program on the emulator. An instruction the emulator
+# cannot execute, such as an access outside of the memory, ends the
+# program like a crash ends the executable: the test fails instead of
+# stopping the test run. The run is counted into `counters`, if given.
+def run_x86_emulator(x86, counters=None) -> None:
+    from interp_x86.eval_x86 import interp_x86
+
+    try:
+        interp_x86(x86, counters=counters)
+    except watchdog.Timeout:
+        raise
+    except Exception as error:
+        print("the emulator stopped: " + type(error).__name__ + ": " + str(error))
+
+
+# Runs the final x86 program on the emulator, under the budget of the
+# interpreters, and returns its output (None if it timed out).
+def emulate_program(x86, input_data: str, program_root: str, counters=None) -> str | None:
+    budget = watchdog.Budget(interp_max_steps, interp_timeout)
+    previous = watchdog.set_budget(budget)
+    try:
+        return run_captured(lambda x86: run_x86_emulator(x86, counters), x86, input_data)
+    except watchdog.Timeout as timeout:
+        print("the emulated program " + program_root + " " + str(timeout))
+        return None
+    finally:
+        watchdog.set_budget(previous)
+
+
 # Given the `ast` output of a pass and a test program (root) name,
 # runs the interpreter on the program and compares the output to the
-# expected "golden" output.
-def test_pass(passname, interp, program_root, _ast, compiler_name) -> int:
-    input_file = Path(program_root + ".in")
-    output_file = Path(program_root + ".out")
-    golden_file = Path(program_root + ".golden")
-    stdin = sys.stdin
-    stdout = sys.stdout
-    sys.stdin = open(input_file, "r")
-    sys.stdout = open(output_file, "w")
-    interp(_ast)
-    sys.stdin = stdin
-    sys.stdout = stdout
-    ensure_final_newline(output_file)
-    ensure_final_newline(golden_file)
-    result = compare_files(output_file, golden_file)
+# expected "golden" output. `test_data` are the contents of the .in and
+# .golden files, if they have already been read. If `stats` is given,
+# it receives the number of steps the interpreter took and whether it
+# ran out of its budget.
+def test_pass(
+    passname, interp, program_root, _ast, compiler_name, test_data=None, stats=None
+) -> int:
+    if test_data is None:
+        test_data = read_test_data(program_root)
+    input_data, golden = test_data
+    budget = watchdog.Budget(interp_max_steps, interp_timeout)
+    previous = watchdog.set_budget(budget)
+    try:
+        output = run_captured(interp, _ast, input_data)
+    except watchdog.Timeout as timeout:
+        if stats is not None:
+            stats["steps"] = timeout.steps
+            stats["timeout"] = True
+        print(
+            "compiler "
+            + compiler_name
+            + " timed out on pass "
+            + passname
+            + " on test\n"
+            + program_root
+            + "\n"
+            + "the interpreter "
+            + str(timeout)
+            + "\n"
+        )
+        return 0
+    finally:
+        watchdog.set_budget(previous)
+    if stats is not None:
+        stats["steps"] = budget.steps
+        stats["timeout"] = False
+    if report_steps:
+        print(
+            "steps for "
+            + program_root
+            + " pass "
+            + passname
+            + ": "
+            + str(budget.steps)
+        )
+    result = check_output(output, golden, program_root)
     if result:
         trace(
             "compiler "
@@ -1096,10 +1268,8 @@ def test_pass(passname, interp, program_root, _ast, compiler_name) -> int:
             + program_root
             + "\n"
         )
-        output = open(output_file).read()
-        expected = open(golden_file).read()
-        print("Output: " + output)
-        print("Expected: " + expected)
+        print("Output: " + with_final_newline(output))
+        print("Expected: " + golden)
         return 0
 
 
@@ -1117,6 +1287,455 @@ def validate_tests(path: Path, lang: str, interp) -> bool:
     return test_count == success_count
 
 
+################################################################################
+# Building and running native executables
+################################################################################
+
+runtime_source = Path("runtime.c")
+runtime_object = Path("runtime.o")
+
+# seconds a compiled test program may run before it is killed
+execution_timeout = 10
+
+# print the time spent in assemble, link and execute for every test
+report_build_times = False
+
+# bounds the number of gcc processes running at the same time; shared
+# by all worker processes when tests run in parallel
+gcc_slots = None
+
+
+def set_execution_timeout(seconds: float) -> None:
+    global execution_timeout
+    execution_timeout = seconds
+
+
+def enable_build_times():
+    global report_build_times
+    report_build_times = True
+
+
+def set_gcc_slots(slots) -> None:
+    global gcc_slots
+    gcc_slots = slots
+
+
+def run_gcc(args: list[str]) -> bool:
+    if gcc_slots is not None:
+        gcc_slots.acquire()
+    try:
+        completed = subprocess.run(["gcc"] + args, capture_output=True, text=True)
+    finally:
+        if gcc_slots is not None:
+            gcc_slots.release()
+    if completed.returncode != 0:
+        print("gcc " + " ".join(args) + " failed:\n" + completed.stderr)
+        return False
+    return True
+
+
+def ensure_runtime() -> Path:
+    "compile runtime.c unless runtime.o is up to date"
+    if (
+        not runtime_object.exists()
+        or runtime_object.stat().st_mtime < runtime_source.stat().st_mtime
+    ):
+        # build under a private name, so that nobody links a half-written file
+        fd, tmp_object = tempfile.mkstemp(suffix=".o", dir=".")
+        os.close(fd)
+        if run_gcc(["-c", "-g", "-std=c99", str(runtime_source), "-o", tmp_object]):
+            os.replace(tmp_object, runtime_object)
+        else:
+            os.remove(tmp_object)
+    return runtime_object
+
+
+# Assembles and links the x86 program in `build_dir`. Returns the
+# executable, or None if gcc failed.
+def build_executable(
+    x86_filename: Path, build_dir: Path, timings: dict
+) -> Path | None:
+    name = x86_filename.stem
+    object_file = Path(build_dir, name + ".o")
+    executable = Path(build_dir, name)
+
+    start = time.perf_counter()
+    assembled = run_gcc(["-c", str(x86_filename), "-o", str(object_file)])
+    timings["assemble"] = time.perf_counter() - start
+    if not assembled:
+        return None
+
+    start = time.perf_counter()
+    linked = run_gcc([str(ensure_runtime()), str(object_file), "-o", str(executable)])
+    timings["link"] = time.perf_counter() - start
+    if not linked:
+        return None
+    return executable
+
+
+# Runs the executable on the given input file. Returns the output of
+# the program, or None if it timed out.
+def run_executable(executable: Path, input_file: Path, timings: dict) -> bytes | None:
+    start = time.perf_counter()
+    try:
+        with open(input_file, "rb") as stdin:
+            completed = subprocess.run(
+                [str(executable)],
+                stdin=stdin,
+                capture_output=True,
+                timeout=execution_timeout,
+            )
+    except subprocess.TimeoutExpired:
+        print(
+            "executable "
+            + str(executable)
+            + " timed out after "
+            + str(execution_timeout)
+            + " seconds"
+        )
+        return None
+    finally:
+        timings["execute"] = time.perf_counter() - start
+    if completed.returncode != 0:
+        print(
+            "executable "
+            + str(executable)
+            + " exited with status "
+            + str(completed.returncode)
+        )
+    return completed.stdout
+
+
+# Assembles and links the x86 program in a private build directory and
+# runs the executable on the given input file. Returns the output of
+# the program (None if it could not be built or timed out) and the
+# seconds spent in each step. The executable is copied to
+# `save_executable` if that is given.
+def build_and_run(
+    x86_filename: Path, input_file: Path, save_executable: Path | None = None
+) -> tuple[bytes | None, dict]:
+    timings = {}
+    with tempfile.TemporaryDirectory(prefix=x86_filename.stem + "-") as build_dir:
+        executable = build_executable(x86_filename, Path(build_dir), timings)
+        if executable is None:
+            return (None, timings)
+        if save_executable is not None:
+            shutil.copy2(executable, save_executable)
+        return (run_executable(executable, input_file, timings), timings)
+
+
+def print_build_times(program_root: str, timings: dict) -> None:
+    print(
+        "build times for "
+        + program_root
+        + ": "
+        + ", ".join(
+            step + " " + format(seconds, ".3f") + "s"
+            for (step, seconds) in timings.items()
+        )
+    )
+
+
+################################################################################
+# Profiling the passes
+################################################################################
+
+# When profiling, every pass of compile_and_test records its wall time,
+# the peak of the memory it allocated (measured with tracemalloc) and
+# the size of the program it produced.
+
+profiling = False
+profile_memory = True
+profile_records: list[dict] = []
+
+
+# Tracing the allocations slows the passes down a lot, so the memory
+# can be left out when only the times matter.
+def enable_profiling(memory: bool = True):
+    global profiling, profile_memory
+    profiling = True
+    profile_memory = memory
+
+
+# Number of AST nodes (including x86 instructions and arguments),
+# basic blocks and x86 instructions in a program.
+def ir_size(program) -> dict:
+    from x86_ast import instr, arg, X86Program, X86ProgramDefs
+
+    nodes = 0
+    blocks = 0
+    instructions = 0
+    todo = [program]
+    while todo:
+        x = todo.pop()
+        if isinstance(x, (list, tuple)):
+            todo.extend(x)
+        elif isinstance(x, dict):
+            todo.extend(x.values())
+        elif isinstance(
+            x, (ast.AST, instr, arg, X86Program, X86ProgramDefs, CProgramDefs)
+        ):
+            nodes += 1
+            if isinstance(x, instr):
+                instructions += 1
+            body = getattr(x, "body", None)
+            if isinstance(body, dict):
+                blocks += len(body)
+            todo.extend(vars(x).values())
+    return {"nodes": nodes, "blocks": blocks, "instructions": instructions}
+
+
+# Runs one pass of the compiler on the test `program_root`, recording
+# its cost if profiling is enabled.
+def run_pass(program_root: str, passname: str, compiler_pass, program):
+    if not profiling:
+        return compiler_pass(program)
+    if profile_memory:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    program_out = compiler_pass(program)
+    seconds = time.perf_counter() - start
+    peak_bytes = None
+    if profile_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        peak_bytes = peak - before
+    profile_records.append(
+        {
+            "test": program_root,
+            "pass": passname,
+            "seconds": seconds,
+            "peak_bytes": peak_bytes,
+            **ir_size(program_out),
+        }
+    )
+    return program_out
+
+
+# Writes the profile records as CSV if the file name ends in .csv and
+# as JSON otherwise.
+def write_profile(filename: str) -> None:
+    import csv
+
+    with open(filename, "w", newline="") as f:
+        if filename.endswith(".csv"):
+            fields = ["test", "pass", "seconds", "peak_bytes"]
+            fields += ["nodes", "blocks", "instructions"]
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(profile_records)
+        else:
+            json.dump(profile_records, f, indent=2)
+
+
+################################################################################
+# Counting the instructions of the compiled programs
+################################################################################
+
+# When counting, the final x86 program of every test runs on the x86
+# emulator with its performance counters (see interp_x86/counters.py),
+# and compile_and_test records them. Unlike the wall time of a small
+# test program, they are the same on every run, so they measure a
+# change to the generated code, such as fewer spills. For that, the
+# compiler has to generate the same code on every run: the fresh names
+# start from 0 for every test (see reset_names), and run-tests.py pins
+# PYTHONHASHSEED, on which the order of the sets of the compiler depends.
+
+counting = False
+counter_records: list[dict] = []
+
+
+def enable_counting():
+    global counting
+    counting = True
+
+
+def write_counters(filename: str) -> None:
+    with open(filename, "w") as f:
+        json.dump(counter_records, f, indent=2)
+
+
+################################################################################
+# Cache of compiled tests
+################################################################################
+
+# A test is stored under a hash of its source, its .in and .golden
+# files, and the sources of the compiler, interpreters and type
+# checkers. An entry holds the verdict of every pass, the generated
+# .s file and the linked executable. Entries are evicted least
+# recently used first once the cache grows beyond `cache_max_bytes`.
+
+cache_enabled = True
+cache_dir = Path(".test-cache")
+cache_max_bytes = 256 * 1024 * 1024
+
+toolchain_hash = None
+
+
+def disable_cache():
+    global cache_enabled
+    cache_enabled = False
+
+
+def set_cache(directory: Path, max_bytes: int) -> None:
+    global cache_dir, cache_max_bytes
+    cache_dir = Path(directory)
+    cache_max_bytes = max_bytes
+
+
+def toolchain_digest() -> str:
+    "hash of all the sources the result of a test can depend on"
+    global toolchain_hash
+    if toolchain_hash is None:
+        root = Path(__file__).parent
+        sources = (
+            sorted(root.glob("*.py"))
+            + sorted(root.glob("interp_x86/*.py"))
+            + [root / "runtime.c", root / "runtime.h"]
+        )
+        h = hashlib.sha256()
+        for source in sources:
+            h.update(source.name.encode())
+            h.update(source.read_bytes())
+        toolchain_hash = h.hexdigest()
+    return toolchain_hash
+
+
+def test_cache_key(
+    program_filename: Path, compiler, compiler_name: str, processors, test_data
+) -> str:
+    h = hashlib.sha256()
+    h.update(toolchain_digest().encode())
+    h.update(compiler_name.encode())
+    h.update(type(compiler).__qualname__.encode())
+    for p in processors:
+        h.update(getattr(p, "__qualname__", repr(p)).encode())
+    h.update(Path(program_filename).read_bytes())
+    for data in test_data:
+        h.update(b"\0" + data.encode())
+    # a pass may time out under one budget and not under another, and
+    # the emulator decides the verdicts of the x86 passes (and of the
+    # program itself, when emulating)
+    h.update(repr((interp_max_steps, interp_timeout, test_x86, emulate_x86)).encode())
+    return h.hexdigest()
+
+
+def cache_lookup(key: str) -> Path | None:
+    entry = cache_dir / key
+    if not (entry / "verdicts.json").exists():
+        return None
+    # mark the entry as recently used
+    os.utime(entry)
+    return entry
+
+
+# Stores a finished test under `key`. `staging` is a directory in the
+# cache that already holds the executable, if there is one.
+def cache_store(
+    key: str, staging: Path, verdicts: dict, x86_filename: Path
+) -> None:
+    shutil.copyfile(x86_filename, staging / "program.s")
+    with open(staging / "verdicts.json", "w") as f:
+        json.dump(verdicts, f)
+    try:
+        os.rename(staging, cache_dir / key)
+    except OSError:
+        # another worker stored the same test first
+        shutil.rmtree(staging, ignore_errors=True)
+    evict_cache()
+
+
+def evict_cache() -> None:
+    entries = []
+    total = 0
+    for entry in cache_dir.iterdir():
+        if entry.name.startswith("tmp-"):
+            continue
+        try:
+            size = sum(f.stat().st_size for f in entry.iterdir())
+            entries.append((entry.stat().st_mtime, size, entry))
+        except OSError:
+            continue  # evicted by another worker
+        total += size
+    entries.sort(key=lambda e: e[0])
+    for (_, size, entry) in entries:
+        if total <= cache_max_bytes:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+
+
+# Reports a test from its cache entry, running the cached executable
+# again instead of compiling the test.
+def replay_cached_test(
+    entry: Path, program_root: str, compiler_name: str, test_data
+) -> tuple[int, int, int]:
+    with open(entry / "verdicts.json") as f:
+        verdicts = json.load(f)
+    for (passname, verdict) in verdicts["passes"]:
+        if verdict is False:
+            print(
+                "compiler "
+                + compiler_name
+                + " failed pass "
+                + passname
+                + " on test\n"
+                + program_root
+                + " (cached)\n"
+            )
+        elif verdict == "timeout":
+            print(
+                "compiler "
+                + compiler_name
+                + " timed out on pass "
+                + passname
+                + " on test\n"
+                + program_root
+                + " (cached)\n"
+            )
+    shutil.copyfile(entry / "program.s", program_root + ".s")
+    executable = entry / "program"
+    if executable.exists():
+        timings = {}
+        native_output = run_executable(
+            executable, Path(program_root + ".in"), timings
+        )
+        if report_build_times:
+            print_build_times(program_root, timings)
+        output = (native_output or b"").decode(errors="replace")
+        result = check_output(output, test_data[1], program_root)
+    else:
+        result = verdicts["executable"]
+    successful_passes = sum(1 for (_, verdict) in verdicts["passes"] if verdict is True)
+    total_passes = len(verdicts["passes"]) + 1
+    return report_executable(
+        result, successful_passes, total_passes, compiler_name, program_root
+    )
+
+
+def report_executable(
+    result: bool,
+    successful_passes: int,
+    total_passes: int,
+    compiler_name: str,
+    program_root: str,
+) -> tuple[int, int, int]:
+    if result:
+        successful_passes += 1
+        return (successful_passes, total_passes, 1)
+    else:
+        print(
+            "compiler "
+            + compiler_name
+            + ", executable failed"
+            + " on test "
+            + program_root
+        )
+        return (successful_passes, total_passes, 0)
+
+
 def compile_and_test(
     program_filename: Path,
     compiler,
@@ -1134,24 +1753,72 @@ def compile_and_test(
             trace("\n#" + passname + "\n")
             if type_check:
                 type_check(program)
-            program_out = getattr(compiler, passname)(program)
+            program_out = run_pass(
+                program_root, passname, getattr(compiler, passname), program
+            )
             trace(program_out)
             trace("")
             total_passes += 1
-            successful_passes += test_pass(
-                passname, interp, program_root, program_out, compiler_name
+            stats = {}
+            verdict = test_pass(
+                passname, interp, program_root, program_out, compiler_name, test_data, stats
             )
+            successful_passes += verdict
+            pass_verdicts.append((passname, "timeout" if stats["timeout"] else verdict == 1))
         else:
             program_out = program
         return program_out
 
+    def test_x86_pass(passname: str, x86):
+        nonlocal total_passes, successful_passes
+        total_passes += 1
+        if not test_x86:
+            pass_verdicts.append((passname, None))
+            return
+        stats = {}
+        verdict = test_pass(
+            passname, run_x86_emulator, program_root, x86, compiler_name, test_data, stats
+        )
+        successful_passes += verdict
+        pass_verdicts.append((passname, "timeout" if stats["timeout"] else verdict == 1))
+
+    # The homes of the variables are only allocated in the prelude of
+    # every function, so the outputs of assign_homes and
+    # patch_instructions run with a prelude and conclusion, added to a
+    # copy that the next pass does not see.
+    def with_prelude_and_conclusion(x86):
+        if not test_x86:
+            return x86
+        return compiler.prelude_and_conclusion(copy.deepcopy(x86))
+
     total_passes = 0
     successful_passes = 0
-    from interp_x86.eval_x86 import interp_x86
+    # (pass name, verdict) of every pass: True or False, "timeout" if the
+    # interpreter ran out of its budget, None for passes that are not tested
+    pass_verdicts = []
 
+    # the code does not depend on the programs compiled before it, in
+    # this process or in a worker
+    reset_names()
     program_root = str(program_filename).split(".")[0]
     with open(program_filename) as source:
         program = ast.parse(source.read())
+    test_data = read_test_data(program_root)
+
+    # the cache would hide the traces, the profile of the passes and the
+    # counters
+    cache_key = None
+    if cache_enabled and not tracing and not profiling and not counting:
+        cache_key = test_cache_key(
+            program_filename,
+            compiler,
+            compiler_name,
+            (type_check_P, interp_P, type_check_C, interp_C),
+            test_data,
+        )
+        entry = cache_lookup(cache_key)
+        if entry is not None:
+            return replay_cached_test(entry, program_root, compiler_name, test_data)
 
     trace("\n# source program\n")
     trace(program)
@@ -1171,38 +1838,25 @@ def compile_and_test(
         type_check_C(program)
 
     trace("\n**********\n select \n**********\n")
-    pseudo_x86 = compiler.select_instructions(program)
+    pseudo_x86 = run_pass(program_root, "select_instructions", compiler.select_instructions, program)
     trace(pseudo_x86)
     trace("")
-    total_passes += 1
-    test_x86 = False  # doesn't know about GC!
-    if test_x86:
-        successful_passes += test_pass(
-            "select instructions", interp_x86, program_root, pseudo_x86, compiler_name
-        )
+    test_x86_pass("select instructions", pseudo_x86)
 
     trace("\n**********\n assign \n**********\n")
-    almost_x86 = compiler.assign_homes(pseudo_x86)
+    almost_x86 = run_pass(program_root, "assign_homes", compiler.assign_homes, pseudo_x86)
     trace(almost_x86)
     trace("")
-    total_passes += 1
-    if test_x86:
-        successful_passes += test_pass(
-            "assign homes", interp_x86, program_root, almost_x86, compiler_name
-        )
+    test_x86_pass("assign homes", with_prelude_and_conclusion(almost_x86))
 
     trace("\n**********\n patch \n**********\n")
-    x86 = compiler.patch_instructions(almost_x86)
+    x86 = run_pass(program_root, "patch_instructions", compiler.patch_instructions, almost_x86)
     trace(x86)
     trace("")
-    total_passes += 1
-    if test_x86:
-        successful_passes += test_pass(
-            "patch instructions", interp_x86, program_root, x86, compiler_name
-        )
+    test_x86_pass("patch instructions", with_prelude_and_conclusion(x86))
 
     trace("\n# prelude and conclusion\n")
-    final_program = compiler.prelude_and_conclusion(x86)
+    final_program = run_pass(program_root, "prelude_and_conclusion", compiler.prelude_and_conclusion, x86)
     trace(final_program)
     trace("")
 
@@ -1213,37 +1867,51 @@ def compile_and_test(
     total_passes += 1
 
     input_file = Path(program_root + ".in")
-    output_file = Path(program_root + ".out")
-    golden_file = Path(program_root + ".golden")
-    # Run the final x86 program
-    emulate_x86 = False
-    if emulate_x86:
-        stdin = sys.stdin
-        stdout = sys.stdout
-        sys.stdin = open(input_file, "r")
-        sys.stdout = open(output_file, "w")
-        interp_x86(final_program)
-        sys.stdin = stdin
-        sys.stdout = stdout
-    else:
-        os.system("gcc runtime.o " + str(x86_filename))
-        os.system("./a.out < " + str(input_file) + " > " + str(output_file))
+    input_data, golden = test_data
+    counters = None
+    if counting:
+        from interp_x86.counters import Counters
+
+        counters = Counters()
+    # the executable is saved straight into a new cache entry
+    staging = None
+    if cache_key is not None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix="tmp-", dir=cache_dir))
+    try:
+        # Run the final x86 program
+        if emulate_x86:
+            output = emulate_program(final_program, input_data, program_root, counters)
+            finished = output is not None
+            output = output or ""
+        else:
+            native_output, timings = build_and_run(
+                x86_filename,
+                input_file,
+                staging / "program" if staging is not None else None,
+            )
+            output = (native_output or b"").decode(errors="replace")
+            if report_build_times:
+                print_build_times(program_root, timings)
+            if counters is not None:
+                emulated = emulate_program(final_program, input_data, program_root, counters)
+                finished = emulated is not None
+        if counters is not None:
+            counter_records.append(
+                {"test": program_root, "finished": finished, **counters.report()}
+            )
 
-    ensure_final_newline(output_file)
-    ensure_final_newline(golden_file)
-    result = compare_files(output_file, golden_file)
-    if result:
-        successful_passes += 1
-        return (successful_passes, total_passes, 1)
-    else:
-        print(
-            "compiler "
-            + compiler_name
-            + ", executable failed"
-            + " on test "
-            + program_root
-        )
-        return (successful_passes, total_passes, 0)
+        result = check_output(output, golden, program_root)
+        if staging is not None:
+            verdicts = {"passes": pass_verdicts, "executable": result}
+            cache_store(cache_key, staging, verdicts, x86_filename)
+            staging = None
+    finally:
+        if staging is not None:
+            shutil.rmtree(staging, ignore_errors=True)
+    return report_executable(
+        result, successful_passes, total_passes, compiler_name, program_root
+    )
 
 
 def trace_ast_and_concrete(_ast):
@@ -1262,6 +1930,9 @@ def compile(
     type_check_C,
     program_filename: Path,
 ):
+    # the code does not depend on the programs compiled before it, in
+    # this process or in a worker
+    reset_names()
     program_root = str(program_filename).split(".")[0]
     with open(program_filename) as source:
         program = ast.parse(source.read())
@@ -1317,15 +1988,15 @@ def compile(
         type_check_C(program)
 
     trace("\n# select instructions\n")
-    pseudo_x86 = compiler.select_instructions(program)
+    pseudo_x86 = run_pass(program_root, "select_instructions", compiler.select_instructions, program)
     trace_ast_and_concrete(pseudo_x86)
 
     trace("\n# assign homes\n")
-    almost_x86 = compiler.assign_homes(pseudo_x86)
+    almost_x86 = run_pass(program_root, "assign_homes", compiler.assign_homes, pseudo_x86)
     trace_ast_and_concrete(almost_x86)
 
     trace("\n# patch instructions\n")
-    x86 = compiler.patch_instructions(almost_x86)
+    x86 = run_pass(program_root, "patch_instructions", compiler.patch_instructions, almost_x86)
     trace_ast_and_concrete(x86)
 
     trace("\n# prelude and conclusion\n")
@@ -1392,11 +2063,140 @@ def run_one_test(
         )
 
 
+################################################################################
+# Running a list of tests
+################################################################################
+
+# Settings of the harness that a worker process has to inherit from
+# the process that started it.
+def harness_settings() -> dict:
+    return {
+        "tracing": tracing,
+        "recursion_limit": sys.getrecursionlimit(),
+        "execution_timeout": execution_timeout,
+        "interp_max_steps": interp_max_steps,
+        "interp_timeout": interp_timeout,
+        "report_steps": report_steps,
+        "test_x86": test_x86,
+        "emulate_x86": emulate_x86,
+        "report_build_times": report_build_times,
+        "keep_outputs": keep_outputs,
+        "cache_enabled": cache_enabled,
+        "cache_dir": cache_dir,
+        "cache_max_bytes": cache_max_bytes,
+        "profiling": profiling,
+        "profile_memory": profile_memory,
+        "counting": counting,
+    }
+
+
+def apply_harness_settings(settings: dict, slots=None) -> None:
+    global tracing, execution_timeout, report_build_times, keep_outputs
+    global interp_max_steps, interp_timeout, report_steps, test_x86, emulate_x86
+    tracing = settings["tracing"]
+    sys.setrecursionlimit(settings["recursion_limit"])
+    execution_timeout = settings["execution_timeout"]
+    interp_max_steps = settings["interp_max_steps"]
+    interp_timeout = settings["interp_timeout"]
+    report_steps = settings["report_steps"]
+    test_x86 = settings["test_x86"]
+    emulate_x86 = settings["emulate_x86"]
+    report_build_times = settings["report_build_times"]
+    keep_outputs = settings["keep_outputs"]
+    if not settings["cache_enabled"]:
+        disable_cache()
+    set_cache(settings["cache_dir"], settings["cache_max_bytes"])
+    if settings["profiling"]:
+        enable_profiling(settings["profile_memory"])
+    if settings["counting"]:
+        enable_counting()
+    set_gcc_slots(slots)
+
+
+# Runs one test in a worker process. Everything the test prints is
+# captured and handed back to the parent together with the tallies,
+# the profile records and the counters of the test, so the parent can
+# report the tests in a deterministic order.
+def run_one_test_captured(test: Path, lang: str, processors: dict):
+    log = io.StringIO()
+    stdout = sys.stdout
+    sys.stdout = log
+    del profile_records[:]
+    del counter_records[:]
+    try:
+        result = run_one_test(test, lang, **processors)
+    finally:
+        sys.stdout = stdout
+    return (result, log.getvalue(), list(profile_records), list(counter_records))
+
+
+def resolve_jobs(jobs: int) -> int:
+    "0 means one job per core"
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+# Yields (test, result, None) for every test, running them one after
+# the other in this process. Output is printed as the tests run.
+def run_tests_in_process(
+    tests,
+    lang: str,
+    compiler,
+    compiler_name: str,
+    type_check_P,
+    interp_P,
+    type_check_C,
+    interp_C,
+):
+    for test in tests:
+        print("test file: " + str(test))
+        result = run_one_test(
+            test,
+            lang,
+            compiler,
+            compiler_name,
+            type_check_P,
+            interp_P,
+            type_check_C,
+            interp_C,
+        )
+        yield (test, result, None)
+
+
+# Yields (test, result, log) for every test, in the order of `tests`.
+# With more than one job the tests are distributed over a pool of
+# worker processes; each worker has its own sys.stdin/sys.stdout.
+def run_tests_in_workers(
+    tests, lang: str, jobs: int, processors: dict, build_jobs: int
+):
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    slots = multiprocessing.BoundedSemaphore(build_jobs)
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=apply_harness_settings,
+        initargs=(harness_settings(), slots),
+    ) as pool:
+        futures = [
+            pool.submit(run_one_test_captured, test, lang, processors)
+            for test in tests
+        ]
+        for test, future in zip(tests, futures):
+            result, log, records, counts = future.result()
+            profile_records.extend(records)
+            counter_records.extend(counts)
+            yield (test, result, log)
+
+
 # Given the name of a language, a compiler, the compiler's name, a
 # type checker and interpreter for the language, and an interpreter
 # for the C intermediate language, test the compiler on all the tests
 # in the directory of for the given language, i.e., all the
 # python files in ./tests/<language>.
+# With `jobs` other than 1 the tests run in parallel worker processes,
+# with at most `build_jobs` of them running gcc at the same time.
 def run_tests(
     path: Path,
     lang: str,
@@ -1406,18 +2206,34 @@ def run_tests(
     interp_P,
     type_check_C,
     interp_C,
+    jobs: int = 1,
+    build_jobs: int = 0,
 ) -> None:
     tests = get_all_tests_for(path)
+    jobs = resolve_jobs(jobs)
+    # build the runtime before any worker wants to link against it
+    ensure_runtime()
 
     # Compile and run each test program, comparing output to the golden file.
     successful_passes = 0
     total_passes = 0
     successful_tests = 0
     total_tests = 0
-    for test in tests:
-        print("test file: " + str(test))
-        (succ_passes, tot_passes, succ_test) = run_one_test(
-            test,
+    if jobs > 1 and len(tests) > 1:
+        processors = {
+            "compiler": compiler,
+            "compiler_name": compiler_name,
+            "type_check_P": type_check_P,
+            "interp_P": interp_P,
+            "type_check_C": type_check_C,
+            "interp_C": interp_C,
+        }
+        results = run_tests_in_workers(
+            tests, lang, jobs, processors, resolve_jobs(build_jobs)
+        )
+    else:
+        results = run_tests_in_process(
+            tests,
             lang,
             compiler,
             compiler_name,
@@ -1426,6 +2242,11 @@ def run_tests(
             type_check_C,
             interp_C,
         )
+    for test, result, log in results:
+        if log is not None:
+            print("test file: " + str(test))
+            print(log, end="")
+        (succ_passes, tot_passes, succ_test) = result
         successful_passes += succ_passes
         total_passes += tot_passes
         successful_tests += succ_test
@@ -0,0 +1,72 @@
+import time
+
+# Bounds the work of the interpreters and the x86 emulator, so that a
+# program that does not terminate fails its test instead of hanging the
+# test run.
+#
+# The current budget counts the steps of the running program: the
+# statements for InterpLint and its subclasses, the instructions for
+# the x86 emulator, and the loop iterations, calls and basic blocks for
+# the closure compiling interpreters. The budget is exceeded when the
+# program takes more than `max_steps` steps or runs past its deadline;
+# the step that notices it raises Timeout.
+#
+# Counting a step is an increment and a comparison with `next_check`,
+# the next step at which the budget is checked; the clock is only read
+# every CHECK_INTERVAL steps.
+
+CHECK_INTERVAL = 4096
+
+
+class Timeout(Exception):
+    def __init__(self, reason: str, steps: int):
+        super().__init__(reason + " after " + str(steps) + " steps")
+        self.reason = reason
+        self.steps = steps
+
+
+class Budget:
+    def __init__(self, max_steps: int | None = None, seconds: float | None = None):
+        self.max_steps = max_steps
+        self.seconds = seconds
+        self.deadline = None if seconds is None else time.monotonic() + seconds
+        self.steps = 0
+        self.next_check = 0
+        self.schedule_check()
+
+    def schedule_check(self):
+        next_check = float("inf")
+        if self.deadline is not None:
+            next_check = self.steps + CHECK_INTERVAL
+        if self.max_steps is not None:
+            next_check = min(next_check, self.max_steps + 1)
+        self.next_check = next_check
+
+    # Called when `steps` reaches `next_check`.
+    def check(self):
+        if self.max_steps is not None and self.steps > self.max_steps:
+            raise Timeout(
+                "exceeded the budget of " + str(self.max_steps) + " steps", self.steps
+            )
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise Timeout(
+                "exceeded the deadline of " + str(self.seconds) + " seconds",
+                self.steps,
+            )
+        self.schedule_check()
+
+    def step(self):
+        self.steps += 1
+        if self.steps >= self.next_check:
+            self.check()
+
+
+current = Budget()
+
+
+# Makes `budget` the current budget and returns the previous one.
+def set_budget(budget: Budget) -> Budget:
+    global current
+    previous = current
+    current = budget
+    return previous